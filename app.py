@@ -1,88 +1,158 @@
 import asyncio
 import threading
-from flask import Flask
 from flask_cors import CORS
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from backend.database.models import Base
-from backend.database.database import engine
+from backend.database.database import engine, upgrade_schema
 
-from backend.services import MagnetQueueManager, MagnetMonitor, AlistService, rss_service, magnet_service
-from backend.services.alist_api import AlistClient, AlistTaskManager, DirectoryManager
+from backend.services import AlistBackendPool, create_backend, rss_service
 
-from backend.core.config import base_url, token, delete_policy, root_save_path, timeout
-from backend.views import rss_blueprint, magnet_blueprint, log_blueprint, auth_blueprint
+from backend.core.config import base_url, token, delete_policy, root_save_path, timeout, SERVE_MODE, SERVE_FRONTEND, FRONTEND_DIST_DIR, RESPONSE_COMPRESSION_MIN_SIZE
+from backend.core.config import ALIST_BACKENDS, BACKEND_HEALTH_INTERVAL
+from backend.core.config import QUEUE_REFILL_INTERVAL, LEADER_LOCK_BACKEND, LEADER_LOCK_FILE, REDIS_URL, LEADER_LEASE_TTL, LEADER_RENEW_INTERVAL
+from backend.views import rss_blueprint, magnet_blueprint, log_blueprint, auth_blueprint, stats_blueprint, events_blueprint, metrics_blueprint, frontend_blueprint
 from backend.utils.dependency_manager import dependency_manager, DependencyKeys as DKeys
 from backend.utils.token_required_middleware import token_required_middleware
-
-def create_app():
-    app = Flask(__name__)
-
-    # 创建 AlistClient 等 的唯一实例
-    alist_client = AlistClient(base_url=base_url, token=token)
-    alist_task_manager = AlistTaskManager(client=alist_client)
-    directory_manager = DirectoryManager(client=alist_client)
-    alist_service = AlistService(delete_policy=delete_policy, root_save_path=root_save_path)
-    magnet_queue_manager = MagnetQueueManager()
-    magnet_monitor = MagnetMonitor(timeout=timeout)
-
-    # 注册实例到管理器
-    dependency_manager.register(DKeys.ALIST_CLIENT, alist_client)
-    dependency_manager.register(DKeys.ALIST_SERVICE, alist_service)
-    dependency_manager.register(DKeys.ALIST_TASK_MANAGER, alist_task_manager)
-    dependency_manager.register(DKeys.DIRECTORY_MANAGER, directory_manager)
-    dependency_manager.register(DKeys.MAGNET_QUEUE_MANAGER, magnet_queue_manager)
-    dependency_manager.register(DKeys.MAGNET_MONITOR, magnet_monitor)
-
-    # 延迟注入依赖关系
-    dependency_manager.inject_dependencies()
+from backend.utils.event_loop import SharedLoopFlask
+from backend.utils.static_assets import precompress_assets
+from backend.utils.json_provider import FastJSONProvider
+from backend.utils.compression import init_compression
+from backend.utils.leader_election import LeaderElector, create_leader_lock
+from backend.utils.logging_config import loguru_logger as logger
+
+def create_app(serve_mode: str = SERVE_MODE):
+    """
+    :param serve_mode: wsgi 模式在后台线程中创建共享事件循环；
+                       asgi 模式由 asgi.py 在服务器事件循环上启动后台服务
+    """
+    app = SharedLoopFlask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
+    init_compression(app, min_size=RESPONSE_COMPRESSION_MIN_SIZE)
+
+    # 每个 Alist 后端创建各自的 AlistClient、队列管理器和监控，未配置多个后端时只有一个默认后端
+    backend_configs = ALIST_BACKENDS or [
+        {"name": "default", "base_url": base_url, "token": token, "root_save_path": root_save_path}
+    ]
+    backends = [create_backend(delete_policy=delete_policy, timeout=timeout, **config) for config in backend_configs]
+    backend_pool = AlistBackendPool(backends)
+    backend_pool.register_metrics()
+
+    # 注册实例到管理器，单实例的键指向第一个后端；各后端内部的依赖已在 create_backend 中注入
+    default_backend = backends[0]
+    dependency_manager.register(DKeys.ALIST_CLIENT, default_backend.service.task_manager.client)
+    dependency_manager.register(DKeys.ALIST_SERVICE, default_backend.service)
+    dependency_manager.register(DKeys.ALIST_TASK_MANAGER, default_backend.service.task_manager)
+    dependency_manager.register(DKeys.DIRECTORY_MANAGER, default_backend.service.directory_manager)
+    dependency_manager.register(DKeys.MAGNET_QUEUE_MANAGER, default_backend.queue_manager)
+    dependency_manager.register(DKeys.MAGNET_MONITOR, default_backend.monitor)
+    dependency_manager.register(DKeys.ALIST_BACKEND_POOL, backend_pool)
 
     CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
 
     # 应用中间件
-    token_required_middleware([rss_blueprint, magnet_blueprint, log_blueprint])
+    token_required_middleware([rss_blueprint, magnet_blueprint, log_blueprint, stats_blueprint, events_blueprint])
 
     # 注册蓝图
     app.register_blueprint(rss_blueprint, url_prefix='/api')
     app.register_blueprint(magnet_blueprint, url_prefix='/api')
     app.register_blueprint(log_blueprint, url_prefix='/api')
     app.register_blueprint(auth_blueprint, url_prefix='/api')
+    app.register_blueprint(stats_blueprint, url_prefix='/api')
+    app.register_blueprint(events_blueprint, url_prefix='/api')
+    # Prometheus 抓取地址固定为 /metrics，不需要令牌
+    app.register_blueprint(metrics_blueprint)
+
+    # 单容器部署时由 Flask 直接提供前端页面
+    if SERVE_FRONTEND:
+        precompress_assets(FRONTEND_DIST_DIR)
+        app.register_blueprint(frontend_blueprint)
 
-    # 重载app.run(debug=True, use_reloader=True)模式下，或者多worker下会有多次运行的情况
+    # 重载app.run(debug=True, use_reloader=True)模式下，或者多worker下会有多次运行的情况，
+    # 由主实例选举保证只有一个进程运行调度器和下载队列
 
     async def init_models():
         """异步初始化数据库模型"""
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade_schema)
 
     async def update_rss_and_process_queue():
         await rss_service.refresh_all_rss_feeds()
-        # 获取待处理任务
-        pending_magnets = await magnet_service.get_pending_magnets()
-        await magnet_queue_manager.add_magnets_to_queue(pending_magnets)
-        # 如果无正在进行的任务，则处理队列
-        if not magnet_queue_manager.current_magnet:
-            await magnet_queue_manager.process_magnet_queue()
+        # 从数据库认领待处理任务
+        await backend_pool.refill_queue()
+        # 空闲的后端开始处理队列
+        await backend_pool.process_magnet_queue()
+
+    async def refill_and_process_queue():
+        # 补充下载队列，接收其他实例写入数据库的新磁链和重试
+        await backend_pool.top_up_queue()
+        await backend_pool.process_magnet_queue()
+
+    async def start_background_services():
+        """在共享事件循环上初始化数据库并参与主实例选举，当选后恢复队列并启动定时任务"""
+        await init_models()
+
+        # 定时任务只在主实例上运行，未当选时保持暂停
+        scheduler = AsyncIOScheduler(event_loop=asyncio.get_running_loop())
+        scheduler.add_job(update_rss_and_process_queue, 'interval', minutes=90)
+        scheduler.add_job(refill_and_process_queue, 'interval', seconds=QUEUE_REFILL_INTERVAL.total_seconds())
+        scheduler.add_job(backend_pool.check_health, 'interval', seconds=BACKEND_HEALTH_INTERVAL.total_seconds())
+        scheduler.start(paused=True)
+
+        # 后台任务保留引用，避免执行中被垃圾回收；结束时记录异常
+        background_tasks = set()
+
+        def on_background_task_done(task: asyncio.Task):
+            background_tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"开始处理下载队列时出现错误: {task.exception()}")
+
+        async def on_elected():
+            # 从数据库恢复上次未完成的队列，接管 Alist 中仍在进行的任务，并在后台继续处理
+            await backend_pool.restore_queue()
+            await backend_pool.reconcile_alist_tasks()
+            backend_pool.active = True
+            task = asyncio.create_task(backend_pool.process_magnet_queue())
+            background_tasks.add(task)
+            task.add_done_callback(on_background_task_done)
+            scheduler.resume()
+
+        async def on_demoted():
+            scheduler.pause()
+            await backend_pool.deactivate()
+
+        elector = LeaderElector(
+            create_leader_lock(LEADER_LOCK_BACKEND, LEADER_LOCK_FILE, REDIS_URL, LEADER_LEASE_TTL),
+            LEADER_RENEW_INTERVAL, on_elected, on_demoted
+        )
+        await elector.start()
+
+        async def stop_scheduler():
+            await elector.stop()
+            scheduler.shutdown(wait=False)
+
+        app.shutdown_hooks.append(stop_scheduler)
+
+    if serve_mode == 'asgi':
+        app.startup_hooks.append(start_background_services)
+        return app
 
     # 创建并设置独立事件循环
     loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
 
     # 在后台线程中启动事件循环
     def run_loop():
+        asyncio.set_event_loop(loop)
         loop.run_forever()
 
     t = threading.Thread(target=run_loop, daemon=True)
     t.start()
 
-    # 使用 run_coroutine_threadsafe 在后台运行 init_models
-    future = asyncio.run_coroutine_threadsafe(init_models(), loop)
-    future.result()  # 等待初始化完成（可选）
+    # 视图、调度器、队列和监控都运行在这个循环上
+    app.bind_loop(loop)
+    asyncio.run_coroutine_threadsafe(start_background_services(), loop).result()
 
-    scheduler = AsyncIOScheduler(event_loop=loop)
-    scheduler.add_job(update_rss_and_process_queue, 'interval', minutes=90)
-    scheduler.start()
-    
     return app
 
 app = create_app()
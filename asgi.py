@@ -0,0 +1,13 @@
+# asgi.py
+# ASGI 入口，视图、调度器、队列和监控共用服务器的同一个事件循环：
+#   uvicorn asgi:application --host 0.0.0.0 --port 5000
+import os
+
+# 必须在导入 app 之前设置，避免 create_app 另起后台事件循环线程
+os.environ.setdefault("ANIALIST_SERVE_MODE", "asgi")
+
+from app import app
+from backend.core.config import ASGI_WORKER_THREADS
+from backend.utils.asgi_bridge import WsgiToAsgiBridge
+
+application = WsgiToAsgiBridge(app, max_workers=ASGI_WORKER_THREADS)
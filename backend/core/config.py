@@ -1,5 +1,7 @@
+import os
+import json
 from datetime import timedelta
-from backend.services.alist_api.task_constants import DeletePolicy
+from backend.services.alist_api.task_constants import DeletePolicy, DownloaderType
 
 # 用户存储
 users = {
@@ -17,11 +19,66 @@ token = "alist-391ab7ce-01ba-4f05-b3b9-7e26c8b59a363mdCDmKaQaAiiNMVUriWzKYyzwJQT
 
 # 网盘存储目录
 root_save_path = '/123pan/test'
+
+# 多个 Alist 后端，每个后端有自己的下载通道；为空时只使用上面的 base_url、token、root_save_path。
+# JSON 列表，每项包含 name、base_url、token、root_save_path，可选 capacity（相对处理能力，默认 1）
+# 和 feeds（优先路由到该后端的订阅 id），例如：
+# [{"name": "home", "base_url": "http://10.0.0.2:5244", "token": "...", "root_save_path": "/115/anime", "capacity": 2, "feeds": [1, 3]}]
+ALIST_BACKENDS = json.loads(os.environ.get("ANIALIST_ALIST_BACKENDS", "[]"))
+# Alist 上可用的离线下载工具，新任务在其中按负载、成功率和速度分配，出错时改用其他工具
+DOWNLOADER_TOOLS = [
+    DownloaderType(tool.strip())
+    for tool in os.environ.get("ANIALIST_DOWNLOADER_TOOLS", "qBittorrent,aria2").split(",") if tool.strip()
+]
+# 检查各 Alist 后端是否可以访问的间隔
+BACKEND_HEALTH_INTERVAL = timedelta(minutes=1)
 # 离线任务完成后对于下载资源的操作
 delete_policy = DeletePolicy.DELETE_ALWAYS
-timeout = timedelta(minutes=90)  # 任务超时时间，分钟
+timeout = timedelta(minutes=90)  # 任务超时时间，分钟；有进度数据后按速率推算，不低于该值
 interval_time = timedelta(seconds=10) # 监视任务完成间隔，秒
 
+# 按速率推算超时时预留的余量倍数
+TASK_TIMEOUT_SAFETY_FACTOR = 1.5
+# 单个任务的最长处理时间，大体积合集也不会超过
+MAX_TASK_TIMEOUT = timedelta(hours=24)
+# 估算下载速率的采样窗口
+PROGRESS_WINDOW = timedelta(minutes=15)
+# 进度持续不增长（含一直为 0，如没有做种者）超过该时间视为停滞
+STALL_TIMEOUT = timedelta(minutes=20)
+# 每个磁链最多推送的次数，用完后标记为失败
+MAX_TASK_ATTEMPTS = 3
+# 失败后重新排队的等待时间，每多失败一次翻倍
+RETRY_BACKOFF = timedelta(minutes=30)
+
+# 每次从数据库认领进入下载队列的磁链数量
+QUEUE_CLAIM_BATCH = 50
+# 下载队列调度策略：fifo 按优先级和入队先后；round_robin 按订阅轮流；drr 按订阅权重加权轮流
+SCHEDULING_POLICY = os.environ.get("ANIALIST_SCHEDULING_POLICY", "drr")
+# 插队时如何处理正在下载的任务：keep 保留原 Alist 任务继续下载，恢复时重新接管监控；cancel 取消原任务，恢复时重新下载
+INTERRUPT_MODE = os.environ.get("ANIALIST_INTERRUPT_MODE", "keep")
+# 主实例补充下载队列的间隔，用于接收其他实例写入数据库的磁链和重试
+QUEUE_REFILL_INTERVAL = timedelta(minutes=1)
+
+# 多 worker / 多实例部署时只有主实例运行调度器和下载队列：
+# file 为本机文件锁（同一主机的多个 worker），redis 为 Redis 租约（跨主机部署）
+LEADER_LOCK_BACKEND = os.environ.get("ANIALIST_LEADER_LOCK", "file")
+LEADER_LOCK_FILE = os.environ.get(
+    "ANIALIST_LEADER_LOCK_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "scheduler.lock")
+)
+REDIS_URL = os.environ.get("ANIALIST_REDIS_URL", "redis://localhost:6379/0")
+# Redis 租约有效期，秒；主实例异常退出后最多这么久其他实例接任
+LEADER_LEASE_TTL = 30
+# 竞选和续约的间隔，秒
+LEADER_RENEW_INTERVAL = 10
+
+# 订阅元数据缓存的最大条目数
+FEED_CACHE_SIZE = 256
+# 订阅缓存过期时间，秒；多实例共享数据库时其他实例的修改最多延迟这么久可见，None 表示不过期
+FEED_CACHE_TTL = 60
+# 统计结果缓存时间，秒
+STATS_CACHE_TTL = 30
+
 SECRET_KEY = 'your_super_secret_key'
 
 BLOCKED_WORDS = [
@@ -31,4 +88,27 @@ BLOCKED_WORDS = [
 ]
 
 # token过期刷新窗口为 10 分钟
-REFRESH_WINDOW = timedelta(minutes=10)  
\ No newline at end of file
+REFRESH_WINDOW = timedelta(minutes=10)
+# 多 worker / 多实例部署时，每个进程最多每隔这么多秒从数据库同步一次吊销的 Token
+TOKEN_REVOCATION_SYNC_INTERVAL = 5
+
+# 登录限流：同一 IP 在时间窗口内最多尝试的次数
+LOGIN_MAX_ATTEMPTS = 10
+LOGIN_ATTEMPT_WINDOW = timedelta(minutes=1)
+# 执行 bcrypt 校验的线程数，限制登录高峰占用的 CPU
+LOGIN_HASH_WORKERS = 2  
+
+# 超过该字节数的 JSON/文本响应按 Accept-Encoding 压缩
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# 服务模式：wsgi 为 Flask/WSGI 服务器（后台线程运行事件循环），asgi 为 uvicorn asgi:application
+SERVE_MODE = os.environ.get("ANIALIST_SERVE_MODE", "wsgi")
+# asgi 模式下执行 Flask 请求的线程数
+ASGI_WORKER_THREADS = int(os.environ.get("ANIALIST_ASGI_WORKER_THREADS", 32))
+
+# 由本服务直接提供 frontend/dist 前端页面，无需额外的 nginx
+SERVE_FRONTEND = os.environ.get("ANIALIST_SERVE_FRONTEND", "false").lower() == "true"
+FRONTEND_DIST_DIR = os.environ.get(
+    "ANIALIST_FRONTEND_DIST_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "dist")
+)
@@ -5,4 +5,6 @@ Base = declarative_base()
 
 # 导入所有模型以便于外部可以访问
 from .rss_feed import RSSFeed
-from .task import Magnet
+from .task import Magnet, MagnetState, ACTIVE_STATES
+from .revoked_token import RevokedToken
+from .collection_version import CollectionVersion
@@ -0,0 +1,9 @@
+from . import Base
+from sqlalchemy import Column, Integer, String
+
+class CollectionVersion(Base):
+    """每个数据集合一行版本号，写操作在同一事务中加一，所有 worker / 实例共享，用于 ETag 和缓存键"""
+    __tablename__ = 'collection_versions'
+
+    name = Column(String(32), primary_key=True)  # 集合名称，见 backend.utils.collection_versions
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,9 @@
+from . import Base
+from sqlalchemy import Column, String, Float
+
+class RevokedToken(Base):
+    """注销或刷新后吊销的 Token，多个 worker / 实例共享，保留到 Token 自然过期为止"""
+    __tablename__ = 'revoked_tokens'
+
+    token_hash = Column(String(64), primary_key=True)  # Token 的 SHA-256，不保存 Token 本身
+    expires_at = Column(Float, nullable=False, index=True)  # Token 的 exp（epoch 秒）
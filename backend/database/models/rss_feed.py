@@ -10,5 +10,7 @@ class RSSFeed(Base):
     url = Column(String(255), nullable=False, unique=True)
     last_updated = Column(DateTime, nullable=False)
     should_update = Column(Boolean, default=True)
+    weight = Column(Integer, nullable=False, default=1)  # 公平调度时的权重，越大每轮处理的磁链越多
 
-    magnets = relationship('Magnet', back_populates='rss_feed')
\ No newline at end of file
+    # 删除订阅时由数据库外键级联删除其磁链，ORM 侧不再逐条加载删除
+    magnets = relationship('Magnet', back_populates='rss_feed', cascade='all, delete-orphan', passive_deletes=True)
\ No newline at end of file
@@ -1,33 +1,107 @@
+import re
+import base64
 import hashlib
+from enum import Enum
+from typing import Optional
 from . import Base
 from datetime import datetime
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+
+# 磁链中的 BitTorrent infohash，40 位十六进制或 32 位 base32
+BTIH_RE = re.compile(r"urn:btih:([0-9a-f]{40}|[a-z2-7]{32})", re.IGNORECASE)
+
+class MagnetState(Enum):
+    PENDING = "pending"             # 待处理，尚未进入内存队列
+    QUEUED = "queued"               # 已被认领进入下载队列
+    DOWNLOADING = "downloading"     # 已推送到 Alist 离线下载
+    TRANSFERRING = "transferring"   # 下载完成，正在上传到网盘
+    SUSPENDED = "suspended"         # 被插队挂起，原任务已取消，恢复时重新推送
+    DONE = "done"                   # 上传完成
+    FAILED = "failed"               # 失败，需要人工重试
+
+# 尚未完成、重启后需要恢复的状态
+ACTIVE_STATES = (MagnetState.QUEUED.value, MagnetState.DOWNLOADING.value, MagnetState.TRANSFERRING.value,
+                 MagnetState.SUSPENDED.value)
 
 class Magnet(Base):
     __tablename__ = 'magnets'
 
     id = Column(Integer, primary_key=True)
-    rss_feed_id = Column(Integer, ForeignKey('rss_feeds.id'), nullable=False)
+    rss_feed_id = Column(Integer, ForeignKey('rss_feeds.id', ondelete='CASCADE'), nullable=False, index=True)
     title = Column(String(255), nullable=False)
     name = Column(String(255), nullable=False)
-    magnet_link = Column(String(255), unique=True, nullable=False)
-    magnet_hash = Column(String(64), nullable=False)  # 新增字段用于存储磁力链的散列值
-    status = Column(Boolean, default=False)
-    timestamp = Column(DateTime, default=datetime.now())
+    magnet_link = Column(Text, unique=True, nullable=False)  # 带 tracker 的磁链常超过 255 字符，PostgreSQL 会严格校验长度
+    magnet_hash = Column(String(64), nullable=False, index=True)  # 新增字段用于存储磁力链的散列值
+    infohash = Column(String(40), nullable=True, index=True)  # 小写十六进制 infohash，按 infohash 查找磁链时使用
+    state = Column(String(16), nullable=False, default=MagnetState.PENDING.value)
+    priority = Column(Integer, nullable=False, default=0)  # 越大越先下载
+    attempts = Column(Integer, nullable=False, default=0)  # 推送到 Alist 的次数
+    alist_task_id = Column(String(64), nullable=True)  # 最近一次推送对应的 Alist 离线下载任务 ID，恢复监控时使用
+    alist_transfer_id = Column(String(64), nullable=True)  # 该磁链的 Alist 上传任务 ID，下载完成后识别出来时记录
+    alist_backend = Column(String(64), nullable=True)  # 最近一次推送到的 Alist 后端名称
+    next_attempt_at = Column(DateTime, nullable=True)  # 失败后退避，在此之前不会被重新认领
+    timestamp = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    completed_at = Column(DateTime, nullable=True)  # 上传完成时间，用于统计吞吐量
 
     rss_feed = relationship('RSSFeed', back_populates='magnets')
 
-    def __init__(self, rss_feed_id, title, magnet_link, name=None, status=False):
+    def __init__(self, rss_feed_id, title, magnet_link, name=None, state=MagnetState.PENDING, priority=0):
         self.rss_feed_id = rss_feed_id
         self.title = title
         self.name = name or title
         self.magnet_link = magnet_link
         self.magnet_hash = self.generate_magnet_hash(magnet_link)  # 生成磁力链的散列值
+        self.infohash = self.extract_infohash(magnet_link)
         print(self.magnet_hash)
-        self.status = status
+        self.state = MagnetState(state).value
+        self.priority = priority
+        self.attempts = 0
+
+    @hybrid_property
+    def status(self) -> bool:
+        """兼容旧接口的完成状态，等价于 state == done"""
+        return self.state == MagnetState.DONE.value
+
+    @status.setter
+    def status(self, value: bool):
+        self.state = MagnetState.DONE.value if value else MagnetState.PENDING.value
+        self.completed_at = datetime.now() if value else None
+        if not value:
+            # 手动改回未完成（重试）时重新计算推送次数，并立即可以被认领
+            self.attempts = 0
+            self.next_attempt_at = None
+
+    @status.expression
+    def status(cls):
+        return cls.state == MagnetState.DONE.value
 
     @staticmethod
     def generate_magnet_hash(magnet_link: str) -> str:
         """生成磁力链的 MD5 散列值"""
         return hashlib.md5(magnet_link.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def extract_infohash(magnet_link: str) -> Optional[str]:
+        """提取磁链的 infohash，统一为小写十六进制；不是磁链时返回 None"""
+        match = BTIH_RE.search(magnet_link or "")
+        if not match:
+            return None
+        value = match.group(1)
+        if len(value) == 32:
+            value = base64.b32decode(value.upper()).hex()
+        return value.lower()
+
+    def matches_link(self, magnet_link: str) -> bool:
+        """判断链接是否指向同一个磁链：散列值相同，或 infohash 相同（Alist 可能改写了链接的参数）"""
+        if not magnet_link:
+            return False
+        if self.magnet_hash == self.generate_magnet_hash(magnet_link):
+            return True
+        infohash = self.extract_infohash(magnet_link)
+        return infohash is not None and infohash == self.extract_infohash(self.magnet_link)
+
+# 认领下一批待处理磁链时按 状态 -> 优先级(降序) -> id 顺序走索引
+Index('ix_magnets_state_priority', Magnet.state, Magnet.priority.desc(), Magnet.id)
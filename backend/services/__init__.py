@@ -1,4 +1,5 @@
 # /backend/services/
 from .alist_service import AlistService
 from .magnet_monitor import MagnetMonitor
-from .magnet_queue_manager import MagnetQueueManager
\ No newline at end of file
+from .magnet_queue_manager import MagnetQueueManager
+from .alist_backend_pool import AlistBackend, AlistBackendPool, create_backend
\ No newline at end of file
@@ -3,6 +3,7 @@ import aiohttp
 import urllib.parse
 from dataclasses import dataclass
 from .task_constants import TaskType, ExecutionState
+from backend.utils.metrics import ALIST_REQUEST_DURATION, ALIST_REQUEST_ERRORS
 
 @dataclass
 class AlistClient:
@@ -22,6 +23,16 @@ class AlistClient:
     async def _request(self, method: str, endpoint: str, **kwargs):
         """基础请求方法，用于发送 HTTP 请求"""
         url = urllib.parse.urljoin(self.base_url, endpoint)
+        # 去掉查询参数（任务 ID 等），避免指标标签无限增长
+        path = endpoint.split("?", 1)[0]
+        try:
+            with ALIST_REQUEST_DURATION.labels(method, path).time():
+                return await self._send(method, url, **kwargs)
+        except Exception:
+            ALIST_REQUEST_ERRORS.labels(method, path).inc()
+            raise
+
+    async def _send(self, method: str, url: str, **kwargs):
         async with aiohttp.ClientSession(trust_env=True) as session:
             # 使用对应的 HTTP 方法发送请求
             async with session.request(method, url, headers=self.headers, **kwargs) as response:
@@ -13,6 +13,7 @@ class AlistTask:
     status: TaskStatus
     progress: int
     error_msg: Optional[str] = None
+    total_bytes: Optional[int] = None  # 任务的总大小，较旧的 Alist 版本不返回
 
 
     @classmethod
@@ -23,6 +24,7 @@ class AlistTask:
         state_value = json_data.get("state")
         progress = json_data.get("progress", 0)
         error_str = json_data.get("error")
+        total_bytes = json_data.get("total_bytes") or None
 
         # 解析动作类型、文件名和目标路径
         action, file_name, target_path = cls.parse_description(description)
@@ -45,7 +47,8 @@ class AlistTask:
             target_path=target_path,
             status=status,
             progress=progress,
-            error_msg=error_str
+            error_msg=error_str,
+            total_bytes=total_bytes
         )
 
     @staticmethod
@@ -10,8 +10,8 @@ from backend.utils.logging_config import loguru_logger as logger
 class AlistTaskManager:
     client: AlistClient
 
-    async def add_download_task(self, save_path: str, urls: list[str], delete_policy: DeletePolicy = DeletePolicy.DELETE_ALWAYS, downloader_tool=DownloaderType.QBIT):
-        """添加一个新的离线下载任务"""
+    async def add_download_task(self, save_path: str, urls: list[str], delete_policy: DeletePolicy = DeletePolicy.DELETE_ALWAYS, downloader_tool=DownloaderType.QBIT) -> List[str]:
+        """添加一个新的离线下载任务，返回创建的任务 ID，失败时返回空列表"""
         try:
             # 使用 AlistClient 来发送请求
             response = await self.client.add_offline_download_task(
@@ -22,12 +22,13 @@ class AlistTaskManager:
             )
             # 从响应中提取任务 ID
             if response and 'tasks' in response and isinstance(response['tasks'], list):
-                descriptions = [task['name'] for task in response['tasks']]
-                logger.info("下载任务添加成功，任务描述：", ", ".join(descriptions))
-            else:
-                logger.debug("下载任务添加失败，未返回有效的任务信息")
+                for task in response['tasks']:
+                    logger.bind(alist_task_id=task.get('id')).info(f"下载任务添加成功，任务描述：{task.get('name')}")
+                return [task.get('id') for task in response['tasks'] if task.get('id')]
+            logger.debug("下载任务添加失败，未返回有效的任务信息")
         except Exception as e:
             logger.error(f"添加下载任务时出现错误: {e}")
+        return []
         
     async def cancel_task(self, task_id: str, task_type: TaskType):
         """取消特定任务, 指取消进行中的下载上传任务"""
@@ -45,8 +46,11 @@ class AlistTaskManager:
         except Exception as e:
             logger.error(f"清除已完成任务时出现错误: {e}")
 
-    async def list_tasks(self, task_type: TaskType, status: ExecutionState=ExecutionState.UNDONE) -> List[AlistTask]:
-        """列出指定类型和状态的任务"""
+    async def list_tasks(self, task_type: TaskType, status: ExecutionState=ExecutionState.UNDONE, raise_errors: bool = False) -> List[AlistTask]:
+        """
+        列出指定类型和状态的任务
+        :param raise_errors: 为 True 时请求失败抛出异常，否则记录错误并返回空列表
+        """
         try:
             response = await self.client.list_tasks(task_type, status)
             if response:
@@ -57,5 +61,7 @@ class AlistTaskManager:
                 logger.debug(f"没有找到 {'下载' if task_type == TaskType.DOWNLOAD else '上传'} {'完成' if status == 'done' else '未完成'} 的任务。")
                 return []
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"获取任务列表时出现错误: {e}")
             return []
\ No newline at end of file
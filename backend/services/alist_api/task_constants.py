@@ -18,6 +18,9 @@ class TaskStatus(Enum):
     BEFORE_RETRY = 9
     UNKNOWN = 10
 
+# 已无法继续的任务状态
+FAILED_TASK_STATUSES = (TaskStatus.CANCELING, TaskStatus.CANCELED, TaskStatus.ERRORED, TaskStatus.FAILING, TaskStatus.FAILED)
+
 class ExecutionState(Enum):
     DONE = 'done'
     UNDONE = 'undone'
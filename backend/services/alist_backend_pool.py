@@ -0,0 +1,267 @@
+# alist_backend_pool.py
+# 多个 Alist 后端（各自的 Alist 地址、网盘目录）组成的池：每个后端一个下载通道（队列管理器 + 监控），
+# 认领的磁链按订阅亲和、负载路由到后端，队列操作和状态在整个池上汇总
+from typing import Dict, List, Optional, Set
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from . import magnet_service, rss_service
+from .alist_service import AlistService
+from .magnet_monitor import MagnetMonitor
+from .magnet_queue_manager import MagnetQueueManager
+from backend.core.config import QUEUE_CLAIM_BATCH
+from backend.database.models import Magnet
+from backend.services.alist_api import AlistClient, AlistTaskManager, DirectoryManager
+from backend.services.alist_api.task_constants import DeletePolicy
+from backend.utils.event_bus import event_bus
+from backend.utils.metrics import QUEUE_DEPTH, BACKEND_BUSY, BACKEND_HEALTHY, LEADER
+from backend.utils.logging_config import loguru_logger as logger
+
+# 连续检查失败多少次后视为不可用
+UNHEALTHY_THRESHOLD = 2
+
+@dataclass
+class AlistBackend:
+    name: str
+    service: AlistService
+    queue_manager: MagnetQueueManager
+    monitor: MagnetMonitor
+    capacity: int = 1  # 相对处理能力，按 队列中的磁链数 / capacity 均衡负载
+    feeds: Set[int] = field(default_factory=set)  # 优先路由到该后端的订阅
+    healthy: bool = True
+    failures: int = 0
+
+    def load(self) -> float:
+        queue_manager = self.queue_manager
+        pending = len(queue_manager.download_queue) + len(queue_manager.suspended_queue)
+        return (pending + (1 if queue_manager.current_magnet else 0)) / max(self.capacity, 1)
+
+    def status(self) -> dict:
+        return {
+            **self.queue_manager.queue_state(),
+            "base_url": self.service.task_manager.client.base_url,
+            "root_save_path": self.service.root_save_path,
+            "capacity": self.capacity,
+            "feeds": sorted(self.feeds),
+            "healthy": self.healthy,
+            "load": self.load(),
+            "downloaders": self.service.balancer.status(),
+        }
+
+def create_backend(name: str, base_url: str, token: str, root_save_path: str, delete_policy: DeletePolicy,
+                   timeout: timedelta, capacity: int = 1, feeds: Optional[List[int]] = None) -> AlistBackend:
+    """创建一个后端及其下载通道，并完成通道内部的依赖注入"""
+    client = AlistClient(base_url=base_url, token=token)
+    task_manager = AlistTaskManager(client=client)
+    service = AlistService(delete_policy=delete_policy, root_save_path=root_save_path)
+    service.set_dependencies(task_manager=task_manager, directory_manager=DirectoryManager(client=client))
+    queue_manager = MagnetQueueManager(backend_name=name)
+    monitor = MagnetMonitor(timeout=timeout, backend_name=name)
+    queue_manager.set_dependencies(alist_service=service, monitor=monitor)
+    monitor.set_dependencies(task_manager=task_manager, queue_manager=queue_manager, balancer=service.balancer)
+    return AlistBackend(name=name, service=service, queue_manager=queue_manager, monitor=monitor,
+                        capacity=max(int(capacity), 1), feeds=set(feeds or []))
+
+class AlistBackendPool:
+    """
+    后端池，对外提供与 MagnetQueueManager 相同的队列操作，内部分派到各个后端的下载通道。
+    只有一个后端时行为与单个队列管理器一致。
+    """
+    def __init__(self, backends: List[AlistBackend]):
+        if not backends:
+            raise ValueError("至少需要一个 Alist 后端")
+        self.backends = backends
+        self.backends_by_name: Dict[str, AlistBackend] = {backend.name: backend for backend in backends}
+        for backend in backends:
+            backend.queue_manager.pool = self
+
+    @property
+    def lanes(self) -> List[MagnetQueueManager]:
+        return [backend.queue_manager for backend in self.backends]
+
+    @property
+    def active(self) -> bool:
+        return any(lane.active for lane in self.lanes)
+
+    @active.setter
+    def active(self, value: bool):
+        for lane in self.lanes:
+            lane.active = value
+
+    @property
+    def current_magnet(self) -> Optional[Magnet]:
+        """任一通道正在处理的磁链"""
+        return next((lane.current_magnet for lane in self.lanes if lane.current_magnet), None)
+
+    def route(self, magnet: Magnet) -> AlistBackend:
+        """
+        选择处理磁链的后端：只考虑可用的后端（全部不可用时不做限制），
+        其中有该订阅亲和设置的后端优先，再选负载最低的。
+        """
+        candidates = [backend for backend in self.backends if backend.healthy] or self.backends
+        preferred = [backend for backend in candidates if magnet.rss_feed_id in backend.feeds]
+        return min(preferred or candidates, key=lambda backend: backend.load())
+
+    def backend_of(self, magnet_id: int) -> Optional[AlistBackend]:
+        """磁链所在的后端（正在处理或在队列中）"""
+        for backend in self.backends:
+            queue_manager = backend.queue_manager
+            if (queue_manager.current_magnet and queue_manager.current_magnet.id == magnet_id) \
+                    or magnet_id in queue_manager.download_queue or magnet_id in queue_manager.suspended_queue:
+                return backend
+        return None
+
+    def publish_queue_state(self):
+        """广播整个池的当前任务和队列长度，以及每个后端的状态"""
+        lanes = [lane.queue_state() for lane in self.lanes]
+        event_bus.publish("queue", {
+            "current": next((lane["current"] for lane in lanes if lane["current"]), None),
+            "queued": sum(lane["queued"] for lane in lanes),
+            "suspended": sum(lane["suspended"] for lane in lanes),
+            "backends": lanes,
+        })
+
+    def status(self) -> List[dict]:
+        return [backend.status() for backend in self.backends]
+
+    def register_metrics(self):
+        """队列长度、后端状态等指标在抓取时从池中读取"""
+        QUEUE_DEPTH.set_function(lambda: {
+            key: value
+            for backend in self.backends
+            for key, value in (
+                ((backend.name, "download"), len(backend.queue_manager.download_queue)),
+                ((backend.name, "suspended"), len(backend.queue_manager.suspended_queue)),
+            )
+        })
+        BACKEND_BUSY.set_function(lambda: {
+            (backend.name,): float(backend.queue_manager.current_magnet is not None) for backend in self.backends
+        })
+        BACKEND_HEALTHY.set_function(lambda: {(backend.name,): float(backend.healthy) for backend in self.backends})
+        LEADER.set_function(lambda: {(): float(self.active)})
+
+    async def add_magnets_to_queue(self, magnets: List[Magnet]):
+        """把磁链逐个路由到后端，按后端批量加入队列"""
+        routed: Dict[str, List[Magnet]] = {}
+        for magnet in magnets:
+            backend = self.route(magnet)
+            routed.setdefault(backend.name, []).append(magnet)
+            # 路由后立即计入负载，同一批磁链不会都落到同一个后端
+            await backend.queue_manager.download_queue.put(magnet)
+        for name, routed_magnets in routed.items():
+            logger.info(f"{len(routed_magnets)} 个磁链路由到 Alist 后端 {name}")
+        self.publish_queue_state()
+
+    async def refill_queue(self, limit: int = QUEUE_CLAIM_BATCH):
+        """从数据库认领下一批待处理磁链并路由到各后端"""
+        feeds = await rss_service.get_all_rss_feeds() or []
+        weights = {feed.id: feed.weight for feed in feeds}
+        for lane in self.lanes:
+            lane.policy.update_weights(weights)
+        magnets = await magnet_service.claim_next_magnets(limit, fair=self.lanes[0].policy.fair)
+        if magnets:
+            await self.add_magnets_to_queue(magnets)
+
+    async def top_up_queue(self, size: int = QUEUE_CLAIM_BATCH):
+        """所有后端的下载队列合计不足 size 个时从数据库补充"""
+        missing = size - sum(len(lane.download_queue) for lane in self.lanes)
+        if missing > 0:
+            await self.refill_queue(missing)
+
+    async def restore_queue(self):
+        """
+        启动时恢复未完成的磁链：推送过的回到原后端（该后端已不在配置中时重新路由）。
+        """
+        magnets = await magnet_service.get_active_magnets()
+        for magnet in magnets:
+            backend = self.backends_by_name.get(magnet.alist_backend) or self.route(magnet)
+            await backend.queue_manager.restore_magnet(magnet)
+        logger.info(f"从数据库恢复了 {len(magnets)} 个未完成的磁链")
+        self.publish_queue_state()
+
+    async def reconcile_alist_tasks(self):
+        """逐个后端核对遗留任务，被某个后端接管的磁链从其他后端的队列中移除"""
+        for backend in self.backends:
+            adopted = await backend.queue_manager.reconcile_alist_tasks()
+            for other in self.lanes:
+                if other is backend.queue_manager:
+                    continue
+                for magnet_id in adopted:
+                    await other.download_queue.remove(magnet_id)
+                    await other.suspended_queue.remove(magnet_id)
+        self.publish_queue_state()
+
+    async def process_magnet_queue(self):
+        """让每个空闲的后端开始处理下一个磁链"""
+        for lane in self.lanes:
+            if not lane.current_magnet:
+                await lane.process_magnet_queue()
+
+    async def deactivate(self):
+        for lane in self.lanes:
+            await lane.deactivate()
+
+    async def interrupt_and_retry_task(self, magnet: Magnet):
+        """插队：磁链已在某个后端时在该后端插队，否则路由到新的后端"""
+        backend = self.backend_of(magnet.id) or self.route(magnet)
+        await backend.queue_manager.interrupt_and_retry_task(magnet)
+
+    async def remove_magnet(self, magnet_id: int) -> bool:
+        removed = False
+        for lane in self.lanes:
+            removed = await lane.remove_magnet(magnet_id) or removed
+        return removed
+
+    async def remove_magnets_by_rss(self, rss_id: int) -> int:
+        removed = 0
+        for lane in self.lanes:
+            removed += await lane.remove_magnets_by_rss(rss_id)
+        return removed
+
+    def reprioritize_magnet(self, magnet_id: int, priority: int) -> bool:
+        return any([lane.reprioritize_magnet(magnet_id, priority) for lane in self.lanes])
+
+    def move_magnet_to_front(self, magnet_id: int) -> bool:
+        return any([lane.move_magnet_to_front(magnet_id) for lane in self.lanes])
+
+    async def rename_feed_directory(self, old_name: str, new_name: str) -> bool:
+        """在所有后端上重命名订阅的文件夹，没有该文件夹的后端跳过"""
+        renamed = False
+        for backend in self.backends:
+            service = backend.service
+            old_path = f"{service.root_save_path}/{old_name}"
+            if not await service.directory_manager.check_path_exists(old_path):
+                continue
+            if not await service.directory_manager.rename_directory(old_path, new_name):
+                return False
+            renamed = True
+        return renamed
+
+    async def check_health(self):
+        """
+        定时检查各后端是否可以访问。连续失败的后端不再接收新的磁链，
+        其队列中尚未开始的磁链重新路由到其他后端；正在处理的磁链由监控按超时处理。
+        """
+        for backend in self.backends:
+            if await backend.service.check_health():
+                if not backend.healthy:
+                    logger.info(f"Alist 后端 {backend.name} 已恢复")
+                backend.healthy, backend.failures = True, 0
+                continue
+            backend.failures += 1
+            if backend.healthy and backend.failures >= UNHEALTHY_THRESHOLD:
+                backend.healthy = False
+                logger.warning(f"Alist 后端 {backend.name} 不可用，队列中的磁链转到其他后端")
+                await self.drain(backend)
+        self.publish_queue_state()
+
+    async def drain(self, backend: AlistBackend):
+        """把后端队列中尚未开始的磁链重新路由到其他可用后端"""
+        if not any(other.healthy for other in self.backends if other is not backend):
+            return
+        queue = backend.queue_manager.download_queue
+        magnets = queue.items()
+        for magnet in magnets:
+            await queue.remove(magnet.id)
+        if magnets:
+            await self.add_magnets_to_queue(magnets)
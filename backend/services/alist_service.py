@@ -3,10 +3,12 @@
 from typing import List, Optional
 from dataclasses import dataclass, field
 from .rss_service import get_rss_feed_by_id
+from .downloader_balancer import DownloaderBalancer
 from backend.database.models import Magnet
 from backend.utils.logging_config import loguru_logger as logger
-from backend.services.alist_api import AlistTaskManager, DirectoryManager
+from backend.services.alist_api import AlistTask, AlistTaskManager, DirectoryManager
 from backend.services.alist_api.task_constants import TaskType, DeletePolicy, ExecutionState
+from backend.core.config import DOWNLOADER_TOOLS
 
 @dataclass
 class AlistService:
@@ -14,6 +16,7 @@ class AlistService:
     root_save_path: str
     task_manager: Optional[AlistTaskManager] = field(default=None)
     directory_manager: Optional[DirectoryManager] = field(default=None)
+    balancer: DownloaderBalancer = field(default_factory=lambda: DownloaderBalancer(DOWNLOADER_TOOLS))
 
     def set_dependencies(self, **kwargs):
         for key, value in kwargs.items():
@@ -48,17 +51,63 @@ class AlistService:
             # 3. 清除所有已完成的下载任务和上传任务
             await self.task_manager.clear_done_tasks(TaskType.DOWNLOAD)
             await self.task_manager.clear_done_tasks(TaskType.TRANSFER)
+            self.balancer.reset()
         except Exception as e:
             logger.error(f"重置所有离线任务时出现错误: {e}")
 
-    async def retry_download_task(self, save_path: str, urls: List[str]):
-        """重试下载任务，先取消所有未完成的任务，再清除已完成的任务，最后添加新任务"""
+    async def retry_download_task(self, save_path: str, urls: List[str]) -> List[str]:
+        """重试下载任务，先取消所有未完成的任务，再清除已完成的任务，最后添加新任务，返回新任务 ID"""
         try:
             await self.reset_all_offline_tasks()
             # 4. 添加新的离线下载任务
-            await self.task_manager.add_download_task(save_path, urls, self.delete_policy)
+            return await self.add_download_task(save_path, urls)
         except Exception as e:
             logger.error(f"重试下载任务时出现错误: {e}")
+            return []
+
+    async def add_download_task(self, save_path: str, urls: List[str]) -> List[str]:
+        """
+        添加下载任务，不影响已有任务，返回新任务 ID。
+        按负载、成功率和速度选择下载工具，添加失败时改用下一个工具。
+        """
+        for tool in self.balancer.candidates():
+            task_ids = await self.task_manager.add_download_task(save_path, urls, self.delete_policy, downloader_tool=tool)
+            if task_ids:
+                self.balancer.started(tool, task_ids)
+                logger.debug(f"下载任务交给 {tool.value}")
+                return task_ids
+            self.balancer.add_failed(tool)
+        return []
+
+    async def list_tasks(self, task_type: TaskType, task_state: ExecutionState = ExecutionState.UNDONE) -> List[AlistTask]:
+        """列出完成/未完成的下载或上传任务，请求失败时抛出异常（与没有任务区分开）"""
+        return await self.task_manager.list_tasks(task_type=task_type, status=task_state, raise_errors=True)
+
+    async def cancel_task(self, task_id: str, task_type: TaskType):
+        """取消指定的下载或上传任务"""
+        await self.task_manager.cancel_task(task_id, task_type)
+
+    async def cancel_download_task(self, task_id: str):
+        """取消指定的下载任务"""
+        await self.task_manager.cancel_task(task_id, TaskType.DOWNLOAD)
+        self.balancer.forget(task_id)
+
+    async def find_download_task(self, task_id: str) -> Optional[AlistTask]:
+        """按 ID 查找下载任务（未完成和已完成的都会查找），不存在时返回 None"""
+        for state in (ExecutionState.UNDONE, ExecutionState.DONE):
+            for task in await self.task_manager.list_tasks(task_type=TaskType.DOWNLOAD, status=state):
+                if task.tid == task_id:
+                    return task
+        return None
+
+    async def check_health(self) -> bool:
+        """检查 Alist 是否可以访问"""
+        try:
+            await self.task_manager.client.get_alist_version()
+            return True
+        except Exception as e:
+            logger.warning(f"Alist {self.task_manager.client.base_url} 无法访问: {e}")
+            return False
 
     async def get_task_save_path(self, magnet: Magnet) -> str:
         # 1. 获取 task 对应 rss 的 name
@@ -0,0 +1,110 @@
+# downloader_balancer.py
+# 在 Alist 的多个离线下载工具（aria2、qBittorrent）之间分配新任务
+import time
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+
+from backend.services.alist_api.task_constants import DownloaderType
+from backend.utils.logging_config import loguru_logger as logger
+
+# 速度的指数平均系数，越大越看重最近的任务
+SPEED_SMOOTHING = 0.3
+# 工具添加任务出错后暂时靠后的时间，秒
+ERROR_COOLDOWN = 300
+
+@dataclass
+class DownloaderStats:
+    tool: DownloaderType
+    in_flight: set = field(default_factory=set)  # 进行中的任务 ID
+    succeeded: int = 0
+    failed: int = 0
+    speed: Optional[float] = None  # 下载速率的指数平均，字节/秒
+    cooldown_until: float = 0
+
+    def success_rate(self) -> float:
+        """平滑后的成功率，没有历史时为 0.5"""
+        return (self.succeeded + 1) / (self.succeeded + self.failed + 2)
+
+    def score(self, best_speed: Optional[float]) -> float:
+        """成功率乘以相对最快工具的速度（0~1），没有速度记录时只看成功率"""
+        if not self.speed or not best_speed:
+            return self.success_rate()
+        return self.success_rate() * self.speed / best_speed
+
+    def to_dict(self) -> dict:
+        return {
+            "tool": self.tool.value,
+            "in_flight": len(self.in_flight),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "success_rate": round(self.success_rate(), 3),
+            "speed": self.speed,
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+class DownloaderBalancer:
+    """
+    记录每个下载工具进行中的任务、成功率和速度，新任务优先交给出错冷却外、进行中任务最少、
+    成功率和速度最高的工具；添加失败时由调用方按顺序改用下一个工具。
+    """
+    def __init__(self, tools: List[DownloaderType]):
+        self.stats: Dict[DownloaderType, DownloaderStats] = {tool: DownloaderStats(tool) for tool in tools}
+        self._task_tools: Dict[str, DownloaderType] = {}  # 任务 ID -> 下载工具
+
+    def candidates(self) -> List[DownloaderType]:
+        """按优先顺序返回全部下载工具"""
+        now = time.monotonic()
+        best_speed = max((stats.speed for stats in self.stats.values() if stats.speed), default=None)
+        ranked = sorted(
+            self.stats.values(),
+            key=lambda stats: (stats.cooldown_until > now, len(stats.in_flight), -stats.score(best_speed))
+        )
+        return [stats.tool for stats in ranked]
+
+    def started(self, tool: DownloaderType, task_ids: List[str]):
+        """工具成功添加了任务"""
+        stats = self.stats[tool]
+        stats.cooldown_until = 0
+        for task_id in task_ids:
+            stats.in_flight.add(task_id)
+            self._task_tools[task_id] = tool
+
+    def add_failed(self, tool: DownloaderType):
+        """工具添加任务失败，暂时排到最后"""
+        stats = self.stats[tool]
+        stats.failed += 1
+        stats.cooldown_until = time.monotonic() + ERROR_COOLDOWN
+        logger.warning(f"下载工具 {tool.value} 添加任务失败，{ERROR_COOLDOWN} 秒内优先使用其他工具")
+
+    def finished(self, task_id: str, success: bool, speed: Optional[float] = None):
+        """
+        任务下载结束（成功或失败），更新该工具的统计。
+        :param speed: 下载速率，字节/秒；不同大小的种子按百分比计算的速率不可比较，调用方需要换算为字节
+        """
+        tool = self._task_tools.pop(task_id, None)
+        if tool is None:
+            return
+        stats = self.stats[tool]
+        stats.in_flight.discard(task_id)
+        if success:
+            stats.succeeded += 1
+            if speed:
+                stats.speed = speed if stats.speed is None else \
+                    SPEED_SMOOTHING * speed + (1 - SPEED_SMOOTHING) * stats.speed
+        else:
+            stats.failed += 1
+
+    def forget(self, task_id: str):
+        """任务被取消，只从进行中移除，不计入成功率"""
+        tool = self._task_tools.pop(task_id, None)
+        if tool is not None:
+            self.stats[tool].in_flight.discard(task_id)
+
+    def reset(self):
+        """所有任务被重置时清空进行中的任务"""
+        self._task_tools.clear()
+        for stats in self.stats.values():
+            stats.in_flight.clear()
+
+    def status(self) -> List[dict]:
+        return [stats.to_dict() for stats in self.stats.values()]
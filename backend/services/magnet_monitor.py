@@ -1,23 +1,43 @@
 # magnet_monitor.py
 import asyncio
-from typing import Optional
+from typing import List, Optional, Set, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
-from .magnet_service import update_magnet
-from backend.database.models import Magnet
-from backend.services.alist_api import AlistTaskManager
-from backend.services.alist_api.task_constants import TaskStatus, TaskType, ExecutionState
-from backend.core.config import interval_time
+from .magnet_service import set_magnet_state
+from backend.database.models import Magnet, MagnetState
+from backend.services.alist_api import AlistTask, AlistTaskManager
+from backend.services.alist_api.task_constants import TaskStatus, TaskType, ExecutionState, FAILED_TASK_STATUSES
+from backend.core.config import (
+    interval_time, TASK_TIMEOUT_SAFETY_FACTOR, MAX_TASK_TIMEOUT, PROGRESS_WINDOW, STALL_TIMEOUT,
+    MAX_TASK_ATTEMPTS, RETRY_BACKOFF
+)
+from backend.utils.event_bus import event_bus
+from backend.utils.progress_tracker import ProgressTracker
+from .downloader_balancer import DownloaderBalancer
+from backend.utils.metrics import MAGNET_COMPLETIONS, MAGNET_FAILURES, MAGNET_PROCESSING_DURATION
 from backend.utils.logging_config import loguru_logger as logger
 
 @dataclass
 class MagnetMonitor:
-    timeout: timedelta  # 示例默认值
+    timeout: timedelta  # 没有进度数据时的基础超时
+    backend_name: str = "default"  # 所属的 Alist 后端
     task_manager: Optional[AlistTaskManager] = field(default=None) # 延迟注入
     monitored_magnet: Optional[Magnet] = field(default=None)
-    start_time: Optional[datetime] = field(default=None)
+    start_time: Optional[datetime] = field(default=None)  # 当前阶段（下载/上传）的开始时间
+    monitoring_since: Optional[datetime] = field(default=None)  # 开始监控该磁链的时间
     queue_manager = None  # 延迟注入
+    balancer: Optional[DownloaderBalancer] = field(default=None)  # 下载工具统计，延迟注入
+    _monitor_task: Optional[asyncio.Task] = field(default=None, repr=False)
+    # 当前阶段（下载/上传）的进度采样，阶段切换时重新开始
+    tracker: ProgressTracker = field(default_factory=lambda: ProgressTracker(PROGRESS_WINDOW), repr=False)
+    _tracked_state: Optional[str] = field(default=None, repr=False)
+    current_task: Optional[AlistTask] = field(default=None, repr=False)  # 最近一次查询到的未完成 Alist 任务
+    download_task: Optional[AlistTask] = field(default=None, repr=False)  # 该磁链已完成的下载任务
+    # 观察到该磁链下载尚未完成时已存在的上传任务 ID，之后新出现的上传任务才可能属于它；
+    # None 表示还没有观察到下载未完成（例如恢复监控时下载已完成）
+    earlier_transfers: Optional[Set[str]] = field(default=None, repr=False)
+    failure_reason: Optional[str] = field(default=None, repr=False)  # Alist 任务已失败时的原因
 
     def set_dependencies(self, **kwargs):
         for key, value in kwargs.items():
@@ -34,9 +54,19 @@ class MagnetMonitor:
         if magnet:
             self.monitored_magnet = magnet
             self.start_time = datetime.now()
+            self.monitoring_since = self.start_time
+            self.tracker.reset(self.start_time)
+            self._tracked_state = magnet.state
+            self.current_task = None
+            self.download_task = None
+            self.failure_reason = None
+            self.earlier_transfers = None
             logger.info(f"开始监控任务: {magnet.name}")
-            # 调用监控任务
-            await self.monitor_magnet()
+            # 在共享事件循环上后台监控，调用方（请求处理、定时任务）无需等待任务完成
+            previous_task = self._monitor_task
+            self._monitor_task = asyncio.create_task(self.monitor_magnet())
+            if previous_task and not previous_task.done() and previous_task is not asyncio.current_task():
+                previous_task.cancel()
 
     async def stop_monitoring(self):
         """
@@ -45,33 +75,133 @@ class MagnetMonitor:
         if self.monitored_magnet:
             logger.info(f"停止监控任务: {self.monitored_magnet.name}")
         self.monitored_magnet = None
+        event_bus.publish("progress", {"backend": self.backend_name, "magnet_id": None})
         self.start_time = None
+        self.current_task = None
+        self.download_task = None
+        self.earlier_transfers = None
+        self.failure_reason = None
         # 通知queue_manager开始下一个任务
         await self.queue_manager.process_magnet_queue()
 
+    def cancel(self):
+        """
+        停止监控但不处理下一个任务，卸任主实例时调用。
+        """
+        if self._monitor_task and not self._monitor_task.done():
+            self._monitor_task.cancel()
+        self._monitor_task = None
+        self.monitored_magnet = None
+        self.start_time = None
+        self.current_task = None
+        self.download_task = None
+        self.earlier_transfers = None
+        self.failure_reason = None
+
     async def monitor_magnet(self):
         """
         定期检查被监控任务的状态。
         """
         while True:
-            await asyncio.sleep(interval_time)  # 每X秒检查一次
+            await asyncio.sleep(interval_time.total_seconds())  # 每X秒检查一次
 
             if not self.monitored_magnet:
                 break
 
             # 检查任务状态
             try:
+                await self.report_progress()
                 if await self.check_status():
                     return
             except Exception as e:
                 logger.error(f"检查任务状态时发生错误: {e}")
 
-            if self.start_time and datetime.now() - self.start_time > self.timeout:
-                # 任务超时处理
-                logger.warning(f"任务超时: {self.monitored_magnet.name}")
-                await self.stop_monitoring()
+            if not self.monitored_magnet:
+                break
+            failure = self.detect_failure(datetime.now())
+            if failure:
+                await self.handle_failure(*failure)
                 break
 
+    def deadline(self) -> datetime:
+        """
+        当前任务的超时时间：没有可用的速率时为开始时间加基础超时；
+        有速率时按剩余进度推算并乘以余量，不低于基础超时，不超过最长处理时间。
+        """
+        base = self.start_time + self.timeout
+        remaining = self.tracker.estimate_remaining()
+        if remaining is None:
+            return base
+        projected = datetime.now() + remaining * TASK_TIMEOUT_SAFETY_FACTOR
+        return min(max(base, projected), self.start_time + MAX_TASK_TIMEOUT)
+
+    def detect_failure(self, now: datetime) -> Optional[Tuple[str, str]]:
+        """
+        判断任务是否失败、停滞或超时，正常时返回 None。
+        :return: (类型, 原因)，类型为 alist_failed、stalled 或 timeout
+        """
+        if not self.start_time:
+            return None
+        if self.failure_reason:
+            return "alist_failed", self.failure_reason
+        stalled = self.tracker.stalled_for(now)
+        if stalled >= STALL_TIMEOUT:
+            if self.tracker.best_progress <= 0:
+                return "stalled", f"{int(stalled.total_seconds() // 60)} 分钟没有任何进度，可能没有做种者"
+            return "stalled", f"进度停留在 {self.tracker.progress:.1f}% 已 {int(stalled.total_seconds() // 60)} 分钟"
+        if now > self.deadline():
+            return "timeout", f"超时（已处理 {int((now - self.start_time).total_seconds() // 60)} 分钟）"
+        return None
+
+    async def handle_failure(self, kind: str, reason: str):
+        """
+        取消失败的 Alist 任务以释放下载位；推送次数未用完时按退避时间放回待处理，
+        用完后标记为失败，随后开始处理下一个磁链。
+        """
+        magnet = self.monitored_magnet
+        logger.warning(f"任务 {magnet.name} 处理失败: {reason}")
+        if self.balancer and magnet.state != MagnetState.TRANSFERRING.value and magnet.alist_task_id:
+            self.balancer.finished(magnet.alist_task_id, success=False)
+        await self.cancel_alist_task(magnet)
+        await self.record_failure(magnet, kind, reason)
+        await self.stop_monitoring()
+
+    async def record_failure(self, magnet: Magnet, kind: str, reason: str, count_attempt: bool = False):
+        """
+        记录一次失败：推送次数用完时标记为失败，否则按退避时间放回待处理。
+        :param count_attempt: 失败的这次推送尚未计入推送次数时为 True（推送本身失败）
+        """
+        if count_attempt:
+            magnet.attempts = (magnet.attempts or 0) + 1
+        attempts = magnet.attempts or 0
+        outcome = "failed" if attempts >= MAX_TASK_ATTEMPTS else "retry"
+        MAGNET_FAILURES.labels(self.backend_name, kind, outcome).inc()
+        if outcome == "failed":
+            await set_magnet_state(magnet.id, MagnetState.FAILED, count_attempt=count_attempt)
+            logger.warning(f"任务 {magnet.name} 已推送 {attempts} 次，标记为失败")
+            event_bus.publish("failed", {"magnet_id": magnet.id, "name": magnet.name, "reason": reason})
+        else:
+            retry_at = datetime.now() + RETRY_BACKOFF * 2 ** max(attempts - 1, 0)
+            await set_magnet_state(magnet.id, MagnetState.PENDING, count_attempt=count_attempt, next_attempt_at=retry_at)
+            logger.info(f"任务 {magnet.name} 将在 {retry_at:%Y-%m-%d %H:%M:%S} 后重试（第 {attempts} 次失败）")
+            event_bus.publish("retry", {
+                "magnet_id": magnet.id, "name": magnet.name, "reason": reason,
+                "attempts": attempts, "retry_at": retry_at.isoformat(),
+            })
+
+    async def cancel_alist_task(self, magnet: Magnet):
+        """取消磁链当前阶段的 Alist 任务，失败只记录日志"""
+        try:
+            if magnet.state == MagnetState.TRANSFERRING.value:
+                if self.current_task:
+                    await self.task_manager.cancel_task(self.current_task.tid, TaskType.TRANSFER)
+            else:
+                task_id = magnet.alist_task_id or (self.current_task.tid if self.current_task else None)
+                if task_id:
+                    await self.task_manager.cancel_task(task_id, TaskType.DOWNLOAD)
+        except Exception as e:
+            logger.error(f"取消任务 {magnet.name} 的 Alist 任务时发生错误: {e}")
+
     async def mark_magnet_as_completed(self):
         """
         标记任务为完成状态。
@@ -81,11 +211,86 @@ class MagnetMonitor:
 
         try:
             # 更新数据库中的任务状态
-            await update_magnet(self.monitored_magnet.id, {"status": True})
+            await set_magnet_state(self.monitored_magnet.id, MagnetState.DONE)
+            if self.balancer and self.monitored_magnet.alist_task_id:
+                # 没有经过上传中状态直接完成时，下载任务在这里结束
+                self.balancer.finished(self.monitored_magnet.alist_task_id, success=True)
+            self.monitored_magnet.state = MagnetState.DONE.value
+            MAGNET_COMPLETIONS.labels(self.backend_name).inc()
+            if self.monitoring_since:
+                MAGNET_PROCESSING_DURATION.labels(self.backend_name).observe(
+                    (datetime.now() - self.monitoring_since).total_seconds())
             logger.info(f"任务 {self.monitored_magnet.name} 已标记为完成")
+            event_bus.publish("completed", {"magnet_id": self.monitored_magnet.id, "name": self.monitored_magnet.name})
         except Exception as e:
             logger.error(f"标记任务为完成时发生错误: {e}")
 
+    async def report_progress(self):
+        """
+        查询被监控磁链对应的未完成 Alist 任务，广播下载/上传进度。
+        """
+        magnet = self.monitored_magnet
+        if not magnet:
+            return
+        if magnet.state == MagnetState.TRANSFERRING.value:
+            # 只使用已识别为该磁链的上传任务（见 match_transfer_task），尚未识别时不报告进度，
+            # 避免把其他磁链（挂起或接管的任务）的上传进度用于停滞检测和超时估计
+            task = None
+            if magnet.alist_transfer_id:
+                tasks = await self.task_manager.list_tasks(task_type=TaskType.TRANSFER, status=ExecutionState.UNDONE)
+                task = next((task for task in tasks if task.tid == magnet.alist_transfer_id), None)
+        else:
+            tasks = await self.task_manager.list_tasks(task_type=TaskType.DOWNLOAD, status=ExecutionState.UNDONE)
+            task = await self.match_download_task(magnet, tasks)
+        self.current_task = task
+        self.record_progress(magnet, task)
+        event_bus.publish("progress", {
+            "backend": self.backend_name,
+            "magnet_id": magnet.id,
+            "name": magnet.name,
+            "state": magnet.state,
+            "task_id": task.tid if task else None,
+            "task_status": task.status.name if task else None,
+            "progress": task.progress if task else None,
+        })
+
+    def record_progress(self, magnet: Magnet, task: Optional[AlistTask]):
+        """
+        记录进度采样，下载转为上传时重新开始采样和计时。
+        找不到对应的任务（例如上传任务尚未识别）时进度未知，暂停停滞计时，由超时兜底。
+        """
+        now = datetime.now()
+        if magnet.state != self._tracked_state:
+            self._tracked_state = magnet.state
+            self.tracker.reset(now)
+            self.start_time = now
+        if task:
+            self.tracker.record(now, task.progress)
+        else:
+            self.tracker.hold(now)
+
+    async def mark_magnet_as_transferring(self, dl_task):
+        """
+        下载任务成功后标记为上传中状态。
+        """
+        magnet = self.monitored_magnet
+        if magnet.state == MagnetState.TRANSFERRING.value or dl_task.status != TaskStatus.SUCCEEDED:
+            return
+        if await self.compare_tasks(magnet, dl_task.file_name):
+            if self.balancer:
+                # 下载阶段的速率计入该下载工具的统计
+                self.balancer.finished(dl_task.tid, success=True, speed=self.download_speed(dl_task))
+            await set_magnet_state(magnet.id, MagnetState.TRANSFERRING)
+            magnet.state = MagnetState.TRANSFERRING.value
+            logger.bind(alist_task_id=dl_task.tid).info(f"任务 {magnet.name} 下载完成，开始上传")
+
+    def download_speed(self, dl_task: AlistTask) -> Optional[float]:
+        """按进度速率和任务大小换算下载速度（字节/秒），Alist 没有返回任务大小时为 None"""
+        rate = self.tracker.rate()
+        if not dl_task.total_bytes or not rate:
+            return None
+        return rate / 100 * dl_task.total_bytes
+
     async def check_status(self) -> bool:
         """
         检查任务状态，下载为2成功，且上传为2成功，表示任务成功。
@@ -94,34 +299,89 @@ class MagnetMonitor:
             return False
 
         try:
+            # 先列出上传任务再列出下载任务：此时下载仍未完成的话，已列出的上传任务都不属于该磁链
+            transfer_tasks = await self.task_manager.list_tasks(task_type=TaskType.TRANSFER, status=ExecutionState.UNDONE) \
+                + await self.task_manager.list_tasks(task_type=TaskType.TRANSFER, status=ExecutionState.DONE)
             download_tasks = await self.task_manager.list_tasks(task_type=TaskType.DOWNLOAD, status=ExecutionState.DONE)
-            transfer_tasks = await self.task_manager.list_tasks(task_type=TaskType.TRANSFER, status=ExecutionState.DONE)
-            
+
             if len(download_tasks) > 1 or len(transfer_tasks) > 1:
-                logger.warning("监控到2个以上任务同时进行")
-                for dl_task in download_tasks:
-                    logger.debug(f"可能同时进行的任务：{dl_task.file_name}")
+                # 插队保留的任务会同时存在，按任务 ID 和磁链散列值区分
+                logger.debug(f"已完成的下载任务 {len(download_tasks)} 个，上传任务 {len(transfer_tasks)} 个")
+
+            dl_task = await self.match_download_task(self.monitored_magnet, download_tasks)
+            if not dl_task:
+                self.earlier_transfers = (self.earlier_transfers or set()) | {task.tid for task in transfer_tasks}
+                return False
+            self.download_task = dl_task
+            if dl_task.status in FAILED_TASK_STATUSES:
+                self.failure_reason = f"Alist 下载任务{dl_task.status.name}: {dl_task.error_msg or '无错误信息'}"
+                return False
+            tf_task = await self.match_transfer_task(dl_task, transfer_tasks)
+            if tf_task and tf_task.status not in (TaskStatus.SUCCEEDED, *FAILED_TASK_STATUSES):
+                # 上传仍在进行
+                await self.mark_magnet_as_transferring(dl_task)
+                return False
+            if tf_task and tf_task.status in FAILED_TASK_STATUSES:
+                self.failure_reason = f"Alist 上传任务{tf_task.status.name}: {tf_task.error_msg or '无错误信息'}"
+                return False
+
+            # 下载已完成但上传尚未完成，记录为上传中
+            if not tf_task:
+                await self.mark_magnet_as_transferring(dl_task)
 
             # 都有成功记录的时候再检查，理论上应该是一个下载成功，一个上传成功
-            if download_tasks and transfer_tasks: 
-                dl_task = download_tasks[0]
-                tf_task = transfer_tasks[0]
-                if not await self.compare_tasks(self.monitored_magnet, dl_task.file_name):
-                    logger.warning("当前监控任务与已完成任务不同")
-                    logger.debug(f"监控的任务：{self.monitored_magnet.name}，已完成的任务：{dl_task.file_name}")
-                    return False
-                if dl_task.status == TaskStatus.SUCCEEDED and tf_task.status == TaskStatus.SUCCEEDED:  # 2 表示下载已完成
-                    logger.info(f"监控的离线上传任务已完成: {self.monitored_magnet.name}")
-                    await self.mark_magnet_as_completed()
-                    await self.stop_monitoring()
-                    return True
+            elif dl_task.status == TaskStatus.SUCCEEDED and tf_task.status == TaskStatus.SUCCEEDED:  # 2 表示下载已完成
+                logger.bind(alist_task_id=tf_task.tid).info(f"监控的离线上传任务已完成: {self.monitored_magnet.name}")
+                await self.mark_magnet_as_completed()
+                await self.stop_monitoring()
+                return True
         except Exception as e:
             logger.error(f"检查任务时发生错误: {e}")
         return False
 
+    async def match_download_task(self, magnet: Magnet, tasks: List[AlistTask]) -> Optional[AlistTask]:
+        """在下载任务中找到该磁链的任务，优先按推送时记录的任务 ID 匹配，其次按磁链散列值"""
+        if magnet.alist_task_id:
+            for task in tasks:
+                if task.tid == magnet.alist_task_id:
+                    return task
+        for task in tasks:
+            if await self.compare_tasks(magnet, task.file_name):
+                return task
+        return None
+
+    async def match_transfer_task(self, dl_task: AlistTask, tasks: List[AlistTask]) -> Optional[AlistTask]:
+        """
+        找到该磁链的上传任务。上传任务的描述中不含磁链，目标路径只是订阅的文件夹，同一订阅的磁链会相同，
+        因此在下载完成后识别一次并记录任务 ID，之后按 ID 匹配：
+        候选为目标路径相同、不属于其他磁链、且在该磁链下载完成之后才出现的上传任务，取第一个。
+        没有观察到下载未完成的时刻（恢复监控时下载已完成）时，只有唯一的候选才会被采用。
+        """
+        magnet = self.monitored_magnet
+        if magnet.alist_transfer_id:
+            return next((task for task in tasks if task.tid == magnet.alist_transfer_id), None)
+
+        claimed = {other.alist_transfer_id for other in self.queue_manager.suspended_queue.items() if other.alist_transfer_id}
+        candidates = [
+            task for task in tasks
+            if task.tid not in claimed
+            and (dl_task.target_path == "unknown" or dl_task.target_path in task.target_path)
+        ]
+        if self.earlier_transfers is not None:
+            candidates = [task for task in candidates if task.tid not in self.earlier_transfers]
+        elif len(candidates) != 1:
+            return None
+        if not candidates:
+            return None
+
+        task = candidates[0]
+        magnet.alist_transfer_id = task.tid
+        await set_magnet_state(magnet.id, MagnetState(magnet.state), alist_transfer_id=task.tid)
+        logger.bind(alist_task_id=task.tid).info(f"识别到任务 {magnet.name} 的上传任务")
+        return task
+
     async def compare_tasks(self, monitored_magnet: Magnet, magnet_link: str) -> bool:
-        """根据磁力链散列值来比较任务"""
+        """根据磁力链散列值或 infohash 来比较任务"""
         if not monitored_magnet or not magnet_link:
             return False
-        magnet_hash = Magnet.generate_magnet_hash(magnet_link)
-        return monitored_magnet.magnet_hash == magnet_hash
\ No newline at end of file
+        return monitored_magnet.matches_link(magnet_link)
\ No newline at end of file
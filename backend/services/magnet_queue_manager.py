@@ -1,10 +1,20 @@
 # task_queue_manager.py
-from typing import List, Optional
+from typing import List, Optional, Set
 from dataclasses import dataclass, field
 from backend.services import AlistService
-from backend.database.models import Magnet
+from . import magnet_service, rss_service
+from .scheduling_policy import SchedulingPolicy, create_scheduling_policy
+from backend.core.config import QUEUE_CLAIM_BATCH, SCHEDULING_POLICY, INTERRUPT_MODE
+from backend.services.alist_api import AlistTask
+from backend.services.alist_api.task_constants import FAILED_TASK_STATUSES, TaskStatus, TaskType, ExecutionState
+from backend.database.models import Magnet, MagnetState
+from backend.utils.event_bus import event_bus
 from backend.utils.unique_magnet_queue import UniqueMagnetQueue as UMQueue
-from backend.utils.logging_config import loguru_logger as logger
+from backend.utils.logging_config import loguru_logger as logger, magnet_log_context
+from backend.utils.metrics import MAGNET_PUSHES
+
+# 插队时保留原 Alist 任务
+INTERRUPT_KEEP = "keep"
 
 @dataclass
 class MagnetQueueManager:
@@ -12,7 +22,12 @@ class MagnetQueueManager:
     download_queue: UMQueue = field(default_factory=lambda: UMQueue())
     suspended_queue: UMQueue = field(default_factory=lambda: UMQueue())
     current_magnet: Optional[Magnet] = field(default=None)
+    policy: SchedulingPolicy = field(default_factory=lambda: create_scheduling_policy(SCHEDULING_POLICY))
+    interrupt_mode: str = INTERRUPT_MODE
+    active: bool = False  # 是否为主实例，只有主实例推送和监控任务，其他实例只写数据库
+    backend_name: str = "default"  # 所属的 Alist 后端，每个后端一个队列管理器
     monitor = None
+    pool = None  # 所属的后端池，由后端池设置
 
     def set_dependencies(self, **kwargs):
         for key, value in kwargs.items():
@@ -22,6 +37,28 @@ class MagnetQueueManager:
             else:
                 logger.warning(f"{self.__class__.__name__} 不存在属性 {key}，跳过设置")
 
+    def queue_state(self) -> dict:
+        """当前任务和队列长度"""
+        current = self.current_magnet
+        return {
+            "backend": self.backend_name,
+            "current": {
+                "id": current.id,
+                "name": current.name,
+                "rss_feed_id": current.rss_feed_id,
+                "state": current.state,
+            } if current else None,
+            "queued": len(self.download_queue),
+            "suspended": len(self.suspended_queue),
+        }
+
+    def publish_queue_state(self):
+        """广播当前任务和队列长度，属于后端池时广播整个池的汇总"""
+        if self.pool:
+            self.pool.publish_queue_state()
+            return
+        event_bus.publish("queue", self.queue_state())
+
     async def add_magnets_to_queue(self, magnets: List[Magnet]):
         """
         将传入的未完成磁链列表加入到下载队列中，确保磁链的唯一性。
@@ -36,34 +73,281 @@ class MagnetQueueManager:
             else:
                 logger.info(f"磁链{magnet.name}已在于队列")
 
-        logger.info(f"加载了 {added_count} 个新磁链到队列，共 {len(magnets)} 个磁链尝试加入。")
+        if magnets:
+            logger.info(f"加载了 {added_count} 个新磁链到队列，共 {len(magnets)} 个磁链尝试加入。")
+        self.publish_queue_state()
+
+    async def refill_queue(self, limit: int = QUEUE_CLAIM_BATCH):
+        """
+        从数据库认领下一批待处理磁链加入下载队列，同时刷新调度策略使用的订阅权重。
+        """
+        await self.update_policy_weights()
+        magnets = await magnet_service.claim_next_magnets(limit, fair=self.policy.fair)
+        await self.add_magnets_to_queue(magnets)
+
+    async def update_policy_weights(self):
+        """从数据库刷新调度策略使用的订阅权重"""
+        feeds = await rss_service.get_all_rss_feeds() or []
+        self.policy.update_weights({feed.id: feed.weight for feed in feeds})
+
+    async def top_up_queue(self, size: int = QUEUE_CLAIM_BATCH):
+        """
+        下载队列不足 size 个时从数据库补充，定时调用，不会无限认领。
+        """
+        missing = size - len(self.download_queue)
+        if missing > 0:
+            await self.refill_queue(missing)
+
+    async def deactivate(self):
+        """
+        卸任主实例时停止处理：停止监控并清空内存队列。
+        已认领的磁链仍是已认领状态，由新的主实例从数据库恢复并接管 Alist 任务。
+        """
+        self.active = False
+        if self.monitor:
+            self.monitor.cancel()
+        self.current_magnet = None
+        self.download_queue = UMQueue()
+        self.suspended_queue = UMQueue()
+        self.publish_queue_state()
+
+    async def restore_queue(self):
+        """
+        启动时从数据库恢复上次未完成的队列，已完成的磁链不会被重新推送。
+        中断时正在下载/上传的磁链放入挂起队列，优先恢复。
+        """
+        magnets = await magnet_service.get_active_magnets()
+        for magnet in magnets:
+            await self.restore_magnet(magnet)
+        logger.info(f"从数据库恢复了 {len(magnets)} 个未完成的磁链")
+        self.publish_queue_state()
+
+    async def restore_magnet(self, magnet: Magnet):
+        """已认领的磁链回到下载队列，推送过的和被插队挂起的放入挂起队列"""
+        if magnet.state == MagnetState.QUEUED.value:
+            await self.download_queue.put(magnet)
+        else:
+            await self.suspended_queue.put(magnet)
+
+    async def reconcile_alist_tasks(self) -> Set[int]:
+        """
+        启动时核对 Alist 中遗留的任务，在 restore_queue 之后调用。
+        能按任务 ID、infohash 或散列值对应到未完成磁链的下载任务被重新接管（放入挂起队列优先恢复），
+        已下载的进度不会丢失；对应不上的孤儿任务才会被取消。
+        :return: 接管的磁链 id
+        """
+        try:
+            undone = await self.alist_service.list_tasks(TaskType.DOWNLOAD, ExecutionState.UNDONE)
+            done = await self.alist_service.list_tasks(TaskType.DOWNLOAD, ExecutionState.DONE)
+            transfers = await self.alist_service.list_tasks(TaskType.TRANSFER, ExecutionState.UNDONE)
+        except Exception as e:
+            # 无法确认 Alist 中有哪些任务时不能重置或取消任何任务，否则会丢掉进行中的下载；
+            # 挂起磁链保留任务 ID，恢复时再按 ID 重新接管
+            logger.error(f"获取 Alist 任务失败，跳过启动核对，不重置、不取消任何任务: {e}")
+            return set()
+
+        known = {magnet.id: magnet for queue in (self.suspended_queue, self.download_queue) for magnet in queue.items()}
+        adopted = {}
+        orphans: List[AlistTask] = []
+        # 同一磁链有多个任务时优先接管未完成的
+        for task in undone + [task for task in done if task.status == TaskStatus.SUCCEEDED]:
+            magnet = self.match_known_magnet(task, known.values())
+            if magnet is None:
+                magnet = await magnet_service.find_unfinished_magnet(task.file_name)
+            if magnet is None or magnet.id in adopted or task.status in FAILED_TASK_STATUSES:
+                if task in undone:
+                    orphans.append(task)
+                continue
+            adopted[magnet.id] = task
+            await self.adopt_alist_task(magnet, task)
+
+        # 没有接管到任务的挂起磁链之后需要重新推送，清除过期的任务 ID
+        for magnet in self.suspended_queue.items():
+            if magnet.id not in adopted:
+                magnet.alist_task_id = None
+
+        if not adopted:
+            # 没有可接管的任务时和以前一样全部重置
+            await self.alist_service.reset_all_offline_tasks()
+        else:
+            # 上传任务的描述中不含磁链，按目标路径判断是否属于接管的下载任务
+            adopted_paths = [task.target_path for task in adopted.values() if task.target_path != "unknown"]
+            for task in orphans:
+                await self.cancel_orphan(task, TaskType.DOWNLOAD)
+            for task in transfers:
+                if not any(path in task.target_path for path in adopted_paths):
+                    await self.cancel_orphan(task, TaskType.TRANSFER)
+        logger.info(f"启动核对完成：接管 {len(adopted)} 个 Alist 任务，取消 {len(orphans)} 个孤儿下载任务")
+        self.publish_queue_state()
+        return set(adopted)
+
+    @staticmethod
+    def match_known_magnet(task: AlistTask, magnets) -> Optional[Magnet]:
+        """在已恢复的磁链中查找任务对应的磁链，先按任务 ID，再按链接"""
+        magnets = list(magnets)
+        for magnet in magnets:
+            if magnet.alist_task_id and magnet.alist_task_id == task.tid:
+                return magnet
+        for magnet in magnets:
+            if magnet.matches_link(task.file_name):
+                return magnet
+        return None
+
+    async def adopt_alist_task(self, magnet: Magnet, task: AlistTask):
+        """接管磁链的遗留任务：记录任务 ID 并放入挂起队列，恢复时直接监控而不重新推送"""
+        with magnet_log_context(magnet):
+            await self.download_queue.remove(magnet.id)
+            await self.suspended_queue.remove(magnet.id)
+            magnet.alist_task_id = task.tid
+            if magnet.state != MagnetState.TRANSFERRING.value:
+                magnet.state = MagnetState.DOWNLOADING.value
+            await magnet_service.set_magnet_state(magnet.id, MagnetState(magnet.state), alist_task_id=task.tid)
+            await self.suspended_queue.put(magnet)
+            logger.bind(alist_task_id=task.tid).info(f"接管遗留的 Alist 任务: {magnet.name}（进度 {task.progress}%）")
+
+    async def cancel_orphan(self, task: AlistTask, task_type: TaskType):
+        try:
+            await self.alist_service.cancel_task(task.tid, task_type)
+            logger.bind(alist_task_id=task.tid).info(f"取消无法对应到磁链的 Alist 任务: {task.file_name}")
+        except Exception as e:
+            logger.error(f"取消 Alist 任务 {task.tid} 失败: {e}")
+
+    async def remove_magnets_by_rss(self, rss_id: int) -> int:
+        """
+        删除订阅后调用，清理下载队列和挂起队列中属于该订阅的磁链。
+        正在下载的任务不在此处中断，监控结束后队列会自然继续。
+        """
+        removed = 0
+        for queue in (self.download_queue, self.suspended_queue):
+            removed += await queue.remove_group(rss_id)
+        if self.current_magnet and self.current_magnet.rss_feed_id == rss_id:
+            logger.warning(f"正在下载的磁链 {self.current_magnet.name} 所属订阅已被删除")
+        logger.info(f"已从队列中移除订阅 {rss_id} 的 {removed} 个磁链")
+        self.publish_queue_state()
+        return removed
+
+    async def remove_magnet(self, magnet_id: int) -> bool:
+        """
+        从下载队列和挂起队列中移除指定磁链，例如磁链被删除时。
+        """
+        removed = await self.download_queue.remove(magnet_id)
+        removed = await self.suspended_queue.remove(magnet_id) or removed
+        if removed:
+            self.publish_queue_state()
+        return removed
+
+    def reprioritize_magnet(self, magnet_id: int, priority: int) -> bool:
+        """
+        调整下载队列中磁链的优先级，返回磁链是否在队列中。
+        """
+        if self.download_queue.reprioritize(magnet_id, priority):
+            logger.info(f"磁链 {magnet_id} 的优先级调整为 {priority}")
+            return True
+        return False
+
+    def move_magnet_to_front(self, magnet_id: int) -> bool:
+        """
+        将下载队列中的磁链移到队首，当前任务结束后立即处理。
+        """
+        if self.download_queue.move_to_front(magnet_id):
+            logger.info(f"磁链 {magnet_id} 已移到队首")
+            return True
+        return False
 
     async def process_magnet_queue(self):
         """
         监控模块监控完一个磁链后调用他，推送下一个新磁链（默认self.current_magnet应该为空）
         """
+        if not self.active:
+            return
         # 监控结束后，先清除当前magnet和alist任务信息
         if self.current_magnet:
             self.current_magnet = None
-            await self.alist_service.reset_all_offline_tasks()
+            # 挂起的磁链仍保留着 Alist 任务时不能全部重置
+            if not self.keeps_suspended_tasks():
+                await self.alist_service.reset_all_offline_tasks()
+            self.publish_queue_state()
+
+        # 其他进程只修改数据库，推送前先核对内存队列
+        await self.sync_queues_with_db()
 
         # 处理挂起队列的任务
         if not self.suspended_queue.empty():
             # 从挂起队列中获取一个磁链任务
             self.current_magnet = await self.suspended_queue.get()
-            logger.info(f"从挂起队列中恢复任务: {self.current_magnet.name}")
-            await self.push_magnet_to_task(self.current_magnet)
+            with magnet_log_context(self.current_magnet):
+                logger.info(f"从挂起队列中恢复任务: {self.current_magnet.name}")
+                await self.resume_magnet(self.current_magnet)
         # 没有挂起的任务，处理正常下载队列
         elif not self.download_queue.empty():
-            # 从下载队列中获取一个磁链任务
-            self.current_magnet = await self.download_queue.get()
-            logger.info(f"开始处理任务: {self.current_magnet.name}")
-            await self.push_magnet_to_task(self.current_magnet)
+            # 由调度策略从下载队列中选出下一个磁链任务
+            self.current_magnet = self.policy.next_magnet(self.download_queue)
+            with magnet_log_context(self.current_magnet):
+                logger.info(f"开始处理任务: {self.current_magnet.name}")
+                await self.push_magnet_to_task(self.current_magnet)
+
+    async def sync_queues_with_db(self):
+        """
+        多进程部署时，非主实例上的删除、改优先级只写数据库，不会改动主实例的内存队列。
+        推送前按数据库核对：移除已删除的磁链和已不再处于 queued 的下载队列磁链，并同步优先级（置顶的除外）。
+        查询失败时保持原样。
+        """
+        queued = self.download_queue.items()
+        suspended = self.suspended_queue.items()
+        states = await magnet_service.get_magnet_states([magnet.id for magnet in queued + suspended])
+        if states is None:
+            return
+
+        changed = False
+        for magnet in queued:
+            state = states.get(magnet.id)
+            if state is None or state[0] != MagnetState.QUEUED.value:
+                await self.download_queue.remove(magnet.id)
+                logger.info(f"磁链 {magnet.name} 已被删除或状态已改变，移出下载队列")
+                changed = True
+                continue
+            pinned, priority = self.download_queue.priority_of(magnet.id)
+            if not pinned and priority != state[1]:
+                self.download_queue.reprioritize(magnet.id, state[1])
+                magnet.priority = state[1]
+                logger.info(f"磁链 {magnet.name} 的优先级已同步为 {state[1]}")
+                changed = True
+        for magnet in suspended:
+            if magnet.id not in states:
+                await self.suspended_queue.remove(magnet.id)
+                logger.info(f"磁链 {magnet.name} 已被删除，移出挂起队列")
+                changed = True
+        if changed:
+            self.publish_queue_state()
+
+    def keeps_suspended_tasks(self) -> bool:
+        """挂起的磁链是否保留着各自的 Alist 任务（keep 模式下挂起，或启动时接管）"""
+        return any(magnet.alist_task_id for magnet in self.suspended_queue.items())
+
+    async def resume_magnet(self, magnet: Magnet):
+        """
+        恢复挂起的磁链：原 Alist 任务仍在时直接接管监控，已下载的数据不会丢失；否则重新推送。
+        """
+        if magnet.alist_task_id:
+            task = await self.alist_service.find_download_task(magnet.alist_task_id)
+            if task and task.status not in FAILED_TASK_STATUSES:
+                logger.bind(alist_task_id=task.tid).info(f"继续监控原有 Alist 任务: {magnet.name}")
+                if magnet.state not in (MagnetState.DOWNLOADING.value, MagnetState.TRANSFERRING.value):
+                    await magnet_service.set_magnet_state(magnet.id, MagnetState.DOWNLOADING)
+                    magnet.state = MagnetState.DOWNLOADING.value
+                self.publish_queue_state()
+                await self.monitor.start_monitoring(magnet)
+                return
+        await self.push_magnet_to_task(magnet)
 
     async def interrupt_and_retry_task(self, magnet: Magnet):
         """
-        添加一个插队任务，中止当前正在运行的任务，并将当前任务挂起。
+        添加一个插队任务，并将当前任务挂起。
+        keep 模式下当前任务的 Alist 任务继续下载，cancel 模式下会被取消，恢复时重新下载。
         """
+        # 插队的磁链如果还在队列中，移除以免之后重复下载
+        await self.download_queue.remove(magnet.id)
+        await self.suspended_queue.remove(magnet.id)
         if not self.current_magnet:
             # 如果当前没有任务
             self.current_magnet = magnet
@@ -77,24 +361,73 @@ class MagnetQueueManager:
                 await self.push_magnet_to_task(magnet)
             else:
                 # 挂起当前运行任务
-                await self.suspended_queue.put(self.current_magnet)
+                suspended = self.current_magnet
+                await self.suspended_queue.put(suspended)
+                if self.interrupt_mode != INTERRUPT_KEEP:
+                    # 不能记为 queued：重启恢复时 queued 会回到下载队列，失去优先恢复的位置
+                    await magnet_service.set_magnet_state(suspended.id, MagnetState.SUSPENDED)
+                    suspended.state = MagnetState.SUSPENDED.value
+                    # 原任务会在推送插队任务时被取消
+                    suspended.alist_task_id = None
                 self.current_magnet = magnet
-                logger.info(f"任务 {self.current_magnet.name} 被挂起，准备插队任务 {magnet.name}")
+                logger.info(f"任务 {suspended.name} 被挂起，准备插队任务 {magnet.name}")
                 await self.push_magnet_to_task(magnet)
 
     async def push_magnet_to_task(self, magnet: Magnet):
         """
         推送离线下载任务，推送监控。
+        监控任务在日志上下文中创建，之后的监控日志都带有该磁链的 magnet_id、feed_id。
         """
+        with magnet_log_context(magnet):
+            try:
+                save_path = await self.alist_service.get_task_save_path(magnet)
+                if self.keeps_suspended_tasks():
+                    # 只替换该磁链自己的旧任务，挂起磁链的任务继续下载
+                    if magnet.alist_task_id:
+                        await self.alist_service.cancel_download_task(magnet.alist_task_id)
+                    task_ids = await self.alist_service.add_download_task(save_path, [magnet.magnet_link])
+                else:
+                    task_ids = await self.alist_service.retry_download_task(save_path=save_path, urls=[magnet.magnet_link])
+                if not task_ids:
+                    await self.handle_push_failure(magnet)
+                    return
+                magnet.alist_task_id = task_ids[0]
+                magnet.alist_transfer_id = None
+                MAGNET_PUSHES.labels(self.backend_name, "success").inc()
+                await magnet_service.set_magnet_state(
+                    magnet.id, MagnetState.DOWNLOADING, count_attempt=True, alist_task_id=magnet.alist_task_id,
+                    alist_backend=self.backend_name
+                )
+                magnet.state = MagnetState.DOWNLOADING.value
+                magnet.alist_backend = self.backend_name
+                magnet.attempts = (magnet.attempts or 0) + 1
+                logger.info(f"任务 {magnet.name} 推送成功")
+                self.publish_queue_state()
+                # 通知monitor开始监控
+                await self.monitor.start_monitoring(magnet)
+            except Exception as e:
+                logger.error(f"执行任务时出错: {e}")
+                await self.handle_push_failure(magnet, "error", f"推送出错: {e}")
+
+    async def handle_push_failure(self, magnet: Magnet, result: str = "no_task", reason: str = "Alist 没有创建下载任务"):
+        """
+        Alist 没有创建任务或推送出错：与监控发现的失败一样计入推送次数并按退避时间放回待处理（或标记为失败），
+        不启动监控。下一个磁链由定时补充队列的任务开始处理，Alist 不可用时不会连续推送整个队列。
+        :param result: 推送指标的 result 标签
+        """
+        MAGNET_PUSHES.labels(self.backend_name, result).inc()
+        logger.warning(f"任务 {magnet.name} 推送失败: {reason}")
+        magnet.alist_task_id = None
+        magnet.alist_transfer_id = None
+        # 插队时监控可能还在跟踪被挂起的磁链，停下它，挂起的磁链之后按原任务恢复
+        self.monitor.cancel()
+        # 先释放通道，记录失败时数据库出错也不会让该后端一直占用
+        if self.current_magnet and self.current_magnet.id == magnet.id:
+            self.current_magnet = None
+        self.publish_queue_state()
         try:
-            await self.alist_service.retry_download_task(
-                save_path=await self.alist_service.get_task_save_path(magnet), 
-                urls=[magnet.magnet_link]
-            )
-            logger.info(f"任务 {magnet.name} 推送成功")
-            # 通知monitor开始监控
-            await self.monitor.start_monitoring(magnet)
+            await self.monitor.record_failure(magnet, "push_failed", reason, count_attempt=True)
         except Exception as e:
-            logger.error(f"执行任务时出错: {e}")
+            logger.error(f"记录任务 {magnet.name} 推送失败时出错: {e}")
 
 
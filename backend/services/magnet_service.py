@@ -1,10 +1,14 @@
 # magnet_service.py
+from datetime import datetime
+from sqlalchemy import Float, and_, case, cast, func, or_, update
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 
-from backend.database.models import Magnet
-from backend.database.database import async_session
+from backend.database.models import Magnet, MagnetState, RSSFeed, ACTIVE_STATES
+from backend.database.database import async_session, insert_ignoring_conflicts
 from backend.utils.logging_config import loguru_logger as logger
+from backend.utils.metrics import MAGNETS_CLAIMED
+from backend.utils.collection_versions import bump, MAGNETS
 
 async def get_all_magnets():
     async with async_session() as session:
@@ -29,9 +33,10 @@ async def create_magnet(data):
             title=data['title'],
             magnet_link=data['magnet_link'],
             name=data.get('name') or data['title'],
-            status=False
+            priority=data.get('priority', 0)
         )
         session.add(new_magnet)
+        await bump(session, MAGNETS)
         await session.commit()
 
 async def update_magnet(magnet_id, data):
@@ -40,17 +45,59 @@ async def update_magnet(magnet_id, data):
         magnet = result.scalars().first()
         if magnet:
             magnet.name = data.get('name', magnet.name)
-            magnet.status = data.get('status', magnet.status)
+            magnet.priority = data.get('priority', magnet.priority)
+            # 兼容旧接口的布尔 status
+            if 'status' in data:
+                magnet.status = data['status']
+            if 'state' in data:
+                magnet.state = MagnetState(data['state']).value
+                magnet.completed_at = datetime.now() if magnet.status else None
+            await bump(session, MAGNETS)
             await session.commit()
             return True
         return False
 
+async def set_magnet_state(magnet_id, state: MagnetState, count_attempt: bool = False, alist_task_id: str = None,
+                           next_attempt_at: datetime = None, alist_backend: str = None, alist_transfer_id: str = None):
+    """
+    更新磁链的处理状态。
+    :param count_attempt: 为 True 时推送次数加一，同时清除上一次推送的上传任务 ID
+    :param alist_task_id: 新推送的 Alist 下载任务 ID
+    :param alist_transfer_id: 识别出的 Alist 上传任务 ID
+    :param next_attempt_at: 放回待处理时，在此时间之前不会被重新认领
+    :param alist_backend: 推送到的 Alist 后端名称
+    """
+    values = {"state": state.value, "next_attempt_at": next_attempt_at}
+    if alist_task_id is not None:
+        values["alist_task_id"] = alist_task_id
+    if alist_backend is not None:
+        values["alist_backend"] = alist_backend
+    if count_attempt:
+        values["alist_transfer_id"] = None
+    if alist_transfer_id is not None:
+        values["alist_transfer_id"] = alist_transfer_id
+    if state == MagnetState.DONE:
+        values["completed_at"] = datetime.now()
+    if count_attempt:
+        values["attempts"] = Magnet.attempts + 1
+    async with async_session() as session:
+        try:
+            result = await session.execute(update(Magnet).where(Magnet.id == magnet_id).values(**values))
+            await bump(session, MAGNETS)
+            await session.commit()
+            return result.rowcount > 0
+        except SQLAlchemyError as e:
+            logger.error(f"更新磁链 {magnet_id} 状态失败: {e}")
+            await session.rollback()
+            return False
+
 async def delete_magnet(magnet_id):
     async with async_session() as session:
         result = await session.execute(select(Magnet).where(Magnet.id == magnet_id))
         magnet = result.scalars().first()
         if magnet:
             await session.delete(magnet)
+            await bump(session, MAGNETS)
             await session.commit()
             return True
         return False
@@ -58,23 +105,41 @@ async def delete_magnet(magnet_id):
 async def save_magnets_to_db(torrents):
     """
     将解析到的磁力链接保存到数据库中的 magnet 表，并确保每个任务绑定到相应的 rss_feed_id。
+    支持 ON CONFLICT 的方言一次批量插入并跳过已存在的磁链，其余方言逐条检查。
     """
+    if not torrents:
+        return
     async with async_session() as session:
         try:
-            for torrent in torrents:
-                # 检查是否已经存在这个磁力链接，避免重复
-                existing_magnet = await session.execute(
-                    select(Magnet).where(Magnet.magnet_link == torrent['magnet_link'])
-                )
-                if existing_magnet.scalars().first() is None:
-                    new_magnet = Magnet(
-                        rss_feed_id=torrent['rss_feed_id'],  # 绑定到相应的 RSSFeed
-                        title=torrent['title'],
-                        name=torrent['title'],  # 默认情况下，name = title
-                        magnet_link=torrent['magnet_link'],
-                        status=False
+            statement = insert_ignoring_conflicts(Magnet.__table__)
+            if statement is not None:
+                result = await session.execute(statement, [{
+                    "rss_feed_id": torrent['rss_feed_id'],  # 绑定到相应的 RSSFeed
+                    "title": torrent['title'],
+                    "name": torrent['title'],  # 默认情况下，name = title
+                    "magnet_link": torrent['magnet_link'],
+                    "magnet_hash": Magnet.generate_magnet_hash(torrent['magnet_link']),
+                    "infohash": Magnet.extract_infohash(torrent['magnet_link']),
+                } for torrent in torrents])
+                # 行数未知（-1）时也按有变化处理
+                inserted = result.rowcount != 0
+            else:
+                inserted = False
+                for torrent in torrents:
+                    # 检查是否已经存在这个磁力链接，避免重复
+                    existing_magnet = await session.execute(
+                        select(Magnet.id).where(Magnet.magnet_link == torrent['magnet_link'])
                     )
-                    session.add(new_magnet)
+                    if existing_magnet.first() is None:
+                        inserted = True
+                        session.add(Magnet(
+                            rss_feed_id=torrent['rss_feed_id'],
+                            title=torrent['title'],
+                            name=torrent['title'],
+                            magnet_link=torrent['magnet_link']
+                        ))
+            if inserted:
+                await bump(session, MAGNETS)
             await session.commit()
             logger.debug("所有任务已成功保存到数据库。")
         except SQLAlchemyError as e:
@@ -83,13 +148,142 @@ async def save_magnets_to_db(torrents):
 
 async def get_pending_magnets():
     """
-    从数据库中获取所有未完成的任务。
+    从数据库中获取所有待处理的任务，按优先级从高到低排列。
     """
     async with async_session() as session:
         try:
-            result = await session.execute(select(Magnet).where(Magnet.status == False))
+            result = await session.execute(
+                select(Magnet)
+                .where(Magnet.state == MagnetState.PENDING.value)
+                .order_by(Magnet.priority.desc(), Magnet.id)
+            )
             magnets = result.scalars().all()
             return magnets
         except Exception as e:
             logger.error(f"从数据库加载任务时出错: {e}")
-            return []
\ No newline at end of file
+            return []
+
+def _claimable():
+    """待处理且已过退避时间的磁链"""
+    return and_(
+        Magnet.state == MagnetState.PENDING.value,
+        or_(Magnet.next_attempt_at.is_(None), Magnet.next_attempt_at <= datetime.now())
+    )
+
+def _fair_claim_candidates(limit: int):
+    """
+    按订阅轮流挑选待处理磁链的 id：每个订阅内按优先级、较新的在前编号，
+    再按 编号/权重 交错排列，积压很多的订阅不会占满一次认领。
+    窗口函数不能与 FOR UPDATE 同用，因此只返回 id 子查询。
+    """
+    rank = func.row_number().over(
+        partition_by=Magnet.rss_feed_id,
+        order_by=(Magnet.priority.desc(), Magnet.id.desc())
+    )
+    ranked = (
+        select(Magnet.id.label('id'), rank.label('rank'), func.coalesce(RSSFeed.weight, 1).label('weight'))
+        .join(RSSFeed, RSSFeed.id == Magnet.rss_feed_id)
+        .where(_claimable())
+        .subquery()
+    )
+    return (
+        select(ranked.c.id)
+        .order_by(cast(ranked.c.rank, Float) / ranked.c.weight, ranked.c.id.desc())
+        .limit(limit)
+    )
+
+async def claim_next_magnets(limit: int, fair: bool = False):
+    """
+    认领接下来的 limit 个待处理磁链，将其状态置为 queued 并返回。
+    数据库即持久化的队列，认领过的磁链重启后仍可恢复。
+    PostgreSQL 下使用 FOR UPDATE SKIP LOCKED，多个进程同时认领时互不重复；SQLite 忽略该子句。
+    :param fair: 为 True 时按订阅轮流认领，否则按优先级和先后顺序
+    """
+    if fair:
+        query = select(Magnet).where(Magnet.id.in_(_fair_claim_candidates(limit)))
+    else:
+        query = select(Magnet).order_by(Magnet.priority.desc(), Magnet.id).limit(limit)
+
+    async with async_session() as session:
+        try:
+            result = await session.execute(
+                query
+                .where(_claimable())
+                .with_for_update(skip_locked=True)
+            )
+            magnets = result.scalars().all()
+            if magnets:
+                await session.execute(
+                    update(Magnet)
+                    .where(Magnet.id.in_([magnet.id for magnet in magnets]))
+                    .where(Magnet.state == MagnetState.PENDING.value)
+                    .values(state=MagnetState.QUEUED.value)
+                    .execution_options(synchronize_session=False)
+                )
+                await bump(session, MAGNETS)
+                await session.commit()
+                for magnet in magnets:
+                    magnet.state = MagnetState.QUEUED.value
+                MAGNETS_CLAIMED.inc(len(magnets))
+            return magnets
+        except SQLAlchemyError as e:
+            logger.error(f"认领待处理磁链失败: {e}")
+            await session.rollback()
+            return []
+
+async def find_unfinished_magnet(magnet_link: str):
+    """
+    按散列值或 infohash 查找链接对应的未完成磁链，用于启动时接管 Alist 中遗留的任务。
+    已完成和已失败的磁链不会被接管。两列都有索引，按相等匹配。
+    """
+    conditions = [Magnet.magnet_hash == Magnet.generate_magnet_hash(magnet_link)]
+    infohash = Magnet.extract_infohash(magnet_link)
+    if infohash:
+        conditions.append(Magnet.infohash == infohash)
+    async with async_session() as session:
+        try:
+            result = await session.execute(
+                select(Magnet)
+                .where(Magnet.state.notin_((MagnetState.DONE.value, MagnetState.FAILED.value)), or_(*conditions))
+                .order_by(Magnet.id.desc())
+                .limit(1)
+            )
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(f"查找磁链时出错: {e}")
+            return None
+
+async def get_active_magnets():
+    """
+    获取已认领但尚未完成的磁链，用于重启后恢复队列。
+    下载中/上传中的排在最前，其余按优先级排序。
+    """
+    async with async_session() as session:
+        try:
+            in_flight_first = case((Magnet.state == MagnetState.QUEUED.value, 1), else_=0)
+            result = await session.execute(
+                select(Magnet)
+                .where(Magnet.state.in_(ACTIVE_STATES))
+                .order_by(in_flight_first, Magnet.priority.desc(), Magnet.id)
+            )
+            return result.scalars().all()
+        except SQLAlchemyError as e:
+            logger.error(f"从数据库恢复队列时出错: {e}")
+            return []
+
+async def get_magnet_states(magnet_ids):
+    """
+    查询指定磁链当前的状态和优先级，返回 id -> (state, priority)，已删除的磁链不在结果中。
+    数据库出错时返回 None。
+    """
+    if not magnet_ids:
+        return {}
+    async with async_session() as session:
+        try:
+            result = await session.execute(
+                select(Magnet.id, Magnet.state, Magnet.priority).where(Magnet.id.in_(list(magnet_ids)))
+            )
+            return {magnet_id: (state, priority or 0) for magnet_id, state, priority in result.all()}
+        except SQLAlchemyError as e:
+            logger.error(f"查询磁链状态时出错: {e}")
+            return None
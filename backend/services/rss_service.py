@@ -1,23 +1,54 @@
 #rss_service.py
 from datetime import datetime
+from sqlalchemy import delete
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 
 from backend.utils import rss_parser
+from backend.utils.event_bus import event_bus
+from backend.core.config import FEED_CACHE_SIZE, FEED_CACHE_TTL
+from backend.utils.lru_cache import LRUCache
+from backend.utils.collection_versions import collection_versions, bump, MAGNETS, RSS_FEEDS
 from .magnet_service import save_magnets_to_db
 from backend.database.models import RSSFeed, Magnet
 from backend.database.database import async_session
 from backend.utils.logging_config import loguru_logger as logger
 
+# 订阅元数据缓存：按 id 缓存单个订阅，另用一个键缓存全部订阅列表
+feed_cache = LRUCache(maxsize=FEED_CACHE_SIZE, ttl=FEED_CACHE_TTL)
+_ALL_FEEDS_KEY = "__all__"
+# 其他进程修改了订阅时，本进程在下次读取版本号（ETag、统计）时清空缓存
+collection_versions.on_change(RSS_FEEDS, feed_cache.clear)
+
+def invalidate_feed_cache(rss_id=None):
+    """
+    订阅写操作后调用，使对应订阅和订阅列表的缓存失效。
+    :param rss_id: 为 None 时只使列表失效
+    """
+    if rss_id is not None:
+        feed_cache.invalidate(rss_id)
+    feed_cache.invalidate(_ALL_FEEDS_KEY)
+
+def get_feed_cache_stats():
+    """返回订阅缓存的命中统计"""
+    return feed_cache.stats()
+
 # 查找
 async def get_all_rss_feeds():
     """
-    从数据库中获取所有 RSS 订阅。
+    从数据库中获取所有 RSS 订阅，优先读取缓存。
     """
+    feeds = feed_cache.get(_ALL_FEEDS_KEY)
+    if feeds is not None:
+        return feeds
+
     async with async_session() as session:
         try:
             result = await session.execute(select(RSSFeed))
             feeds = result.scalars().all()
+            feed_cache.set(_ALL_FEEDS_KEY, feeds)
+            for feed in feeds:
+                feed_cache.set(feed.id, feed)
             return feeds
         except SQLAlchemyError as e:
             logger.error(f"Database error: {e}")
@@ -25,12 +56,18 @@ async def get_all_rss_feeds():
 
 async def get_rss_feed_by_id(rss_id):
     """
-    从数据库中获取特定 ID 的 RSS 订阅。
+    从数据库中获取特定 ID 的 RSS 订阅，优先读取缓存。
     """
+    feed = feed_cache.get(rss_id)
+    if feed is not None:
+        return feed
+
     async with async_session() as session:
         try:
             result = await session.execute(select(RSSFeed).where(RSSFeed.id == rss_id))
             feed = result.scalars().first()
+            if feed is not None:
+                feed_cache.set(rss_id, feed)
             return feed
         except SQLAlchemyError as e:
             logger.error(f"Database error: {e}")
@@ -49,7 +86,9 @@ async def create_rss_feed(name, url):
                 last_updated=datetime.now()
             )
             session.add(new_feed)
+            await bump(session, RSS_FEEDS)
             await session.commit()
+            invalidate_feed_cache()
             return new_feed
         except SQLAlchemyError as e:
             logger.error(f"Database error: {e}")
@@ -72,7 +111,9 @@ async def update_rss_feed(rss_id, data):
                 feed.name = data.get('name', feed.name)
                 feed.url = data.get('url', feed.url)
                 feed.last_updated = data.get('last_updated', feed.last_updated)
+                await bump(session, RSS_FEEDS)
                 await session.commit()
+                invalidate_feed_cache(rss_id)
                 return True, None
             return False, "RSS feed not found"
         except SQLAlchemyError as e:
@@ -100,7 +141,9 @@ async def patch_rss_feed(rss_id, update_data):
                 setattr(rss_feed, key, value)
 
             # 提交更新
+            await bump(session, RSS_FEEDS)
             await session.commit()
+            invalidate_feed_cache(rss_id)
             return True
         except SQLAlchemyError as e:
             await session.rollback()  # 回滚更改以防止不一致
@@ -111,28 +154,21 @@ async def patch_rss_feed(rss_id, update_data):
 async def delete_rss_feed(rss_id):
     """
     根据给定的 rss_id 删除对应的 RSS 订阅及其相关的任务。
+    磁链通过一条集合 DELETE 删除，不再逐条加载到内存。
     """
     async with async_session() as session:
         try:
-            # 查找 RSS 源
-            result = await session.execute(select(RSSFeed).where(RSSFeed.id == rss_id))
-            feed = result.scalars().first()
-            if feed:
-                # 查找与该 RSS 源相关的任务
-                tasks_to_delete = await session.execute(select(Magnet).where(Magnet.rss_feed_id == rss_id))
-                tasks = tasks_to_delete.scalars().all()
-
-                # 删除所有任务
-                for task in tasks:
-                    await session.delete(task)
-
-                # 删除 RSS 源
-                await session.delete(feed)
-                await session.commit()
-
-                return {"message": "RSS feed and associated tasks deleted successfully!"}, 200
-            else:
+            # 旧版本建的表没有 ON DELETE CASCADE，这里显式删除磁链，新表则由外键级联兜底
+            await session.execute(delete(Magnet).where(Magnet.rss_feed_id == rss_id))
+            result = await session.execute(delete(RSSFeed).where(RSSFeed.id == rss_id))
+            if result.rowcount == 0:
+                await session.rollback()
                 return {"error": "RSS feed not found"}, 404
+
+            await bump(session, MAGNETS, RSS_FEEDS)
+            await session.commit()
+            invalidate_feed_cache(rss_id)
+            return {"message": "RSS feed and associated tasks deleted successfully!"}, 200
         except SQLAlchemyError as e:
             await session.rollback()
             return {"error": str(e)}, 500
@@ -163,6 +199,8 @@ async def refresh_all_rss_feeds():
     for rss_feed in rss_feeds:
         await update_rss_feed(rss_feed.id, {"last_updated": datetime.now()})
 
+    event_bus.publish("refresh", {"rss_id": None, "feeds": len(feed_urls_with_ids), "items": len(torrents)})
+
     return True, "RSS feeds updated and new tasks have been added."
 
 async def refresh_rss_feed(rss_id):
@@ -182,4 +220,6 @@ async def refresh_rss_feed(rss_id):
     # 更新 RSS 源的 `last_updated` 字段
     await update_rss_feed(rss_id, {"last_updated": datetime.now()})
 
+    event_bus.publish("refresh", {"rss_id": rss_id, "feeds": 1, "items": len(torrents)})
+
     return True, f"RSS feed '{rss_feed.name}' updated and new tasks have been added."
\ No newline at end of file
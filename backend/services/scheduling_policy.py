@@ -0,0 +1,97 @@
+# scheduling_policy.py
+# 下载队列的调度策略：决定下一个处理哪个磁链
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from backend.database.models import Magnet
+from backend.utils.unique_magnet_queue import UniqueMagnetQueue
+from backend.utils.logging_config import loguru_logger as logger
+
+class SchedulingPolicy(ABC):
+    """
+    调度策略基类。置顶和优先级大于 0 的磁链总是最先处理，其余由具体策略决定。
+    """
+    name = ""
+    # 是否按订阅公平认领，为 True 时数据库按订阅轮流认领待处理磁链
+    fair = True
+
+    def __init__(self):
+        self.weights: Dict[int, int] = {}
+
+    def update_weights(self, weights: Dict[int, int]):
+        """更新订阅权重，rss_feed_id -> weight"""
+        self.weights = weights
+
+    def weight(self, feed_id: int) -> int:
+        return max(int(self.weights.get(feed_id) or 1), 1)
+
+    def next_magnet(self, queue: UniqueMagnetQueue) -> Optional[Magnet]:
+        """从队列中取出下一个磁链，队列为空时返回 None"""
+        head = queue.peek()
+        if head is None:
+            return None
+        _, pinned, priority = head
+        if pinned or priority > 0:
+            return queue.get_nowait()
+        return self.select(queue)
+
+    @abstractmethod
+    def select(self, queue: UniqueMagnetQueue) -> Magnet:
+        """从队列中选出下一个磁链，队列不为空且队首没有置顶或高优先级的磁链时调用"""
+
+class FifoPolicy(SchedulingPolicy):
+    """按优先级和入队先后处理，不区分订阅"""
+    name = "fifo"
+    fair = False
+
+    def select(self, queue: UniqueMagnetQueue) -> Magnet:
+        return queue.get_nowait()
+
+class RoundRobinPolicy(SchedulingPolicy):
+    """按订阅轮流处理，每次一个，订阅内较新的剧集优先"""
+    name = "round_robin"
+
+    def __init__(self):
+        super().__init__()
+        self._last_feed: Optional[int] = None
+
+    def select(self, queue: UniqueMagnetQueue) -> Magnet:
+        feeds = sorted(queue.groups())
+        feed_id = next((feed for feed in feeds if self._last_feed is None or feed > self._last_feed), feeds[0])
+        self._last_feed = feed_id
+        return queue.get_nowait(group=feed_id)
+
+class DeficitRoundRobinPolicy(SchedulingPolicy):
+    """
+    按权重的赤字轮询：每轮为订阅累加与权重相同的额度，每处理一个磁链消耗 1，
+    权重为 2 的订阅每轮处理 2 个。订阅内较新的剧集优先。
+    """
+    name = "drr"
+
+    def __init__(self):
+        super().__init__()
+        self._current_feed: Optional[int] = None
+        self._deficits: Dict[int, float] = {}
+
+    def select(self, queue: UniqueMagnetQueue) -> Magnet:
+        feeds = sorted(queue.groups())
+        # 队列已清空的订阅不保留剩余额度
+        self._deficits = {feed: deficit for feed, deficit in self._deficits.items() if feed in feeds}
+
+        feed_id = self._current_feed
+        if feed_id not in self._deficits or self._deficits[feed_id] < 1:
+            feed_id = next((feed for feed in feeds if self._current_feed is None or feed > self._current_feed), feeds[0])
+            self._deficits[feed_id] = self._deficits.get(feed_id, 0) + self.weight(feed_id)
+            self._current_feed = feed_id
+
+        self._deficits[feed_id] -= 1
+        return queue.get_nowait(group=feed_id)
+
+SCHEDULING_POLICIES = {policy.name: policy for policy in (FifoPolicy, RoundRobinPolicy, DeficitRoundRobinPolicy)}
+
+def create_scheduling_policy(name: str) -> SchedulingPolicy:
+    """根据名称创建调度策略，未知名称退回 fifo"""
+    policy_class = SCHEDULING_POLICIES.get(name)
+    if policy_class is None:
+        logger.warning(f"未知的调度策略 {name}，使用 fifo")
+        policy_class = FifoPolicy
+    return policy_class()
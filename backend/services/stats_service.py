@@ -0,0 +1,104 @@
+# stats_service.py
+# 仪表盘统计，全部在数据库中用 GROUP BY 聚合，结果短暂缓存
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.core.config import STATS_CACHE_TTL
+from backend.database.models import RSSFeed, Magnet, MagnetState, ACTIVE_STATES
+from backend.database.database import async_session
+from backend.utils.lru_cache import LRUCache
+from backend.utils.collection_versions import collection_versions, MAGNETS, RSS_FEEDS
+from backend.utils.logging_config import loguru_logger as logger
+
+# 按 查询天数 + 集合版本号 缓存统计结果，磁链或订阅发生写操作后版本号变化，旧结果不再命中
+_stats_cache = LRUCache(maxsize=8, ttl=STATS_CACHE_TTL)
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+def _day_string(value) -> str:
+    """SQLite 的 date() 返回字符串，PostgreSQL 返回 date 对象，统一为 YYYY-MM-DD"""
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+async def get_statistics(days: int = 7):
+    """
+    汇总磁链状态、每个订阅的统计以及最近 days 天的每日吞吐量。
+    :return: 统计字典，数据库出错时返回 None
+    """
+    try:
+        cache_key = (days, await collection_versions.get(MAGNETS, RSS_FEEDS))
+    except SQLAlchemyError as e:
+        logger.error(f"统计查询失败: {e}")
+        return None
+    cached = _stats_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    since = datetime.now() - timedelta(days=days)
+    async with async_session() as session:
+        try:
+            # 1. 各状态的磁链数量
+            state_rows = await session.execute(
+                select(Magnet.state, func.count(Magnet.id)).group_by(Magnet.state)
+            )
+            by_state = {state.value: 0 for state in MagnetState}
+            by_state.update({state: count for state, count in state_rows.all()})
+
+            # 2. 每个订阅的总数、待处理数、完成数和最近一条新磁链的时间
+            feed_rows = await session.execute(
+                select(
+                    RSSFeed.id,
+                    RSSFeed.name,
+                    func.count(Magnet.id),
+                    _count_if(Magnet.state.in_((MagnetState.PENDING.value,) + ACTIVE_STATES)),
+                    _count_if(Magnet.state == MagnetState.DONE.value),
+                    _count_if(Magnet.state == MagnetState.FAILED.value),
+                    func.max(Magnet.timestamp),
+                )
+                .outerjoin(Magnet, Magnet.rss_feed_id == RSSFeed.id)
+                .group_by(RSSFeed.id, RSSFeed.name)
+                .order_by(RSSFeed.id)
+            )
+            feeds = [{
+                "id": feed_id,
+                "name": name,
+                "total": total,
+                "pending": pending or 0,
+                "done": done or 0,
+                "failed": failed or 0,
+                "last_new_item": last_new_item,
+            } for feed_id, name, total, pending, done, failed, last_new_item in feed_rows.all()]
+
+            # 3. 最近 days 天每日新增与完成的数量
+            added_day = func.date(Magnet.timestamp)
+            added_rows = await session.execute(
+                select(added_day, func.count(Magnet.id))
+                .where(Magnet.timestamp >= since)
+                .group_by(added_day)
+            )
+            completed_day = func.date(Magnet.completed_at)
+            completed_rows = await session.execute(
+                select(completed_day, func.count(Magnet.id))
+                .where(Magnet.state == MagnetState.DONE.value, Magnet.completed_at >= since)
+                .group_by(completed_day)
+            )
+            daily = {}
+            for day, count in added_rows.all():
+                daily.setdefault(_day_string(day), {"added": 0, "completed": 0})["added"] = count
+            for day, count in completed_rows.all():
+                daily.setdefault(_day_string(day), {"added": 0, "completed": 0})["completed"] = count
+        except SQLAlchemyError as e:
+            logger.error(f"统计查询失败: {e}")
+            return None
+
+    stats = {
+        "total": sum(by_state.values()),
+        "by_state": by_state,
+        "feeds": feeds,
+        "daily": [{"date": day, **counts} for day, counts in sorted(daily.items())],
+        "generated_at": datetime.now(),
+    }
+    _stats_cache.set(cache_key, stats)
+    return stats
@@ -0,0 +1,48 @@
+# token_service.py
+# 吊销的 Token 保存在数据库中，所有 worker / 实例共享
+import time
+import hashlib
+from typing import Dict, Optional
+from sqlalchemy import delete
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.database.models import RevokedToken
+from backend.database.database import async_session, insert_ignoring_conflicts
+from backend.utils.logging_config import loguru_logger as logger
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+async def revoke_token(token: str, exp: float) -> bool:
+    """记录吊销的 Token，并清理已经自然过期的记录"""
+    token_hash = hash_token(token)
+    async with async_session() as session:
+        try:
+            await session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= time.time()))
+            statement = insert_ignoring_conflicts(RevokedToken.__table__)
+            if statement is not None:
+                await session.execute(statement, [{"token_hash": token_hash, "expires_at": exp}])
+            elif await session.get(RevokedToken, token_hash) is None:
+                session.add(RevokedToken(token_hash=token_hash, expires_at=exp))
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            logger.error(f"保存吊销的 Token 失败: {e}")
+            await session.rollback()
+            return False
+
+async def get_revoked_tokens() -> Optional[Dict[str, float]]:
+    """
+    获取尚未过期的吊销记录。
+    :return: Token 散列值 -> exp，数据库出错时返回 None
+    """
+    async with async_session() as session:
+        try:
+            result = await session.execute(
+                select(RevokedToken.token_hash, RevokedToken.expires_at).where(RevokedToken.expires_at > time.time())
+            )
+            return {token_hash: expires_at for token_hash, expires_at in result.all()}
+        except SQLAlchemyError as e:
+            logger.error(f"读取吊销的 Token 失败: {e}")
+            return None
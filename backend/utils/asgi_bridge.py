@@ -0,0 +1,170 @@
+# asgi_bridge.py
+# 将 Flask(WSGI) 应用挂到 ASGI 服务器上：同步部分在线程池中执行，
+# 异步视图通过 SharedLoopFlask 回到服务器自身的事件循环
+import sys
+import asyncio
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from backend.utils.event_loop import SharedLoopFlask
+from backend.utils.logging_config import loguru_logger as logger
+
+class ClientDisconnected(OSError):
+    """客户端已断开连接"""
+
+class WsgiToAsgiBridge:
+    def __init__(self, wsgi_app: SharedLoopFlask, max_workers: int = 32):
+        """
+        :param wsgi_app: Flask 应用
+        :param max_workers: 执行 WSGI 调用的线程数，即同时处理的请求数（含 SSE 长连接）
+        """
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.handle_http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self.reject_websocket(scope, receive, send)
+        else:
+            logger.warning(f"忽略不支持的 ASGI 连接类型: {scope['type']}")
+
+    @staticmethod
+    async def reject_websocket(scope, receive, send):
+        """Flask 应用不处理 WebSocket，收到握手后直接关闭，服务器会以 403 拒绝握手"""
+        logger.warning(f"拒绝 WebSocket 连接: {scope.get('path', '')}")
+        message = await receive()
+        if message["type"] == "websocket.connect":
+            await send({"type": "websocket.close", "code": 1003})
+
+    async def lifespan(self, receive, send):
+        """服务器启动时绑定事件循环并启动后台服务，关闭时停止"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    self.wsgi_app.bind_loop(asyncio.get_running_loop())
+                    for hook in self.wsgi_app.startup_hooks:
+                        await hook()
+                except Exception as e:
+                    logger.error(f"后台服务启动失败: {e}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for hook in self.wsgi_app.shutdown_hooks:
+                    try:
+                        await hook()
+                    except Exception as e:
+                        logger.error(f"后台服务关闭时出错: {e}")
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle_http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.extend(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        loop = asyncio.get_running_loop()
+        disconnected = threading.Event()
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+
+        watcher = loop.create_task(watch_disconnect())
+        try:
+            environ = self.build_environ(scope, bytes(body))
+            await loop.run_in_executor(self.executor, self.run_wsgi, environ, loop, send, disconnected)
+        finally:
+            watcher.cancel()
+
+    def run_wsgi(self, environ, loop, send, disconnected: threading.Event):
+        """在工作线程中执行 WSGI 应用，并把响应逐块转发给 ASGI 服务器"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers
+            ]
+
+        def send_sync(message):
+            if disconnected.is_set():
+                raise ClientDisconnected("客户端已断开连接")
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def send_start():
+            send_sync({
+                "type": "http.response.start",
+                "status": response["status"],
+                "headers": response["headers"],
+            })
+
+        result = self.wsgi_app(environ, start_response)
+        started = False
+        try:
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not started:
+                    send_start()
+                    started = True
+                send_sync({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not started:
+                send_start()
+            send_sync({"type": "http.response.body", "body": b"", "more_body": False})
+        except ClientDisconnected:
+            pass
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    @staticmethod
+    def build_environ(scope, body: bytes) -> dict:
+        """根据 ASGI scope 构造 WSGI environ"""
+        server = scope.get("server") or ("localhost", 80)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+            "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        if scope.get("client"):
+            environ["REMOTE_ADDR"] = scope["client"][0]
+            environ["REMOTE_PORT"] = str(scope["client"][1])
+
+        for raw_name, raw_value in scope.get("headers", []):
+            name = raw_name.decode("latin1").upper().replace("-", "_")
+            value = raw_value.decode("latin1")
+            if name == "CONTENT_TYPE":
+                key = "CONTENT_TYPE"
+            elif name == "CONTENT_LENGTH":
+                key = "CONTENT_LENGTH"
+            else:
+                key = f"HTTP_{name}"
+            if key in environ:
+                value = f"{environ[key]},{value}"
+            environ[key] = value
+        return environ
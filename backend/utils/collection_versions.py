@@ -0,0 +1,62 @@
+# collection_versions.py
+from typing import Callable, Dict, List
+from collections import defaultdict
+from sqlalchemy import update
+from sqlalchemy.future import select
+from backend.database.database import async_session
+from backend.database.models import CollectionVersion
+
+# 集合名称
+MAGNETS = "magnets"
+RSS_FEEDS = "rss_feeds"
+COLLECTIONS = (MAGNETS, RSS_FEEDS)
+
+async def bump(session, *collections: str):
+    """
+    在写操作所在的事务中把集合的版本号加一，随写操作一起提交或回滚。
+    需要在 session.commit 之前调用。
+    """
+    await session.execute(
+        update(CollectionVersion)
+        .where(CollectionVersion.name.in_(collections))
+        .values(version=CollectionVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+class CollectionVersions:
+    """
+    每个数据集合的版本号，用于生成 ETag 和缓存键。
+    版本号保存在 collection_versions 表中，服务层的写操作通过 bump 在同一事务中加一，
+    所有进程和实例看到的都相同，读取时只查一行，不对数据表做聚合。
+    本进程内的缓存通过 on_change 注册回调，读到新的版本号时清空，避免用新的 ETag 返回旧数据。
+    """
+    def __init__(self):
+        self._seen: Dict[str, int] = {}
+        self._callbacks: Dict[str, List[Callable[[], None]]] = defaultdict(list)
+
+    def on_change(self, collection: str, callback: Callable[[], None]):
+        """集合的版本号与本进程上次读到的不同时调用 callback"""
+        self._callbacks[collection].append(callback)
+
+    async def get(self, *collections: str) -> tuple:
+        """返回指定集合的当前版本号，数据库出错时抛出 SQLAlchemyError"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(CollectionVersion.name, CollectionVersion.version)
+                .where(CollectionVersion.name.in_(collections))
+            )
+            stored = dict(result.all())
+        versions = tuple(stored.get(collection, 0) for collection in collections)
+        for collection, version in zip(collections, versions):
+            if self._seen.get(collection) != version:
+                self._seen[collection] = version
+                for callback in self._callbacks[collection]:
+                    callback()
+        return versions
+
+    async def etag(self, *collections: str) -> str:
+        """根据指定集合的版本号生成 ETag"""
+        versions = await self.get(*collections)
+        return "-".join(f"{name}.{version}" for name, version in zip(collections, versions))
+
+collection_versions = CollectionVersions()
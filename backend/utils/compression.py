@@ -0,0 +1,49 @@
+# compression.py
+import gzip
+from flask import Flask, request
+
+try:
+    import brotli  # 可选依赖，未安装时只使用 gzip
+except ImportError:
+    brotli = None
+
+# 只压缩文本类响应
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain", "text/css", "application/javascript"}
+
+def init_compression(app: Flask, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+    """
+    按 Accept-Encoding 对超过 min_size 字节的响应做 gzip/brotli 压缩。
+    流式响应（SSE）、文件响应和已经带 Content-Encoding 的响应（预压缩的前端资源）不处理。
+    """
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        accept_encodings = request.accept_encodings
+        if brotli is not None and accept_encodings['br']:
+            encoding = 'br'
+        elif accept_encodings['gzip']:
+            encoding = 'gzip'
+        else:
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=gzip_level)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
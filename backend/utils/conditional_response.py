@@ -0,0 +1,31 @@
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy.exc import SQLAlchemyError
+from backend.utils.collection_versions import collection_versions
+from backend.utils.logging_config import loguru_logger as logger
+
+def etag_by_collections(*collections: str):
+    """
+    为只读的异步视图添加 ETag，请求带有匹配的 If-None-Match 时直接返回 304，只查询集合的版本号。
+    ETag 在执行视图之前计算，查询期间发生的写操作只会让下一次请求重新获取，不会返回过期数据。
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            try:
+                etag = await collection_versions.etag(*collections)
+            except SQLAlchemyError as e:
+                # 取不到版本号时按普通请求处理
+                logger.warning(f"获取 {', '.join(collections)} 版本号失败: {e}")
+                etag = None
+            if etag and request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = make_response(await view(*args, **kwargs))
+            if etag and response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
@@ -8,6 +8,7 @@ class DependencyKeys(Enum):
     ALIST_SERVICE = 'AlistService' # alist综合任务管理
     MAGNET_QUEUE_MANAGER = 'MagnetQueueManager' # 下载队列管理
     MAGNET_MONITOR = 'MagnetMonitor' # 下载队列监控
+    ALIST_BACKEND_POOL = 'AlistBackendPool' # 多个 Alist 后端的下载通道池
 
 class DependencyManager:
     def __init__(self):
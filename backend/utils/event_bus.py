@@ -0,0 +1,49 @@
+# event_bus.py
+import asyncio
+from datetime import datetime
+from typing import Dict, Set
+from backend.utils.logging_config import loguru_logger as logger
+
+class EventBus:
+    """
+    进程内事件广播，供 SSE 推送使用。
+    发布和订阅都必须在共享事件循环线程中进行；每个订阅者一个有界队列，
+    消费过慢时丢弃最旧的事件，不会阻塞发布方。
+    """
+    # 新订阅者连接时会立即收到这些事件的最新一条，作为当前状态快照
+    STICKY_EVENTS = ("queue", "progress")
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._latest: Dict[str, dict] = {}
+
+    async def subscribe(self) -> asyncio.Queue:
+        """订阅事件，返回的队列中已包含当前状态快照"""
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        for event in self.STICKY_EVENTS:
+            if event in self._latest:
+                queue.put_nowait(self._latest[event])
+        self._subscribers.add(queue)
+        logger.debug(f"新增事件订阅者，当前共 {len(self._subscribers)} 个")
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """取消订阅"""
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data: dict):
+        """向所有订阅者广播事件"""
+        message = {"event": event, "data": data, "time": datetime.now()}
+        if event in self.STICKY_EVENTS:
+            self._latest[event] = message
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+# 队列、监控、订阅刷新事件的全局广播实例
+event_bus = EventBus()
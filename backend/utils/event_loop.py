@@ -0,0 +1,68 @@
+# event_loop.py
+import asyncio
+import contextvars
+import concurrent.futures
+from functools import wraps
+from typing import Any, Awaitable, Callable, List, Optional
+from flask import Flask
+
+def run_in_loop(loop: asyncio.AbstractEventLoop, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """
+    在其他线程中把协程提交到指定事件循环执行并阻塞等待结果。
+    与 asyncio.run_coroutine_threadsafe 不同，这里会带上调用线程的 contextvars，
+    Flask 的 request/current_app 在协程中依然可用。
+    """
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        raise RuntimeError("不能在事件循环线程中同步等待该循环上的协程")
+
+    context = contextvars.copy_context()
+    future = concurrent.futures.Future()
+
+    def _on_done(task: asyncio.Task):
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def _start():
+        # 在 context 中创建的 Task 会复制该上下文
+        task = loop.create_task(coro)
+        task.add_done_callback(_on_done)
+
+    loop.call_soon_threadsafe(_start, context=context)
+    return future.result(timeout)
+
+class SharedLoopFlask(Flask):
+    """
+    异步视图不再由 asgiref 为每个请求新建事件循环，而是提交到后台共享事件循环执行，
+    与调度器、队列管理、监控共用同一个循环。
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.background_loop: Optional[asyncio.AbstractEventLoop] = None
+        # ASGI 模式下由 lifespan 在服务器事件循环上依次执行
+        self.startup_hooks: List[Callable[[], Awaitable]] = []
+        self.shutdown_hooks: List[Callable[[], Awaitable]] = []
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """绑定共享事件循环"""
+        self.background_loop = loop
+
+    def async_to_sync(self, func):
+        if self.background_loop is None:
+            # 尚未绑定循环时退回 Flask 默认行为
+            return super().async_to_sync(func)
+
+        loop = self.background_loop
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return run_in_loop(loop, func(*args, **kwargs))
+
+        return wrapper
@@ -1,46 +1,85 @@
 # file_lock.py
 import os
 import time
+from backend.utils.logging_config import loguru_logger as logger
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只支持单进程运行
+    fcntl = None
 
 class FileLock:
-    def __init__(self, lock_file_path, expiration_time=30):
+    """
+    基于 fcntl.flock 的进程间互斥锁，用于同一主机上的多个 worker。
+    持有期间保持文件描述符打开，进程退出（包括崩溃）时由系统自动释放，不会残留过期的锁。
+    """
+    def __init__(self, lock_file_path):
         """
-        初始化文件锁
-        :param lock_file_path: 锁文件路径
-        :param expiration_time: 锁过期时间，单位为秒
+        :param lock_file_path: 锁文件路径，所有进程必须使用同一路径
         """
         self.lock_file_path = lock_file_path
-        self.expiration_time = expiration_time
+        self._fd = None
 
-        # 检查锁文件是否存在，存在则删除，确保锁是干净的
-        if os.path.exists(self.lock_file_path):
-            os.remove(self.lock_file_path)
+    def acquire(self) -> bool:
+        """
+        尝试获取锁，不阻塞
+        :return: True 如果获取成功（或已经持有），否则 False
+        """
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            logger.warning("当前系统不支持 fcntl，跳过文件锁")
+            self._fd = -1
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_file_path)), exist_ok=True)
+        fd = os.open(self.lock_file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # 写入持有者的进程号，方便排查
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
 
-    def is_locked(self):
-        """
-        检查锁文件是否存在且未过期
-        :return: True 如果锁存在且未过期，否则 False
-        """
-        if os.path.exists(self.lock_file_path):
-            file_mod_time = os.path.getmtime(self.lock_file_path)
-            current_time = time.time()
-            # 如果锁未过期，返回 True
-            if current_time - file_mod_time < self.expiration_time:
-                return True
-        return False
+    def renew(self) -> bool:
+        """
+        续期。flock 在释放前一直有效，这里只更新锁文件的时间戳
+        :return: 是否仍持有锁
+        """
+        if self._fd is None:
+            return False
+        if self._fd >= 0:
+            os.utime(self.lock_file_path, (time.time(), time.time()))
+        return True
 
-    def acquire_lock(self):
+    def release(self):
         """
-        创建或更新锁文件
+        释放锁，锁文件保留，删除会让其他进程锁住不同的文件
         """
-        with open(self.lock_file_path, 'w') as f:
-            f.write('locked')
-        # 更新锁的时间戳
-        os.utime(self.lock_file_path, None)
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
 
-    def release_lock(self):
+    def is_locked(self) -> bool:
         """
-        释放锁（删除锁文件）
+        检查锁是否被持有（本进程或其他进程）
         """
-        if os.path.exists(self.lock_file_path):
-            os.remove(self.lock_file_path)
+        if self._fd is not None:
+            return True
+        if fcntl is None or not os.path.exists(self.lock_file_path):
+            return False
+        fd = os.open(self.lock_file_path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return False
+        except OSError:
+            return True
+        finally:
+            os.close(fd)
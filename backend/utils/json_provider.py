@@ -0,0 +1,32 @@
+# json_provider.py
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+from backend.utils.serializers import json_default
+
+try:
+    import orjson  # 可选依赖，未安装时使用标准库 json
+except ImportError:
+    orjson = None
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    安装了 orjson 时用它编码 JSON 响应，否则使用标准库 json。
+    两种情况下 datetime 都输出 ISO 8601 格式（例如 2024-12-08T14:18:09），
+    不使用 Flask 默认的 HTTP 日期格式；其余类型交给 Flask 默认的 default 处理。
+    """
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return json_default(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj), mimetype=self.mimetype)
@@ -0,0 +1,103 @@
+# leader_election.py
+# 多 worker / 多实例部署时选举唯一的主实例，只有主实例运行调度器和下载队列，所有实例都提供接口
+import asyncio
+import inspect
+from typing import Awaitable, Callable, Optional
+from backend.utils.file_lock import FileLock
+from backend.utils.logging_config import loguru_logger as logger
+
+class LeaderElector:
+    """
+    定期竞选或续约：未当选时尝试获取锁，当选后按间隔续约，续约失败即卸任。
+    锁对象需要提供 acquire()/renew()/release()，可以是同步（FileLock）或异步（RedisLock）方法。
+    """
+    def __init__(self, lock, renew_interval: float,
+                 on_elected: Callable[[], Awaitable[None]], on_demoted: Callable[[], Awaitable[None]]):
+        """
+        :param renew_interval: 竞选和续约的间隔，秒；使用 Redis 时应明显小于租约有效期
+        :param on_elected: 当选后调用，启动主实例的后台服务
+        :param on_demoted: 卸任后调用，停止主实例的后台服务
+        """
+        self.lock = lock
+        self.renew_interval = renew_interval
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self._leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader
+
+    async def start(self):
+        """立即竞选一次，之后在后台定期竞选/续约"""
+        await self._elect()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止竞选并释放锁，其他实例可以接任"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._leader:
+            await self._demote("实例停止")
+            try:
+                await self._call(self.lock.release)
+            except Exception as e:
+                logger.error(f"释放主实例锁失败: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            if self._leader:
+                try:
+                    held = await self._call(self.lock.renew)
+                except Exception as e:
+                    # 无法确认租约是否仍有效，宁可卸任也不让两个实例同时推送任务
+                    logger.error(f"续约主实例锁失败: {e}")
+                    held = False
+                if not held:
+                    await self._demote("租约丢失")
+            else:
+                await self._elect()
+
+    async def _elect(self):
+        try:
+            elected = await self._call(self.lock.acquire)
+        except Exception as e:
+            logger.error(f"竞选主实例失败: {e}")
+            return
+        if not elected:
+            return
+        self._leader = True
+        logger.info("当选主实例，开始运行调度器和下载队列")
+        try:
+            await self.on_elected()
+        except Exception as e:
+            logger.error(f"启动主实例服务时出现错误: {e}")
+
+    async def _demote(self, reason: str):
+        self._leader = False
+        logger.warning(f"卸任主实例（{reason}），停止调度器和下载队列")
+        try:
+            await self.on_demoted()
+        except Exception as e:
+            logger.error(f"停止主实例服务时出现错误: {e}")
+
+    @staticmethod
+    async def _call(method):
+        result = method()
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+def create_leader_lock(backend: str, lock_file: str, redis_url: str, lease_ttl: int):
+    """
+    创建主实例锁：file 为本机文件锁，redis 为 Redis 租约（需要安装 redis）。
+    """
+    if backend == "redis":
+        from backend.utils.redis_utils import RedisLock
+        return RedisLock("anialist:leader", timeout=lease_ttl, url=redis_url)
+    if backend != "file":
+        logger.warning(f"未知的主实例锁类型 {backend}，使用文件锁")
+    return FileLock(lock_file)
@@ -0,0 +1,184 @@
+# log_follower.py
+# 实时跟随当前程序日志：所有订阅者共享同一个读取任务，按各自的级别和关键字过滤
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from backend.utils.log_index import ENTRY_RE
+from backend.utils.logging_config import loguru_logger as logger, LOGS_DIR
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # 非 Linux 或未安装时退回轮询
+    INotify = None
+
+# 没有 inotify 时的轮询间隔，秒
+POLL_INTERVAL = 1
+# 有 inotify 时的兜底检查间隔，秒（用于发现午夜轮转后尚无写入的新文件）
+WATCH_CHECK_INTERVAL = 5
+# 读取出错后重新开始的等待时间，秒
+RESTART_DELAY = 5
+
+class _LogTail:
+    """一个读取任务自己的文件句柄、路径和未写完的行，任务结束时关闭，不与其他任务共享"""
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.file = None
+        self.buffer = b""
+
+    def open(self, path: str, at_end: bool):
+        self.path = path
+        self.buffer = b""
+        try:
+            self.file = open(path, "rb")
+        except FileNotFoundError:
+            # 轮转后还没有新的日志写入
+            self.file = None
+            return
+        if at_end:
+            self.file.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def replaced(self) -> bool:
+        """同名文件是否已被替换（例如重启后 loguru 将旧文件改名）"""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self.file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def read_lines(self) -> List[bytes]:
+        """读取新追加的完整行，未写完的行留到下次"""
+        data = self.buffer + self.file.read()
+        end = data.rfind(b"\n") + 1
+        self.buffer = data[end:]
+        return data[:end].splitlines()
+
+class LogFollower:
+    """
+    跟随当天的 app_YYYY-MM-DD.log，记录已读取的偏移，只读取新追加的内容。
+    第一个订阅者连接时启动读取任务，最后一个订阅者断开时停止；读取出错时记录日志并稍后重新打开文件继续。
+    读取和订阅都必须在共享事件循环线程中进行。
+    """
+    def __init__(self, logs_dir: str, max_queue_size: int = 200):
+        self.logs_dir = logs_dir
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[asyncio.Queue, Tuple[Optional[str], Optional[str]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, level: Optional[str] = None, keyword: Optional[str] = None) -> asyncio.Queue:
+        """
+        订阅新日志。
+        :param level: 只接收该级别的日志，None 表示全部
+        :param keyword: 只接收包含该关键字（不区分大小写）的日志
+        """
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers[queue] = (level, keyword.lower() if keyword else None)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        logger.debug(f"新增日志跟随订阅者，当前共 {len(self._subscribers)} 个")
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """取消订阅，没有订阅者时停止读取"""
+        self._subscribers.pop(queue, None)
+        if not self._subscribers and self._task:
+            self._task.cancel()
+            self._task = None
+
+    def active_path(self) -> str:
+        """当天正在写入的日志文件，loguru 按本地时间命名"""
+        return os.path.join(self.logs_dir, f"app_{datetime.now():%Y-%m-%d}.log")
+
+    async def _run(self):
+        """读取任务，直到被取消；出错时记录日志，稍后从文件末尾重新开始，期间写入的日志不再推送"""
+        while True:
+            try:
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"跟随日志时出现错误，{RESTART_DELAY} 秒后重新开始: {e}")
+            await asyncio.sleep(RESTART_DELAY)
+
+    async def _follow(self):
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        watcher = self._start_watcher(loop, changed)
+        interval = WATCH_CHECK_INTERVAL if watcher else POLL_INTERVAL
+        tail = _LogTail()
+        try:
+            # 只推送订阅之后写入的日志
+            tail.open(self.active_path(), at_end=True)
+            while True:
+                await self._poll(loop, tail)
+                try:
+                    await asyncio.wait_for(changed.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+                changed.clear()
+        finally:
+            if watcher:
+                loop.remove_reader(watcher.fileno())
+                watcher.close()
+            tail.close()
+
+    def _start_watcher(self, loop: asyncio.AbstractEventLoop, changed: asyncio.Event):
+        """监听日志目录的写入和新建，不可用时返回 None"""
+        if INotify is None:
+            return None
+        try:
+            watcher = INotify()
+            watcher.add_watch(self.logs_dir, flags.MODIFY | flags.CREATE | flags.MOVED_TO)
+            loop.add_reader(watcher.fileno(), self._on_inotify, watcher, changed)
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"inotify 不可用，改为轮询日志文件: {e}")
+            return None
+        return watcher
+
+    @staticmethod
+    def _on_inotify(watcher, changed: asyncio.Event):
+        watcher.read(timeout=0)
+        changed.set()
+
+    async def _poll(self, loop: asyncio.AbstractEventLoop, tail: _LogTail):
+        if tail.file:
+            self._dispatch(await loop.run_in_executor(None, tail.read_lines))
+        path = self.active_path()
+        if path != tail.path or tail.file is None or tail.replaced():
+            # 午夜轮转：旧文件已经读完（轮转后句柄仍可读取剩余内容），从头读取新文件
+            tail.close()
+            tail.open(path, at_end=False)
+            if tail.file:
+                self._dispatch(await loop.run_in_executor(None, tail.read_lines))
+
+    def _dispatch(self, lines: List[bytes]):
+        """把行合并为日志条目（异常堆栈并入上一条），按订阅者的过滤条件分发"""
+        entries = []
+        for line in lines:
+            match = ENTRY_RE.match(line)
+            if match or not entries:
+                entries.append([match.group(2).decode("ascii") if match else None, [line]])
+            else:
+                entries[-1][1].append(line)
+
+        for level, entry_lines in entries:
+            text = b"\n".join(entry_lines).decode("utf-8", errors="replace")
+            message = {"event": "log", "data": {"level": level, "line": text}, "time": datetime.now()}
+            lowered = None
+            for queue, (level_filter, keyword) in list(self._subscribers.items()):
+                if level_filter and level != level_filter:
+                    continue
+                if keyword:
+                    lowered = lowered if lowered is not None else text.lower()
+                    if keyword not in lowered:
+                        continue
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(message)
+
+# 程序日志的全局跟随实例
+log_follower = LogFollower(LOGS_DIR)
@@ -0,0 +1,292 @@
+# log_index.py
+# 程序日志的侧车索引：记录每条日志的起始偏移、时间戳和级别，
+# 分页查询时直接按偏移读取所需条目，不再逐行扫描全部日志文件
+import os
+import re
+import time
+import struct
+import zipfile
+import threading
+from array import array
+from datetime import datetime, date
+from typing import Dict, List, Optional, Tuple
+from backend.utils.logging_config import loguru_logger as logger
+
+LEVELS = ("TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR", "CRITICAL")
+LEVEL_CODES = {name: code for code, name in enumerate(LEVELS)}
+UNKNOWN_LEVEL = 255
+
+# 每条日志以 "YYYY-MM-DD HH:mm:ss | LEVEL |" 开头，其余行（如异常堆栈）属于上一条日志
+ENTRY_RE = re.compile(rb"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \| ([A-Z]+) \|")
+# app_2024-12-08.log，以及 loguru 因重名而改名的 app_2024-12-08.2024-12-08_14-18-09_123456.log，
+# 轮转后压缩的归档在其后加 .zip
+APP_LOG_RE = re.compile(r"^app_(\d{4}-\d{2}-\d{2})(?:\.([\w\-]+))?\.log(\.zip)?$")
+
+INDEX_MAGIC = b"ALIX"
+INDEX_VERSION = 1
+# magic, version, inode, indexed_size, entry_count
+INDEX_HEADER = struct.Struct("<4sHQQQ")
+# 正在写入的日志文件，索引最多每隔这么多秒落盘一次
+SAVE_INTERVAL = 30
+
+class LogIndex:
+    """单个日志文件的索引，随文件追加增量更新"""
+    def __init__(self, log_path: str, index_path: str):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.offsets = array('Q')     # 每条日志的起始字节偏移
+        self.timestamps = array('I')  # 每条日志的时间（本地时间的 epoch 秒）
+        self.levels = array('B')      # 每条日志的级别编码
+        self.postings: Dict[int, array] = {}  # 级别编码 -> 该级别的条目序号
+        self.inode = 0
+        self.indexed_size = 0  # 已建立索引的字节数，只包含完整的行
+        self._saved_at = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _reset(self, inode: int):
+        self.offsets = array('Q')
+        self.timestamps = array('I')
+        self.levels = array('B')
+        self.postings = {}
+        self.inode = inode
+        self.indexed_size = 0
+
+    def _load(self):
+        """从侧车文件加载索引，文件不存在或与日志不匹配时忽略"""
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, version, inode, indexed_size, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    return
+                offsets, timestamps, levels = array('Q'), array('I'), array('B')
+                offsets.fromfile(f, count)
+                timestamps.fromfile(f, count)
+                levels.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return
+
+        self.offsets, self.timestamps, self.levels = offsets, timestamps, levels
+        self.inode = inode
+        self.indexed_size = indexed_size
+        for position, level in enumerate(levels):
+            self.postings.setdefault(level, array('I')).append(position)
+        self._saved_at = time.monotonic()
+
+    def _save(self):
+        """将索引写入侧车文件"""
+        temp_path = self.index_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.inode, self.indexed_size, len(self.offsets)))
+                self.offsets.tofile(f)
+                self.timestamps.tofile(f)
+                self.levels.tofile(f)
+            os.replace(temp_path, self.index_path)
+            self._saved_at = time.monotonic()
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"保存日志索引 {self.index_path} 失败: {e}")
+
+    def refresh(self):
+        """只扫描上次索引之后新追加的内容"""
+        with self._lock:
+            stat = os.stat(self.log_path)
+            if stat.st_ino != self.inode or stat.st_size < self.indexed_size:
+                # 文件被替换或截断，重建索引
+                self._reset(stat.st_ino)
+                self._dirty = True
+            if stat.st_size > self.indexed_size:
+                self._scan()
+            if self._dirty and time.monotonic() - self._saved_at > SAVE_INTERVAL:
+                self._save()
+
+    def _open(self):
+        return open(self.log_path, "rb")
+
+    def _scan(self):
+        offset = self.indexed_size
+        with self._open() as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 最后一行尚未写完，下次再索引
+                    break
+                match = ENTRY_RE.match(line)
+                if match:
+                    self._append_entry(offset, match.group(1), match.group(2))
+                offset += len(line)
+        if offset != self.indexed_size:
+            self.indexed_size = offset
+            self._dirty = True
+
+    def _append_entry(self, offset: int, raw_time: bytes, raw_level: bytes):
+        try:
+            timestamp = int(datetime.strptime(raw_time.decode("ascii"), "%Y-%m-%d %H:%M:%S").timestamp())
+        except ValueError:
+            timestamp = 0
+        level = LEVEL_CODES.get(raw_level.decode("ascii"), UNKNOWN_LEVEL)
+        position = len(self.offsets)
+        self.offsets.append(offset)
+        self.timestamps.append(timestamp)
+        self.levels.append(level)
+        self.postings.setdefault(level, array('I')).append(position)
+
+    def entry_ids(self, level: Optional[str] = None):
+        """返回指定级别（None 表示全部）的条目序号，按时间正序"""
+        if level is None:
+            return range(len(self.offsets))
+        code = LEVEL_CODES.get(level)
+        if code is None:
+            return array('I')
+        return self.postings.get(code, array('I'))
+
+    def read_entries(self, positions: List[int]) -> List[str]:
+        """按条目序号读取日志文本，多行日志（异常堆栈）作为一条返回"""
+        entries = {}
+        with self._open() as f:
+            # 按偏移升序读取，压缩归档只需向前解压一遍
+            for position in sorted(positions):
+                start = self.offsets[position]
+                end = self.offsets[position + 1] if position + 1 < len(self.offsets) else self.indexed_size
+                f.seek(start)
+                entries[position] = f.read(end - start).decode("utf-8", errors="replace").rstrip("\n")
+        return [entries[position] for position in positions]
+
+class ZipLogIndex(LogIndex):
+    """
+    loguru 轮转后压缩的日志归档。归档不会再变化，只需流式解压建立一次索引；
+    偏移对应解压后的内容，读取时在解压流中向前 seek，不会整体载入内存。
+    """
+    def _open(self):
+        archive = zipfile.ZipFile(self.log_path)
+        try:
+            # loguru 的归档中只有一个文件，即轮转前的日志
+            return _ArchiveMember(archive, archive.open(archive.namelist()[0]))
+        except Exception:
+            archive.close()
+            raise
+
+    def refresh(self):
+        with self._lock:
+            stat = os.stat(self.log_path)
+            if stat.st_ino == self.inode and self.indexed_size:
+                return
+            self._reset(stat.st_ino)
+            self._scan()
+            self._save()
+
+class _ArchiveMember:
+    """归档内文件的读取句柄，关闭时一并关闭归档"""
+    def __init__(self, archive: zipfile.ZipFile, member):
+        self.archive = archive
+        self.member = member
+
+    def __getattr__(self, name):
+        return getattr(self.member, name)
+
+    def __iter__(self):
+        return iter(self.member)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.member.close()
+        self.archive.close()
+
+class LogQueryEngine:
+    """基于侧车索引的日志分页查询，结果按时间倒序"""
+    def __init__(self, logs_dir: str):
+        self.logs_dir = logs_dir
+        self.index_dir = os.path.join(logs_dir, ".index")
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._indexes: Dict[str, LogIndex] = {}
+        self._lock = threading.Lock()
+
+    def list_log_files(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[str]:
+        """
+        按文件名中的日期筛选日志文件（含压缩归档），范围外的文件不会被打开。
+        返回按时间倒序排列的文件名：同一天内当前文件在前，loguru 改名保存的旧文件在后。
+        """
+        candidates = []
+        for file_name in os.listdir(self.logs_dir):
+            match = APP_LOG_RE.match(file_name)
+            if not match:
+                continue
+            log_date = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+            if start_date and log_date < start_date:
+                continue
+            if end_date and log_date > end_date:
+                continue
+            suffix, zipped = match.group(2), match.group(3)
+            candidates.append(((log_date, suffix is None and not zipped, suffix or ""), file_name))
+        candidates.sort(reverse=True)
+        return [file_name for _, file_name in candidates]
+
+    def get_index(self, file_name: str) -> LogIndex:
+        with self._lock:
+            index = self._indexes.get(file_name)
+            if index is None:
+                index_class = ZipLogIndex if file_name.endswith(".zip") else LogIndex
+                index = index_class(
+                    os.path.join(self.logs_dir, file_name),
+                    os.path.join(self.index_dir, file_name + ".idx"),
+                )
+                self._indexes[file_name] = index
+            return index
+
+    def forget_missing(self, existing: List[str]):
+        """清理已被删除或压缩的日志文件的索引"""
+        existing = set(existing)
+        with self._lock:
+            for file_name in [name for name in self._indexes if name not in existing]:
+                del self._indexes[file_name]
+        for index_name in os.listdir(self.index_dir):
+            if index_name.endswith(".idx") and index_name[:-4] not in existing:
+                try:
+                    os.remove(os.path.join(self.index_dir, index_name))
+                except OSError:
+                    pass
+
+    def query(self, level: Optional[str], start_date: Optional[date], end_date: Optional[date],
+              page: int, page_size: int) -> Tuple[List[str], int, bool]:
+        """
+        分页查询日志。从最新的文件开始，只刷新填满当前页所需的文件，取满后确认之后是否还有日志即停止，
+        不会为了统计总数打开保留期内的全部日志。
+        :param level: 日志级别，None 表示全部
+        :return: (当前页的日志, 已统计的条数, 是否还有更早的日志)；
+                 没有更早的日志时条数即总数，否则只是已打开的文件中的条数
+        """
+        all_files = self.list_log_files()
+        self.forget_missing(all_files)
+
+        # 跳过前面的页，再直接按偏移读取当前页
+        skip = max(page - 1, 0) * page_size
+        remaining = page_size
+        logs = []
+        counted = 0
+        for file_name in self.list_log_files(start_date, end_date):
+            index = self.get_index(file_name)
+            index.refresh()
+            ids = index.entry_ids(level)
+            count = len(ids)
+            counted += count
+            if remaining == 0:
+                # 当前页已取满，之前的文件正好用完，遇到下一条即可确认还有更多
+                if count:
+                    return logs, counted, True
+                continue
+            if skip >= count:
+                skip -= count
+                continue
+            take = min(count - skip, remaining)
+            # 文件内按时间正序存放，倒数第 skip 条起向前取 take 条
+            positions = [ids[i] for i in range(count - skip - 1, count - skip - take - 1, -1)]
+            logs.extend(index.read_entries(positions))
+            remaining -= take
+            if remaining == 0 and skip + take < count:
+                return logs, counted, True
+            skip = 0
+        return logs, counted, False
@@ -1,4 +1,5 @@
 import os
+import json
 from loguru import logger
 
 # 程序日志路径
@@ -7,10 +8,34 @@ LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 # 登录日志目录路径
 LOGIN_LOG_DIR = os.path.join(LOGS_DIR, "login")
 LOGIN_LOG_FILE = os.path.join(LOGS_DIR, 'login', 'login.log')
+# 结构化日志（JSON Lines）目录路径
+JSON_LOGS_DIR = os.path.join(LOGS_DIR, "json")
 
 # 检查目录是否存在，不存在则创建
 os.makedirs(LOGS_DIR, exist_ok=True)
 os.makedirs(LOGIN_LOG_DIR, exist_ok=True)
+os.makedirs(JSON_LOGS_DIR, exist_ok=True)
+
+def serialize_record(record):
+    """
+    把日志记录序列化为一行 JSON，绑定的上下文（magnet_id、feed_id、alist_task_id 等）放在 context 中。
+    loguru 的 format 函数返回的是格式模板，因此先把结果放进 extra 再引用。
+    """
+    context = {key: value for key, value in record["extra"].items() if key != "serialized"}
+    payload = {
+        "time": record["time"].strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "ts": record["time"].timestamp(),
+        "level": record["level"].name,
+        "file": record["file"].name,
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+        "context": context,
+    }
+    if record["exception"]:
+        payload["exception"] = repr(record["exception"].value)
+    record["extra"]["serialized"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[serialized]}\n"
 
 # 清除默认的处理器
 logger.remove()
@@ -26,6 +51,16 @@ logger.add(
     enqueue=True,  # 异步写入日志，防止阻塞
 )
 
+# 配置结构化日志，供按磁链、订阅、Alist 任务检索
+logger.add(
+    os.path.join(JSON_LOGS_DIR, "app_{time:YYYY-MM-DD}.jsonl"),
+    rotation="00:00",
+    retention="90 days",
+    level="DEBUG",
+    format=serialize_record,
+    enqueue=True,
+)
+
 # 配置登录日志
 logger.add(
     os.path.join(LOGIN_LOG_DIR, "login.log"),
@@ -36,5 +71,9 @@ logger.add(
     enqueue=True,
 )
 
+def magnet_log_context(magnet):
+    """为处理某个磁链期间的日志绑定 magnet_id 和 feed_id"""
+    return logger.contextualize(magnet_id=magnet.id, feed_id=magnet.rss_feed_id)
+
 # 导出 logger 实例
 loguru_logger = logger
@@ -0,0 +1,121 @@
+# login_log.py
+# 登录日志读取：维护每个 IP 最近一次登录的记录，每次请求只解析新追加的行
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from backend.utils.reverse_reader import read_lines_reversed
+from backend.utils.logging_config import loguru_logger as logger
+
+LOGIN_LOG_NAME = "login.log"
+# loguru 按大小轮转后的文件：login.2024-12-08_14-18-09_123456.log
+ROTATED_LOGIN_LOG_RE = re.compile(r"^login\.([\w\-]+)\.log$")
+
+def parse_login_line(line: str) -> Optional[dict]:
+    """解析 "2024-12-08 14:18:09 | 用户: admin | IP 地址: 127.0.0.1"，格式不符时返回 None"""
+    parts = line.strip().split(" | ")
+    if len(parts) != 3:
+        return None
+    try:
+        raw_time = parts[0]
+        username = parts[1].split(": ", 1)[1]
+        ip_address = parts[2].split(": ", 1)[1]
+        try:
+            login_time = datetime.strptime(raw_time, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            # 兼容带时区的 ISO 时间
+            login_time = datetime.fromisoformat(raw_time).astimezone().replace(tzinfo=None)
+    except (IndexError, ValueError) as e:
+        logger.error(f"解析失败: {line.strip()}, 错误: {e}")
+        return None
+    return {
+        "time": login_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "ip_address": ip_address,
+        "username": username,
+    }
+
+class LoginLogReader:
+    """
+    首次读取时从最新的日志向前按块读取（包括轮转出的 login.*.log），每个 IP 只保留最近一条；
+    之后记录当前文件已读到的偏移，每次只解析新追加的行。
+    """
+    def __init__(self, log_dir: str):
+        self.log_dir = log_dir
+        self.log_path = os.path.join(log_dir, LOGIN_LOG_NAME)
+        self.latest: Dict[str, dict] = {}
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def rotated_files(self) -> List[str]:
+        """按时间倒序返回轮转出的登录日志"""
+        names = [name for name in os.listdir(self.log_dir) if ROTATED_LOGIN_LOG_RE.match(name)]
+        return [os.path.join(self.log_dir, name) for name in sorted(names, reverse=True)]
+
+    def get_latest_logins(self) -> List[dict]:
+        """返回每个 IP 最近一次登录，按时间倒序"""
+        with self._lock:
+            if not self.loaded:
+                self._load()
+            else:
+                self._refresh()
+            return sorted(self.latest.values(), key=lambda entry: entry["time"], reverse=True)
+
+    def _load(self):
+        """从最新的记录开始倒序读取，已出现的 IP 不再覆盖"""
+        if os.path.exists(self.log_path):
+            self.inode = os.stat(self.log_path).st_ino
+            self.offset = self._complete_size(self.log_path)
+            self._collect_reversed(self.log_path, self.offset)
+        for path in self.rotated_files():
+            self._collect_reversed(path, None)
+        self.loaded = True
+
+    def _collect_reversed(self, path: str, end: Optional[int]):
+        for line in read_lines_reversed(path, end):
+            entry = parse_login_line(line.decode("utf-8", errors="replace"))
+            if entry and entry["ip_address"] not in self.latest:
+                self.latest[entry["ip_address"]] = entry
+
+    def _refresh(self):
+        """解析上次读取之后追加的行，处理按大小轮转"""
+        if not os.path.exists(self.log_path):
+            return
+        stat = os.stat(self.log_path)
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # 当前文件已被轮转，先补读旧文件中尚未读取的尾部
+            for path in self.rotated_files():
+                if os.stat(path).st_ino == self.inode:
+                    self._collect_forward(path, self.offset, self._complete_size(path))
+                    break
+            self.inode = stat.st_ino
+            self.offset = 0
+        end = self._complete_size(self.log_path)
+        if end > self.offset:
+            self._collect_forward(self.log_path, self.offset, end)
+            self.offset = end
+
+    def _collect_forward(self, path: str, start: int, end: int):
+        with open(path, "rb") as f:
+            f.seek(start)
+            for line in f.read(end - start).splitlines():
+                entry = parse_login_line(line.decode("utf-8", errors="replace"))
+                if entry:
+                    self.latest[entry["ip_address"]] = entry
+
+    @staticmethod
+    def _complete_size(path: str) -> int:
+        """文件中最后一个换行符之后的位置，尚未写完的行留到下次读取"""
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            position = size
+            while position > 0:
+                read_size = min(4096, position)
+                position -= read_size
+                f.seek(position)
+                newline = f.read(read_size).rfind(b"\n")
+                if newline != -1:
+                    return position + newline + 1
+            return 0
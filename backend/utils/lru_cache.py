@@ -0,0 +1,74 @@
+# lru_cache.py
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar('T')
+
+_MISSING = object()
+
+class LRUCache(Generic[T]):
+    """
+    线程安全的有界 LRU 缓存，可选 TTL，并统计命中率。
+    Flask 请求线程和后台事件循环线程会同时访问，所以用 threading.Lock 保护。
+    """
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        """
+        :param maxsize: 最大条目数，超出后淘汰最久未使用的条目
+        :param ttl: 条目存活秒数，None 表示不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[T]:
+        """读取缓存，未命中或已过期返回 default"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: T):
+        """写入缓存"""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """删除单个条目"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """返回缓存大小和命中率"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
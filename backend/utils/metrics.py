@@ -0,0 +1,232 @@
+# metrics.py
+# 进程内的 Prometheus 指标：计数器、仪表、直方图，按文本格式（0.0.4）输出，供 /metrics 抓取。
+# 只实现需要用到的部分，不依赖 prometheus_client
+import os
+import time
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认的耗时分桶，秒
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class _Child:
+    """绑定了标签值的指标"""
+    def __init__(self, metric: "_Metric", key: Tuple[str, ...]):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1):
+        self._metric._inc(self._key, amount)
+
+    def dec(self, amount: float = 1):
+        self._metric._inc(self._key, -amount)
+
+    def set(self, value: float):
+        self._metric._set(self._key, value)
+
+    def observe(self, value: float):
+        self._metric._observe(self._key, value)
+
+    @contextmanager
+    def time(self):
+        """记录代码块的耗时（直方图）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def labels(self, *values, **kwargs) -> _Child:
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+        return _Child(self, tuple(str(value) for value in values))
+
+    # 没有标签时可以直接调用
+    def inc(self, amount: float = 1):
+        self._inc((), amount)
+
+    def observe(self, value: float):
+        self._observe((), value)
+
+    def time(self):
+        return _Child(self, ()).time()
+
+    def _label_string(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        # 多 worker 时每个进程各自统计，样本带上进程号区分，查询时按 sum without (pid) 汇总；
+        # 进程号在输出时读取，fork 出的 worker 不会沿用父进程的值
+        pairs = [("pid", str(os.getpid()))] + list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """返回该指标的样本行"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        return lines + self._samples()
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def _inc(self, key, amount):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{self._label_string(key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(_Metric):
+    """可增可减的仪表，也可以在抓取时由回调函数取值"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set(self, value: float):
+        self._set((), value)
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]):
+        """抓取时调用 function 取值，返回 标签值元组 -> 数值"""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function:
+            values = list(self._function().items())
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f"{self.name}{self._label_string(tuple(map(str, key)))} {_format_value(value)}" for key, value in values]
+
+class Histogram(_Metric):
+    """分桶统计的直方图"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Tuple[str, ...], list] = {}  # 标签值 -> [各桶计数, 总和, 总数]
+
+    def _observe(self, key, value):
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                label = self._label_string(key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{label} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_string(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_string(key)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"指标 {metric.name} 已存在")
+        self._metrics[metric.name] = metric
+
+    def generate_latest(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# ---- 各阶段的指标 ----
+
+# Alist 接口
+ALIST_REQUEST_DURATION = Histogram(
+    "anialist_alist_request_duration_seconds", "Alist API 请求耗时", ("method", "endpoint"))
+ALIST_REQUEST_ERRORS = Counter(
+    "anialist_alist_request_errors_total", "Alist API 请求失败次数", ("method", "endpoint"))
+
+# RSS 订阅
+RSS_FETCH_DURATION = Histogram(
+    "anialist_rss_fetch_duration_seconds", "获取并解析单个 RSS 订阅的耗时（含代理重试）")
+RSS_FETCH_ERRORS = Counter("anialist_rss_fetch_errors_total", "获取或解析 RSS 订阅失败次数")
+RSS_REFRESH_ITEMS = Histogram(
+    "anialist_rss_refresh_items", "每次获取单个订阅解析到的磁链数量（屏蔽词过滤后）", buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+# 数据库
+DB_QUERY_DURATION = Histogram("anialist_db_query_duration_seconds", "数据库语句执行耗时", ("operation",))
+
+# 下载队列与监控
+MAGNETS_CLAIMED = Counter("anialist_magnets_claimed_total", "从数据库认领进入下载队列的磁链数")
+MAGNET_PUSHES = Counter("anialist_magnet_pushes_total", "推送到 Alist 的次数", ("backend", "result"))
+MAGNET_COMPLETIONS = Counter("anialist_magnet_completions_total", "上传完成的磁链数", ("backend",))
+MAGNET_FAILURES = Counter(
+    "anialist_magnet_failures_total", "处理失败的次数，reason 为 timeout/stalled/alist_failed/push_failed，outcome 为 retry/failed",
+    ("backend", "reason", "outcome"))
+MAGNET_PROCESSING_DURATION = Histogram(
+    "anialist_magnet_processing_seconds", "磁链从推送到上传完成的耗时", ("backend",),
+    buckets=(60, 300, 600, 1800, 3600, 7200, 14400, 43200, 86400))
+QUEUE_DEPTH = Gauge("anialist_queue_depth", "各后端下载队列和挂起队列中的磁链数", ("backend", "queue"))
+BACKEND_BUSY = Gauge("anialist_backend_busy", "后端是否正在处理磁链", ("backend",))
+BACKEND_HEALTHY = Gauge("anialist_backend_healthy", "后端是否可用", ("backend",))
+LEADER = Gauge("anialist_leader", "本进程是否为运行下载队列的主实例")
+
+def generate_latest() -> str:
+    return REGISTRY.generate_latest()
@@ -0,0 +1,74 @@
+# progress_tracker.py
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Optional, Tuple
+
+class ProgressTracker:
+    """
+    记录一个任务最近一段时间的进度采样，用于估算速率、剩余时间和判断是否停滞。
+    进度为 0~100 的百分比。
+    """
+    def __init__(self, window: timedelta):
+        """
+        :param window: 估算速率时使用的采样时间窗口
+        """
+        self.window = window
+        self.samples: Deque[Tuple[datetime, float]] = deque()
+        self.started_at: Optional[datetime] = None
+        self.last_advance: Optional[datetime] = None  # 进度最近一次增长的时间
+        self.best_progress = 0.0
+        self._observed_at: Optional[datetime] = None  # 最近一次采样（或确认进度未知）的时间
+
+    def reset(self, now: datetime):
+        self.samples.clear()
+        self.started_at = now
+        self.last_advance = now
+        self.best_progress = 0.0
+        self._observed_at = now
+
+    def record(self, now: datetime, progress: float):
+        if self.started_at is None:
+            self.reset(now)
+        progress = float(progress or 0)
+        if progress > self.best_progress:
+            self.best_progress = progress
+            self.last_advance = now
+        self._observed_at = now
+        self.samples.append((now, progress))
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+    def hold(self, now: datetime):
+        """进度未知（找不到对应的任务）：这段时间不计入停滞"""
+        if self.started_at is None:
+            self.reset(now)
+            return
+        self.last_advance += now - self._observed_at
+        self._observed_at = now
+
+    @property
+    def progress(self) -> float:
+        return self.samples[-1][1] if self.samples else 0.0
+
+    def rate(self) -> Optional[float]:
+        """窗口内的平均速率，百分比/秒；采样不足或没有增长时返回 None"""
+        if len(self.samples) < 2:
+            return None
+        (first_time, first_progress), (last_time, last_progress) = self.samples[0], self.samples[-1]
+        elapsed = (last_time - first_time).total_seconds()
+        if elapsed <= 0 or last_progress <= first_progress:
+            return None
+        return (last_progress - first_progress) / elapsed
+
+    def estimate_remaining(self) -> Optional[timedelta]:
+        """按当前速率估算剩余时间"""
+        rate = self.rate()
+        if rate is None:
+            return None
+        return timedelta(seconds=max(100 - self.progress, 0) / rate)
+
+    def stalled_for(self, now: datetime) -> timedelta:
+        """进度没有增长的持续时间"""
+        if self.last_advance is None:
+            return timedelta(0)
+        return now - self.last_advance
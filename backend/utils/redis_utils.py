@@ -1,24 +1,43 @@
+from uuid import uuid4
 from redis.asyncio import Redis
-    
+
+# 只有持有者（令牌一致）才能续期和释放，避免租约过期后误删其他实例的锁
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 class RedisLock:
-    """异步 Redis 锁封装"""
-    def __init__(self, lock_name: str, timeout: int = 30):
+    """异步 Redis 锁封装，以带过期时间的租约实现，用于跨主机的多个实例"""
+    def __init__(self, lock_name: str, timeout: int = 30, url: str = "redis://localhost:6379/0"):
+        """
+        :param timeout: 租约有效期，秒；持有者需要在过期前续期
+        """
         self.lock_name = lock_name
         self.timeout = timeout
-        self.redis_client = Redis(host="localhost", port=6379, decode_responses=False)
+        self.token = uuid4().hex
+        self.redis_client = Redis.from_url(url, decode_responses=True)
 
     async def acquire(self) -> bool:
         """异步获取锁"""
-        return await self.redis_client.set(self.lock_name, "locked", ex=self.timeout, nx=True)
+        return bool(await self.redis_client.set(self.lock_name, self.token, ex=self.timeout, nx=True))
+
+    async def renew(self) -> bool:
+        """续期租约，返回是否仍持有锁"""
+        return bool(await self.redis_client.eval(RENEW_SCRIPT, 1, self.lock_name, self.token, self.timeout))
 
     async def release(self):
         """异步释放锁"""
-        if await self.redis_client.get(self.lock_name):
-            await self.redis_client.delete(self.lock_name)
+        await self.redis_client.eval(RELEASE_SCRIPT, 1, self.lock_name, self.token)
 
     async def is_locked(self) -> bool:
         """检查锁是否存在"""
         return await self.redis_client.exists(self.lock_name) == 1
-
-# 创建redis锁实例
-lock = RedisLock("task_lock", timeout=30)
\ No newline at end of file
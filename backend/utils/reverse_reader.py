@@ -0,0 +1,24 @@
+# reverse_reader.py
+import os
+from typing import Iterator, Optional
+
+def read_lines_reversed(path: str, end: Optional[int] = None, block_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    从文件末尾（或指定偏移 end）按块向前读取，倒序逐行返回，不含换行符。
+    只读取调用方实际消费到的部分，适合“取最新 N 条”的场景。
+    """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END) if end is None else end
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # 第一段可能是被块边界截断的行，留到读取前一块时拼接
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if remainder:
+            yield remainder
@@ -3,11 +3,19 @@ import asyncio
 import feedparser
 from backend.core.config import BLOCKED_WORDS, PROXIES
 from backend.utils.logging_config import loguru_logger as logger
+from backend.utils.metrics import RSS_FETCH_DURATION, RSS_FETCH_ERRORS, RSS_REFRESH_ITEMS
 
 async def parse_rss_feed(feed_url, rss_feed_id, proxy=None):
     """
     解析单个 RSSFeed，返回磁力链接列表，并包含对应的 rss_feed_id。
     """
+    with logger.contextualize(feed_id=rss_feed_id):
+        with RSS_FETCH_DURATION.time():
+            torrents = await _parse_rss_feed(feed_url, rss_feed_id, proxy)
+        RSS_REFRESH_ITEMS.observe(len(torrents))
+        return torrents
+
+async def _parse_rss_feed(feed_url, rss_feed_id, proxy=None):
     try:
         async with aiohttp.ClientSession() as http_session:
             async with http_session.get(feed_url, proxy=proxy, timeout=10) as response:
@@ -53,11 +61,12 @@ async def parse_rss_feed(feed_url, rss_feed_id, proxy=None):
                 return torrents
 
     except Exception as e:
+        RSS_FETCH_ERRORS.inc()
         logger.error(f"解析 RSSFeed '{feed_url}' 失败: {e}")
         # 尝试使用代理重新解析
         if not proxy:
             logger.warning(f"尝试使用代理重新解析 RSSFeed '{feed_url}'")
-            return await parse_rss_feed(feed_url, rss_feed_id, proxy=PROXIES.get("http"))
+            return await _parse_rss_feed(feed_url, rss_feed_id, proxy=PROXIES.get("http"))
         return []
 
 async def parse_multiple_rss(feed_urls_with_ids):
@@ -0,0 +1,42 @@
+# serializers.py
+# Magnet / RSSFeed 转换为接口返回的字典，视图和事件推送共用。
+# 时间统一在这里转为 ISO 8601 字符串，输出格式不取决于使用哪个 JSON 编码器
+from datetime import date
+
+def format_datetime(value):
+    """datetime/date 转为 ISO 8601 字符串，None 保持不变"""
+    return value.isoformat() if value is not None else None
+
+def json_default(obj):
+    """json.dumps 的 default：时间输出 ISO 8601，其余类型转为字符串"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    return str(obj)
+
+def serialize_magnet(magnet) -> dict:
+    return {
+        "id": magnet.id,
+        "rss_feed_id": magnet.rss_feed_id,
+        "title": magnet.title,
+        "name": magnet.name,
+        "magnet_link": magnet.magnet_link,
+        "status": magnet.status,
+        "state": magnet.state,
+        "priority": magnet.priority,
+        "attempts": magnet.attempts,
+        "alist_task_id": magnet.alist_task_id,
+        "alist_transfer_id": magnet.alist_transfer_id,
+        "alist_backend": magnet.alist_backend,
+        "next_attempt_at": format_datetime(magnet.next_attempt_at),
+        "timestamp": format_datetime(magnet.timestamp),
+    }
+
+def serialize_rss_feed(feed) -> dict:
+    return {
+        "id": feed.id,
+        "name": feed.name,
+        "url": feed.url,
+        "last_updated": format_datetime(feed.last_updated),
+        "should_update": feed.should_update,
+        "weight": feed.weight,
+    }
@@ -0,0 +1,60 @@
+# static_assets.py
+import os
+import re
+import gzip
+from backend.utils.logging_config import loguru_logger as logger
+
+try:
+    import brotli  # 可选依赖，未安装时只生成 gzip
+except ImportError:
+    brotli = None
+
+# 构建产物中带内容哈希的文件名，例如 app.b19cc19b.js
+HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.")
+
+# 值得压缩的文本类资源，woff2/png 等已压缩格式不处理
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".css", ".map", ".json", ".svg", ".txt", ".ico", ".ttf", ".eot"}
+
+# 按优先级排列的预压缩变体：(Content-Encoding, 文件后缀)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+def _compress_to(source_path: str, target_path: str, compress) -> bool:
+    """压缩单个文件，源文件未变且压缩文件已存在时跳过"""
+    if os.path.exists(target_path) and os.path.getmtime(target_path) >= os.path.getmtime(source_path):
+        return False
+    with open(source_path, "rb") as source:
+        data = source.read()
+    compressed = compress(data)
+    if len(compressed) >= len(data):
+        return False
+    with open(target_path, "wb") as target:
+        target.write(compressed)
+    return True
+
+def precompress_assets(root: str, min_size: int = 1024) -> int:
+    """
+    为前端构建目录中的文本资源生成 .gz（以及安装了 brotli 时的 .br）预压缩文件，
+    请求时直接发送，不再每次压缩。目录只读时跳过。
+    :return: 新生成的文件数量
+    """
+    compressors = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.append((".br", lambda data: brotli.compress(data, quality=11)))
+
+    created = 0
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            if os.path.splitext(file_name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            source_path = os.path.join(directory, file_name)
+            if os.path.getsize(source_path) < min_size:
+                continue
+            for suffix, compress in compressors:
+                try:
+                    if _compress_to(source_path, source_path + suffix, compress):
+                        created += 1
+                except OSError as e:
+                    logger.warning(f"预压缩静态资源 {source_path} 失败: {e}")
+                    return created
+    logger.info(f"前端静态资源预压缩完成，新生成 {created} 个文件")
+    return created
@@ -0,0 +1,70 @@
+# structured_log.py
+# 查询 JSON Lines 结构化日志：按上下文字段、级别和时间范围过滤，结果按时间倒序
+import os
+import re
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from backend.utils.reverse_reader import read_lines_reversed
+
+# app_2024-12-08.jsonl，以及 loguru 因重名而改名的 app_2024-12-08.2024-12-08_14-18-09_123456.jsonl
+JSON_LOG_RE = re.compile(r"^app_(\d{4}-\d{2}-\d{2})(?:\.([\w\-]+))?\.jsonl$")
+
+# 允许作为过滤条件的上下文字段
+CONTEXT_FIELDS = ("magnet_id", "feed_id", "alist_task_id")
+
+def list_json_logs(logs_dir: str, start: Optional[datetime], end: Optional[datetime]) -> List[str]:
+    """按文件名中的日期筛选结构化日志文件，返回按时间倒序排列的路径"""
+    candidates = []
+    for file_name in os.listdir(logs_dir):
+        match = JSON_LOG_RE.match(file_name)
+        if not match:
+            continue
+        log_date = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+        if start and log_date < start.date():
+            continue
+        if end and log_date > end.date():
+            continue
+        suffix = match.group(2)
+        candidates.append(((log_date, suffix is None, suffix or ""), os.path.join(logs_dir, file_name)))
+    candidates.sort(reverse=True)
+    return [path for _, path in candidates]
+
+def query_structured_logs(logs_dir: str, context: Dict[str, str], level: Optional[str] = None,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          before: Optional[float] = None, limit: int = 100) -> Tuple[List[dict], bool]:
+    """
+    从最新的日志开始倒序读取，取满 limit 条即停止。
+    上下文字段没有索引，是对日志文件的线性扫描：开销与扫描到的行数成正比，取满 limit 条或早于 start 时结束，
+    日志按天分文件，时间范围之外的文件不会打开。
+    :param context: 上下文字段过滤条件，值按字符串比较
+    :param before: 分页游标，只返回 ts 小于该值的日志
+    :return: (日志列表, 是否还有更早的日志)
+    """
+    start_ts = start.timestamp() if start else None
+    end_ts = end.timestamp() if end else None
+    upper_ts = min(value for value in (end_ts, before) if value is not None) if end_ts or before else None
+
+    results = []
+    for path in list_json_logs(logs_dir, start, end):
+        for line in read_lines_reversed(path):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 正在写入的最后一行可能不完整
+                continue
+            ts = record.get("ts", 0)
+            if upper_ts is not None and ts >= upper_ts:
+                continue
+            if start_ts is not None and ts < start_ts:
+                # 文件内按时间顺序写入，之前的记录都更早
+                break
+            if level and record.get("level") != level:
+                continue
+            record_context = record.get("context") or {}
+            if any(str(record_context.get(key)) != value for key, value in context.items()):
+                continue
+            results.append(record)
+            if len(results) > limit:
+                return results[:limit], True
+    return results, False
@@ -1,25 +1,128 @@
+import time
+import threading
 import jwt
+from typing import Dict
+from collections import OrderedDict
 from flask import request, jsonify
-from backend.core.config import SECRET_KEY
+from backend.core.config import SECRET_KEY, TOKEN_REVOCATION_SYNC_INTERVAL
+from backend.services import token_service
 from backend.utils.logging_config import loguru_logger as logger
 
+class VerifiedTokenCache:
+    """
+    已验证 Token 的有界缓存，命中时跳过 JWT 解码和 HMAC 校验，条目在 Token 的 exp 到期后失效。
+    吊销记录保存在数据库中（见 token_service），这里是本进程的副本：本进程吊销的立即生效，
+    其他 worker / 实例吊销的在下次同步（最多 TOKEN_REVOCATION_SYNC_INTERVAL 秒）后生效。
+    """
+    def __init__(self, maxsize: int = 1024, sync_interval: float = TOKEN_REVOCATION_SYNC_INTERVAL):
+        self.maxsize = maxsize
+        self.sync_interval = sync_interval
+        # 两个表都以 Token 散列值为键，同步吊销记录时只需按键求交集，不用重新计算散列
+        self._verified: "OrderedDict[str, tuple]" = OrderedDict()  # Token 散列值 -> (username, exp)
+        self._revoked: Dict[str, float] = {}  # Token 散列值 -> exp
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, token_hash: str):
+        """返回缓存中未过期 Token 对应的用户名，未命中返回 None"""
+        with self._lock:
+            entry = self._verified.get(token_hash)
+            if entry is None:
+                return None
+            username, exp = entry
+            if exp <= time.time():
+                del self._verified[token_hash]
+                return None
+            self._verified.move_to_end(token_hash)
+            return username
+
+    def add(self, token_hash: str, username: str, exp: float):
+        """缓存一个已验证的 Token"""
+        with self._lock:
+            if token_hash in self._revoked:
+                return
+            self._verified[token_hash] = (username, exp)
+            self._verified.move_to_end(token_hash)
+            while len(self._verified) > self.maxsize:
+                self._verified.popitem(last=False)
+
+    def revoke(self, token: str, exp: float):
+        """在本进程中吊销 Token，之后即使签名有效也会被拒绝；调用方还需写入数据库"""
+        token_hash = token_service.hash_token(token)
+        now = time.time()
+        with self._lock:
+            self._verified.pop(token_hash, None)
+            self._revoked[token_hash] = exp
+            # 顺便清理已经自然过期的吊销记录
+            for expired in [h for h, e in self._revoked.items() if e <= now]:
+                del self._revoked[expired]
+
+    def is_revoked(self, token_hash: str) -> bool:
+        with self._lock:
+            return token_hash in self._revoked
+
+    def sync_due(self) -> bool:
+        return time.monotonic() - self._synced_at >= self.sync_interval
+
+    def merge_revoked(self, revoked: Dict[str, float]):
+        """合并从数据库读取的吊销记录，并移除已缓存的被吊销 Token"""
+        now = time.time()
+        with self._lock:
+            self._synced_at = time.monotonic()
+            self._revoked = {
+                token_hash: exp for token_hash, exp in {**self._revoked, **revoked}.items() if exp > now
+            }
+            for token_hash in self._verified.keys() & self._revoked.keys():
+                del self._verified[token_hash]
+
+verified_tokens = VerifiedTokenCache()
+
+async def revoke_token(token: str, exp: float):
+    """吊销 Token：本进程立即生效，并写入数据库供其他进程同步"""
+    verified_tokens.revoke(token, exp)
+    await token_service.revoke_token(token, exp)
+
+async def sync_revoked_tokens():
+    """到了同步间隔时从数据库读取其他进程吊销的 Token，读取失败时沿用本地记录"""
+    if not verified_tokens.sync_due():
+        return
+    revoked = await token_service.get_revoked_tokens()
+    if revoked is not None:
+        verified_tokens.merge_revoked(revoked)
+
 def token_required_middleware(blueprints):
-    def middleware():
+    async def middleware():
         # 跳过预检请求
         if request.method == 'OPTIONS':
             return None  # 允许预检请求通过
 
         token = request.headers.get('Authorization')  # 安全获取 Authorization
+        # 浏览器的 EventSource 无法设置请求头，SSE 请求允许通过查询参数携带 Token
+        if not token and request.args.get('token') and request.accept_mimetypes.best == 'text/event-stream':
+            token = f"Bearer {request.args['token']}"
         if not token or not token.startswith("Bearer "):
             logger.warning("Token not found or invalid format in Authorization header.")
             return jsonify({"message": "Token is missing or invalid!"}), 401
 
         token = token.split(" ")[1]  # 提取 Token
+        token_hash = token_service.hash_token(token)
+        await sync_revoked_tokens()
+
+        # 快速路径：已验证且未过期的 Token 直接放行
+        username = verified_tokens.get(token_hash)
+        if username is not None:
+            request.current_user = username
+            return None
+
+        if verified_tokens.is_revoked(token_hash):
+            return jsonify({"message": "Token has been revoked!"}), 401
+
         try:
             # 解码 Token
             data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            logger.debug(f"Decoded Token: {data}")  # 打印解码结果
             request.current_user = data['username']  # 将用户信息存储到 request 上
+            if 'exp' in data:
+                verified_tokens.add(token_hash, data['username'], data['exp'])
         except jwt.ExpiredSignatureError:
             logger.debug("Token has expired.")
             return jsonify({"message": "Token has expired!"}), 401
@@ -30,5 +133,3 @@ def token_required_middleware(blueprints):
     # 注册中间件到蓝图
     for blueprint in blueprints:
         blueprint.before_request(middleware)
-
-
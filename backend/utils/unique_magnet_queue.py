@@ -1,64 +1,240 @@
+import heapq
 import asyncio
-from typing import Generic, TypeVar
+import itertools
+from collections import deque
+from typing import Callable, Deque, Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
 from backend.utils.logging_config import loguru_logger as logger
 
 T = TypeVar('T')
 
+# 堆中已失效的条目，出队时跳过
+_REMOVED = object()
+# get_nowait 未指定分组
+_ANY_GROUP = object()
+# 置顶条目的层级排在普通条目之前
+_FRONT_TIER, _NORMAL_TIER = 0, 1
+
 class UniqueMagnetQueue(Generic[T]):
-    def __init__(self):
-        self.queue = asyncio.Queue()  # 用于存储队列中的任务
-        self.item_ids = set()  # 用于存储队列中的唯一项（基于 ID）
-        self.lock = asyncio.Lock()  # 用于保证队列和 set 的同步操作
+    """
+    按 id 去重的优先级队列：优先级高的先出，同优先级先进先出，置顶的条目排在最前。
+    以堆加 id 索引实现，入队、出队、按 id 移除、调整优先级、置顶都是 O(log n)，
+    移除只标记失效（惰性删除），失效条目过多时整体重建堆。
+    每个分组另有一个组内堆（同优先级新的在前），供调度策略按分组出队。
+    所有操作都在共享事件循环线程中同步完成，不需要加锁；get 的等待者只挂在 future 上。
+    """
+    def __init__(self, group_key: Callable[[T], Hashable] = lambda item: getattr(item, 'rss_feed_id', None)):
+        """
+        :param group_key: 分组依据，默认按所属订阅分组，用于整组移除
+        """
+        self.group_key = group_key
+        # 全局堆条目 [层级, -优先级, 入队序号, 唯一序号, 节点]，组内堆条目 [层级, -优先级, -id, 唯一序号, 节点]；
+        # 两个堆共享节点 [元素]，节点失效后两边都会跳过
+        self._heap: List[list] = []
+        self._entries: Dict[int, list] = {}  # id -> 全局堆中的有效条目
+        self._groups: Dict[Hashable, Set[int]] = {}  # 分组 -> id 集合
+        self._group_heaps: Dict[Hashable, List[list]] = {}  # 分组 -> 组内堆
+        self._counter = itertools.count()
+        self._tiebreak = itertools.count()  # 调整优先级后保留入队序号，用唯一序号区分新旧条目
+        self._front_counter = itertools.count(-1, -1)  # 后置顶的排在更前
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @staticmethod
+    def _item_id(item) -> Optional[int]:
+        """兼容直接传入 id"""
+        return item if isinstance(item, int) else getattr(item, 'id', None)
 
-    async def put(self, item: T):
+    async def put(self, item: T, priority: Optional[int] = None):
         """将新元素加入队列，确保唯一性"""
-        async with self.lock:
-            # 使用 item.id 来判断是否唯一
-            item_id = getattr(item, 'id', None)
-            if item_id is None:
-                raise ValueError("Item does not have an 'id' attribute")
-
-            if item_id not in self.item_ids:
-                await self.queue.put(item)
-                self.item_ids.add(item_id)
-                logger.debug(f"Item {item_id} added to the queue.")
-            else:
-                logger.debug(f"Item {item_id} is already in the queue.")
+        self.put_nowait(item, priority)
+
+    def put_nowait(self, item: T, priority: Optional[int] = None) -> bool:
+        """
+        将新元素加入队列，已存在时忽略。
+        :param priority: 优先级，默认取元素的 priority 属性
+        :return: 是否加入
+        """
+        item_id = getattr(item, 'id', None)
+        if item_id is None:
+            raise ValueError("Item does not have an 'id' attribute")
+
+        if item_id in self._entries:
+            logger.debug(f"Item {item_id} is already in the queue.")
+            return False
+
+        if priority is None:
+            priority = getattr(item, 'priority', 0) or 0
+        self._groups.setdefault(self.group_key(item), set()).add(item_id)
+        self._push(item_id, item, _NORMAL_TIER, priority, next(self._counter))
+        logger.debug(f"Item {item_id} added to the queue.")
+        self._wakeup_next()
+        return True
 
     async def get(self) -> T:
-        """从队列中取出一个元素"""
-        async with self.lock:
-            item = await self.queue.get()
-            item_id = getattr(item, 'id', None)
-            if item_id is not None:
-                self.item_ids.remove(item_id)
-            return item
-
-    async def remove(self, item: T):
-        """从队列和集合中移除指定元素"""
-        async with self.lock:
-            item_id = getattr(item, 'id', None)
-            if item_id in self.item_ids:
-                # 创建一个新的队列来过滤掉要移除的项
-                new_queue = asyncio.Queue()
-                while not self.queue.empty():
-                    current_item = await self.queue.get()
-                    current_item_id = getattr(current_item, 'id', None)
-                    if current_item_id != item_id:
-                        await new_queue.put(current_item)
-                self.queue = new_queue
-                self.item_ids.remove(item_id)
-                logger.debug(f"Item {item_id} removed from the queue.")
+        """取出优先级最高的元素，队列为空时等待"""
+        while not self._entries:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+                # 被取消的等待者可能已经收到唤醒，转交给下一个
+                if self._entries:
+                    self._wakeup_next()
+                raise
+        return self.get_nowait()
+
+    def get_nowait(self, group: Hashable = _ANY_GROUP) -> T:
+        """
+        取出优先级最高的元素，队列为空时抛出 asyncio.QueueEmpty。
+        :param group: 只从该分组中取，组内同优先级时 id 大（较新）的先出
+        """
+        heap = self._heap if group is _ANY_GROUP else self._group_heaps.get(group, [])
+        entry = self._first_valid(heap)
+        if entry is None:
+            raise asyncio.QueueEmpty()
+        item = entry[-1][0]
+        self._drop(item.id)
+        return item
+
+    def peek(self) -> Optional[Tuple[T, bool, int]]:
+        """查看全局队首，返回 (元素, 是否置顶, 优先级)，队列为空时返回 None"""
+        entry = self._first_valid(self._heap)
+        if entry is None:
+            return None
+        return entry[-1][0], entry[0] == _FRONT_TIER, -entry[1]
+
+    def priority_of(self, item) -> Optional[Tuple[bool, int]]:
+        """返回元素的 (是否置顶, 优先级)，不在队列中时返回 None，可以传入元素或 id"""
+        entry = self._entries.get(self._item_id(item))
+        if entry is None:
+            return None
+        return entry[0] == _FRONT_TIER, -entry[1]
+
+    def groups(self) -> List[Hashable]:
+        """当前有元素的分组"""
+        return list(self._groups)
+
+    async def remove(self, item) -> bool:
+        """按 id 移除元素，可以传入元素或 id"""
+        item_id = self._item_id(item)
+        if item_id not in self._entries:
+            return False
+        self._drop(item_id)
+        self._maybe_compact()
+        logger.debug(f"Item {item_id} removed from the queue.")
+        return True
+
+    async def remove_group(self, key: Hashable) -> int:
+        """移除同一分组（默认即同一订阅）的全部元素，返回移除数量"""
+        item_ids = self._groups.pop(key, set())
+        self._group_heaps.pop(key, None)
+        for item_id in item_ids:
+            self._entries.pop(item_id)[-1][0] = _REMOVED
+        if item_ids:
+            logger.debug(f"{len(item_ids)} items removed from the queue.")
+        self._maybe_compact()
+        return len(item_ids)
+
+    async def remove_where(self, predicate: Callable[[T], bool]) -> int:
+        """移除所有满足条件的元素，返回移除数量；需要遍历全部元素，能按分组移除时优先用 remove_group"""
+        matched = [item_id for item_id, entry in self._entries.items() if predicate(entry[-1][0])]
+        for item_id in matched:
+            self._drop(item_id)
+        self._maybe_compact()
+        if matched:
+            logger.debug(f"{len(matched)} items removed from the queue.")
+        return len(matched)
+
+    def reprioritize(self, item, priority: int) -> bool:
+        """调整元素的优先级，置顶状态会被取消"""
+        item_id = self._item_id(item)
+        entry = self._entries.get(item_id)
+        if entry is None:
+            return False
+        queued_item = entry[-1][0]
+        entry[-1][0] = _REMOVED
+        # 保留原有的入队序号，同优先级下仍按入队先后
+        self._push(item_id, queued_item, _NORMAL_TIER, priority, entry[2] if entry[0] == _NORMAL_TIER else next(self._counter))
+        self._maybe_compact()
+        return True
+
+    def move_to_front(self, item) -> bool:
+        """把元素移到队首，下一个出队"""
+        item_id = self._item_id(item)
+        entry = self._entries.get(item_id)
+        if entry is None:
+            return False
+        queued_item = entry[-1][0]
+        entry[-1][0] = _REMOVED
+        self._push(item_id, queued_item, _FRONT_TIER, 0, next(self._front_counter))
+        self._maybe_compact()
+        return True
+
+    def items(self) -> List[T]:
+        """按出队顺序返回当前所有元素的快照"""
+        return [entry[-1][0] for entry in sorted(self._entries.values(), key=lambda entry: entry[:4])]
 
     def empty(self) -> bool:
         """检查队列是否为空"""
-        return self.queue.empty()
+        return not self._entries
 
-    def __contains__(self, item: T) -> bool:
-        """检查元素是否在队列中"""
-        item_id = getattr(item, 'id', None)
-        return item_id in self.item_ids
+    def __contains__(self, item) -> bool:
+        """检查元素是否在队列中，可以传入元素或 id"""
+        return self._item_id(item) in self._entries
 
     def __len__(self) -> int:
         """返回队列中元素的数量"""
-        return len(self.item_ids)
+        return len(self._entries)
+
+    def _push(self, item_id: int, item: T, tier: int, priority: int, order: int):
+        node = [item]
+        tiebreak = next(self._tiebreak)
+        entry = [tier, -priority, order, tiebreak, node]
+        self._entries[item_id] = entry
+        heapq.heappush(self._heap, entry)
+        group_heap = self._group_heaps.setdefault(self.group_key(item), [])
+        heapq.heappush(group_heap, [tier, -priority, -item_id, tiebreak, node])
+
+    @staticmethod
+    def _first_valid(heap: List[list]) -> Optional[list]:
+        """弹出堆顶的失效条目，返回第一个有效条目"""
+        while heap:
+            if heap[0][-1][0] is not _REMOVED:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _drop(self, item_id: int):
+        """使元素失效并从索引中移除"""
+        entry = self._entries.pop(item_id)
+        item = entry[-1][0]
+        entry[-1][0] = _REMOVED
+        key = self.group_key(item)
+        members = self._groups.get(key)
+        if members is not None:
+            members.discard(item_id)
+            if not members:
+                del self._groups[key]
+                self._group_heaps.pop(key, None)
+
+    def _maybe_compact(self):
+        """失效条目超过一半时重建堆，避免堆无限增长"""
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if entry[-1][0] is not _REMOVED]
+            heapq.heapify(self._heap)
+            for key, group_heap in self._group_heaps.items():
+                group_heap = [entry for entry in group_heap if entry[-1][0] is not _REMOVED]
+                heapq.heapify(group_heap)
+                self._group_heaps[key] = group_heap
+
+    def _wakeup_next(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
@@ -2,4 +2,8 @@
 from .rss import rss_blueprint
 from .log import log_blueprint
 from .auth import auth_blueprint
-from .magnet import magnet_blueprint
\ No newline at end of file
+from .magnet import magnet_blueprint
+from .stats import stats_blueprint
+from .events import events_blueprint
+from .metrics import metrics_blueprint
+from .frontend import frontend_blueprint
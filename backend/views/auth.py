@@ -1,19 +1,66 @@
+import time
+import asyncio
+import threading
 import jwt
 import bcrypt
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta, timezone
-from backend.core.config import SECRET_KEY, REFRESH_WINDOW, users
+from backend.core.config import SECRET_KEY, REFRESH_WINDOW, users, LOGIN_MAX_ATTEMPTS, LOGIN_ATTEMPT_WINDOW, LOGIN_HASH_WORKERS
+from backend.services import token_service
+from backend.utils.token_required_middleware import verified_tokens, revoke_token, sync_revoked_tokens
 from backend.utils.logging_config import loguru_logger as logger
 
 # 创建蓝图实例
 auth_blueprint = Blueprint('auth', __name__)
 
+# bcrypt 校验在独立的小线程池中执行，登录高峰不会占满请求线程和事件循环
+_hash_executor = ThreadPoolExecutor(max_workers=LOGIN_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+class LoginThrottle:
+    """按 IP 统计时间窗口内的登录尝试次数"""
+    def __init__(self, max_attempts: int, window: timedelta):
+        self.max_attempts = max_attempts
+        self.window = window.total_seconds()
+        self._attempts = {}  # ip -> deque[尝试时间]
+        self._lock = threading.Lock()
+
+    def hit(self, ip_address: str) -> float:
+        """
+        记录一次尝试。
+        :return: 超出限制时返回需要等待的秒数，否则返回 0
+        """
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.setdefault(ip_address, deque())
+            while attempts and now - attempts[0] > self.window:
+                attempts.popleft()
+            if len(attempts) >= self.max_attempts:
+                return self.window - (now - attempts[0])
+            attempts.append(now)
+            # 清理长时间没有尝试的 IP
+            if len(self._attempts) > 1024:
+                for ip in [ip for ip, times in self._attempts.items() if not times or now - times[-1] > self.window]:
+                    del self._attempts[ip]
+            return 0
+
+login_throttle = LoginThrottle(LOGIN_MAX_ATTEMPTS, LOGIN_ATTEMPT_WINDOW)
+
 @auth_blueprint.route('/auth/login', methods=['POST'])
-def login():
+async def login():
     """处理用户登录并生成 JWT"""
-    data = request.get_json()
+    ip_address = request.remote_addr  # 获取 IP 地址
+    retry_after = login_throttle.hit(ip_address)
+    if retry_after:
+        logger.warning(f"IP {ip_address} 登录尝试过于频繁")
+        response = jsonify({"message": "登录尝试过于频繁，请稍后再试"})
+        response.headers['Retry-After'] = str(int(retry_after) + 1)
+        return response, 429
+
+    data = request.get_json() or {}
     username = data.get('username')
-    password = data.get('password')
+    password = data.get('password') or ''
 
     # 检查用户是否存在
     if username not in users:
@@ -21,26 +68,30 @@ def login():
 
     # 检查密码是否正确
     stored_password_hash = users[username]
-    if not bcrypt.checkpw(password.encode('utf-8'), stored_password_hash):
+    password_ok = await asyncio.get_running_loop().run_in_executor(
+        _hash_executor, bcrypt.checkpw, password.encode('utf-8'), stored_password_hash
+    )
+    if not password_ok:
         return jsonify({"message": "用户名或密码错误"}), 401
 
     # 生成 JWT Token
     token = generate_token(username)
 
-    ip_address = request.remote_addr  # 获取 IP 地址
-    
     # 在登录成功后记录日志
     logger.bind(username=username, ip_address=ip_address).info("登录成功")
 
     return jsonify({"token": token}), 200
 
 @auth_blueprint.route('/auth/refresh', methods=['POST'])
-def refresh_token():
+async def refresh_token():
     token = request.headers.get('Authorization')
     if not token or not token.startswith("Bearer "):
         return jsonify({"message": "Token is missing or invalid!"}), 401
 
     token = token.split(" ")[1]
+    await sync_revoked_tokens()
+    if verified_tokens.is_revoked(token_service.hash_token(token)):
+        return jsonify({"message": "Token has been revoked!"}), 401
     try:
         # 解码 Token，忽略过期时间
         data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
@@ -55,11 +106,28 @@ def refresh_token():
         if now - issued_at > REFRESH_WINDOW:
             return jsonify({"message": "Token refresh window has expired!"}), 401
 
-        # 生成新 Token
+        # 生成新 Token，并吊销旧 Token
         new_token = generate_token(data['username'])
+        await revoke_token(token, data.get('exp', 0))
         return jsonify({"token": new_token}), 200
     except jwt.InvalidTokenError as e:
         return jsonify({"message": "Invalid token!"}), 401
+
+@auth_blueprint.route('/auth/logout', methods=['POST'])
+async def logout():
+    """注销当前 Token"""
+    token = request.headers.get('Authorization')
+    if not token or not token.startswith("Bearer "):
+        return jsonify({"message": "Token is missing or invalid!"}), 401
+
+    token = token.split(" ")[1]
+    try:
+        data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token!"}), 401
+
+    await revoke_token(token, data.get('exp', 0))
+    return jsonify({"message": "Logged out"}), 200
     
 def generate_token(username):
     """生成 JWT Token"""
@@ -0,0 +1,43 @@
+import json
+import asyncio
+from flask import Blueprint, Response, current_app
+from backend.utils.event_bus import event_bus
+from backend.utils.event_loop import run_in_loop
+from backend.utils.serializers import json_default
+
+events_blueprint = Blueprint('events', __name__)
+
+# 无事件时发送注释行保持连接的间隔，秒
+KEEPALIVE_INTERVAL = 15
+
+def format_sse(message: dict) -> str:
+    """将事件格式化为 SSE 文本"""
+    data = json.dumps({**message["data"], "time": message["time"]}, ensure_ascii=False, default=json_default)
+    return f"event: {message['event']}\ndata: {data}\n\n"
+
+@events_blueprint.route('/events', methods=['GET'])
+def stream_events():
+    """
+    以 Server-Sent Events 推送队列变化、Alist 任务进度、订阅刷新结果和完成事件。
+    所有连接共享监控模块的同一份轮询结果，不会额外访问数据库或 Alist。
+    """
+    loop = current_app.background_loop
+    queue = run_in_loop(loop, event_bus.subscribe())
+
+    def generate():
+        try:
+            yield f"retry: {KEEPALIVE_INTERVAL * 1000}\n\n"
+            while True:
+                try:
+                    message = run_in_loop(loop, asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL))
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(message)
+        finally:
+            loop.call_soon_threadsafe(event_bus.unsubscribe, queue)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # 关闭 nginx 缓冲
+    })
@@ -0,0 +1,56 @@
+import os
+import mimetypes
+from flask import Blueprint, request, send_file, abort
+from werkzeug.security import safe_join
+from backend.core.config import FRONTEND_DIST_DIR
+from backend.utils.static_assets import HASHED_ASSET_RE, ENCODINGS
+
+frontend_blueprint = Blueprint('frontend', __name__)
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('application/json', '.map')
+
+# 带哈希的文件内容永不变化，可以长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def send_asset(relative_path: str):
+    """
+    发送前端资源：按 Accept-Encoding 选择预压缩变体，带哈希的文件长期缓存，
+    其余文件（包括 index.html）每次用 ETag 协商。
+    """
+    file_path = safe_join(FRONTEND_DIST_DIR, relative_path)
+    mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+    send_path, content_encoding = file_path, None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(file_path + suffix):
+            send_path, content_encoding = file_path + suffix, encoding
+            break
+
+    response = send_file(send_path, mimetype=mimetype, conditional=True, etag=True)
+    response.vary.add('Accept-Encoding')
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    if HASHED_ASSET_RE.search(os.path.basename(relative_path)):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = "no-cache"
+    return response
+
+@frontend_blueprint.route('/', defaults={'path': ''})
+@frontend_blueprint.route('/<path:path>')
+def serve_frontend(path):
+    """
+    提供前端构建产物，未知的前端路由回退到 index.html（Vue Router history 模式）。
+    """
+    if path.startswith('api/'):
+        abort(404)
+
+    file_path = safe_join(FRONTEND_DIST_DIR, path) if path else None
+    if file_path and os.path.isfile(file_path):
+        return send_asset(path)
+
+    # 带扩展名的路径视为缺失的资源文件，不回退
+    if os.path.splitext(path)[1]:
+        abort(404)
+    return send_asset('index.html')
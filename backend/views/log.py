@@ -1,9 +1,17 @@
-import os
-from datetime import datetime
-from flask import Blueprint, request, jsonify
-from backend.utils.logging_config import loguru_logger as logger,LOGS_DIR, LOGIN_LOG_FILE  # 引入配置
+from datetime import datetime, timedelta
+import asyncio
+from flask import Blueprint, Response, current_app, request, jsonify
+from backend.utils.logging_config import LOGS_DIR, LOGIN_LOG_DIR, JSON_LOGS_DIR  # 引入配置
+from backend.utils.log_index import LogQueryEngine
+from backend.utils.event_loop import run_in_loop
+from backend.utils.log_follower import log_follower
+from backend.utils.login_log import LoginLogReader
+from backend.utils.structured_log import CONTEXT_FIELDS, query_structured_logs
+from backend.views.events import KEEPALIVE_INTERVAL, format_sse
 
 log_blueprint = Blueprint('log', __name__)
+log_query = LogQueryEngine(LOGS_DIR)
+login_log_reader = LoginLogReader(LOGIN_LOG_DIR)
 
 @log_blueprint.route('/logs', methods=['GET'])
 def get_logs():
@@ -14,88 +22,117 @@ def get_logs():
     page = int(request.args.get('page', 1))
     page_size = int(request.args.get('page_size', 20))
 
-    filtered_logs = []
-
-    # 遍历日志文件夹中的所有日志文件
     try:
-        for log_file in os.listdir(LOGS_DIR):
-            log_file_path = os.path.join(LOGS_DIR, log_file)
-
-            if not os.path.isfile(log_file_path):
-                continue
-
-            log_date_str = log_file.replace('app_', '').replace('.log', '')
-            log_date = datetime.strptime(log_date_str, '%Y-%m-%d')
-
-            # 检查日志文件是否在查询日期范围内
-            if start_date and end_date:
-                start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-                if not (start_dt <= log_date <= end_dt):
-                    continue
-
-            with open(log_file_path, 'r') as file:
-                for line in file:
-                    if log_level != 'ALL' and f"| {log_level} |" not in line:
-                        continue
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else None
+        end_dt = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None
+    except ValueError:
+        return jsonify({"error": "日期格式应为 YYYY-MM-DD"}), 400
 
-                    if not include_details:
-                        parts = line.split(" - ", 1)
-                        if len(parts) == 2:
-                            main_info = parts[0].split(" | ")[:2]
-                            line = " | ".join(main_info) + " | " + parts[1].strip()
-
-                    filtered_logs.append(line)
+    # 通过侧车索引直接定位当前页，不再读取全部日志
+    try:
+        paginated_logs, total_logs, has_more = log_query.query(
+            None if log_level == 'ALL' else log_level, start_dt, end_dt, page, page_size
+        )
     except Exception as e:
         return jsonify({"error": f"读取日志时出现错误: {e}"}), 500
 
-    filtered_logs.sort(reverse=True)
-
-    total_logs = len(filtered_logs)
-    start_index = (page - 1) * page_size
-    end_index = start_index + page_size
-    paginated_logs = filtered_logs[start_index:end_index]
+    if not include_details:
+        paginated_logs = [strip_details(line) for line in paginated_logs]
 
+    # has_more 为 True 时 total 只统计到已打开的文件，至少比当前页多一条，total_pages 至少为下一页
     return jsonify({
         'logs': paginated_logs,
         'total': total_logs,
+        'total_exact': not has_more,
+        'has_more': has_more,
         'page': page,
         'page_size': page_size,
         'total_pages': (total_logs + page_size - 1) // page_size
     })
 
-@log_blueprint.route('/login_logs', methods=['GET'])
-def get_login_logs():
-    logs = []
+def strip_details(line: str) -> str:
+    """去掉日志中的 文件:函数:行号 部分"""
+    parts = line.split(" - ", 1)
+    if len(parts) == 2:
+        main_info = parts[0].split(" | ")[:2]
+        line = " | ".join(main_info) + " | " + parts[1].strip()
+    return line
+
+@log_blueprint.route('/logs/structured', methods=['GET'])
+def get_structured_logs():
+    """
+    按上下文字段检索结构化日志，例如 /logs/structured?magnet_id=12 查看某个磁链的完整经过。
+    支持 level、start/end（YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS）、limit（1-1000），以及上一页返回的 next_before 游标。
+    没有按字段建立索引，每次从最新的日志倒序扫描到取满 limit 条为止，条件很少命中时建议同时给出时间范围。
+    """
+    context = {key: request.args[key] for key in CONTEXT_FIELDS if request.args.get(key)}
+    level = request.args.get('level', '').upper() or None
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return jsonify({"error": "limit 应为整数"}), 400
+    before = request.args.get('before', type=float)
 
-    if os.path.exists(LOGIN_LOG_FILE):
-        try:
-            with open(LOGIN_LOG_FILE, 'r') as file:
-                logs = file.readlines()
-        except Exception as e:
-            return jsonify({"error": f"读取登录日志时出现错误: {e}"}), 500
+    try:
+        start = parse_time_arg(request.args.get('start'))
+        end = parse_time_arg(request.args.get('end'), end_of_day=True)
+    except ValueError:
+        return jsonify({"error": "时间格式应为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS"}), 400
 
-    logs.reverse()
+    try:
+        logs, has_more = query_structured_logs(JSON_LOGS_DIR, context, level, start, end, before, limit)
+    except Exception as e:
+        return jsonify({"error": f"读取日志时出现错误: {e}"}), 500
+
+    return jsonify({
+        'logs': logs,
+        'has_more': has_more,
+        'next_before': logs[-1]['ts'] if has_more else None,
+    })
 
-    unique_logs = {}
-    for line in logs:
+def parse_time_arg(value: str, end_of_day: bool = False):
+    """解析时间参数，只给日期时，结束时间取到当天结束"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+@log_blueprint.route('/logs/follow', methods=['GET'])
+def follow_logs():
+    """
+    以 Server-Sent Events 推送新写入的程序日志，支持 level 和 keyword 过滤。
+    所有连接共享同一个读取任务，不会各自重复读取日志文件。
+    """
+    log_level = request.args.get('level', 'ALL').upper()
+    keyword = request.args.get('keyword') or None
+    loop = current_app.background_loop
+    queue = run_in_loop(loop, log_follower.subscribe(None if log_level == 'ALL' else log_level, keyword))
+
+    def generate():
         try:
-            parts = line.strip().split(" | ")
-            if len(parts) == 3:
-                raw_time = parts[0]
-                username = parts[1].split(": ")[1]
-                ip_address = parts[2].split(": ")[1]
-
-                utc_time = datetime.strptime(raw_time, "%Y-%m-%dT%H:%M:%S.%f%z")
-                local_time = utc_time.astimezone()
-                formatted_time = local_time.strftime("%Y-%m-%d %H:%M:%S")
-
-                unique_logs[ip_address] = {
-                    "time": formatted_time,
-                    "ip_address": ip_address,
-                    "username": username
-                }
-        except IndexError as e:
-            logger.error(f"解析失败: {line.strip()}, 错误: {e}")
-
-    return jsonify({"logs": list(unique_logs.values())})
+            yield f"retry: {KEEPALIVE_INTERVAL * 1000}\n\n"
+            while True:
+                try:
+                    message = run_in_loop(loop, asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL))
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(message)
+        finally:
+            loop.call_soon_threadsafe(log_follower.unsubscribe, queue)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # 关闭 nginx 缓冲
+    })
+
+@log_blueprint.route('/login_logs', methods=['GET'])
+def get_login_logs():
+    try:
+        logs = login_log_reader.get_latest_logins()
+    except Exception as e:
+        return jsonify({"error": f"读取登录日志时出现错误: {e}"}), 500
+
+    return jsonify({"logs": logs})
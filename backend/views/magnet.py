@@ -3,42 +3,31 @@ from backend.services import magnet_service
 from flask import Blueprint, request, jsonify
 from backend.utils.logging_config import loguru_logger as logger
 from backend.utils.dependency_manager import dependency_manager, DependencyKeys
+from backend.utils.collection_versions import MAGNETS
+from backend.utils.conditional_response import etag_by_collections
+from backend.utils.serializers import serialize_magnet
 
 magnet_blueprint = Blueprint('magnet', __name__)
 
 # 获取全部 magnet
 @magnet_blueprint.route('/magnets', methods=['GET'])
+@etag_by_collections(MAGNETS)
 async def get_all_magnets():
     try:
         magnets = await magnet_service.get_all_magnets()
-        return jsonify([{
-            "id": magnet.id,
-            "rss_feed_id": magnet.rss_feed_id,
-            "title": magnet.title,
-            "name": magnet.name,
-            "magnet_link": magnet.magnet_link,
-            "status": magnet.status,
-            "timestamp": magnet.timestamp
-        } for magnet in magnets])
+        return jsonify([serialize_magnet(magnet) for magnet in magnets])
     except SQLAlchemyError as e:
         logger.error(f"获得全部 magnet 错误: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 # 根据 ID 获取 magnet
 @magnet_blueprint.route('/magnets/<int:magnet_id>', methods=['GET'])
+@etag_by_collections(MAGNETS)
 async def get_magnet(magnet_id):
     try:
         magnet = await magnet_service.get_magnet_by_id(magnet_id)
         if magnet:
-            return jsonify({
-                "id": magnet.id,
-                "rss_feed_id": magnet.rss_feed_id,
-                "title": magnet.title,
-                "name": magnet.name,
-                "magnet_link": magnet.magnet_link,
-                "status": magnet.status,
-                "timestamp": magnet.timestamp
-            })
+            return jsonify(serialize_magnet(magnet))
         logger.error(f"通过 ID 获得 magnet 错误，未找到 magnet {magnet_id}")
         return jsonify({"error": "magnet not found"}), 404
     except SQLAlchemyError as e:
@@ -63,6 +52,9 @@ async def update_magnet(magnet_id):
     try:
         updated = await magnet_service.update_magnet(magnet_id, data)
         if updated:
+            if 'priority' in data:
+                backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+                backend_pool.reprioritize_magnet(magnet_id, int(data['priority']))
             return jsonify({"message": "magnet updated successfully!"})
         logger.error(f"通过 ID 修改 magnet 错误，未找到 magnet {magnet_id}")
         return jsonify({"error": "magnet not found"}), 404
@@ -76,6 +68,9 @@ async def delete_magnet(magnet_id):
     try:
         deleted = await magnet_service.delete_magnet(magnet_id)
         if deleted:
+            # 非主实例上没有队列，主实例推送前会按数据库移除已删除的磁链
+            backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+            await backend_pool.remove_magnet(magnet_id)
             return jsonify({"message": "magnet deleted successfully!"})
         logger.error(f"通过 ID 删除 magnet 错误，未找到 magnet {magnet_id}")
         return jsonify({"error": "magnet not found"}), 404
@@ -83,6 +78,50 @@ async def delete_magnet(magnet_id):
         logger.error(f"通过 ID 删除 magnet 错误: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# 调整优先级
+@magnet_blueprint.route('/magnets/<int:magnet_id>/priority', methods=['PUT'])
+async def update_magnet_priority(magnet_id):
+    """
+    修改磁链优先级，已在下载队列中的磁链同时调整队列顺序。
+    非主实例只修改数据库，由主实例在推送下一个任务前同步到队列。
+    """
+    data = request.json or {}
+    try:
+        priority = int(data['priority'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "priority must be an integer"}), 400
+
+    try:
+        updated = await magnet_service.update_magnet(magnet_id, {'priority': priority})
+        if not updated:
+            logger.error(f"通过 ID 修改 magnet 优先级错误，未找到 magnet {magnet_id}")
+            return jsonify({"error": "magnet not found"}), 404
+    except SQLAlchemyError as e:
+        logger.error(f"通过 ID 修改 magnet 优先级错误: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+    if not backend_pool.active:
+        return jsonify({"message": "优先级已保存，将由主实例同步到队列"}), 202
+    queued = backend_pool.reprioritize_magnet(magnet_id, priority)
+    backend_pool.publish_queue_state()
+    return jsonify({"message": "magnet priority updated successfully!", "queued": queued})
+
+# 移到队首
+@magnet_blueprint.route('/magnets/<int:magnet_id>/front', methods=['POST'])
+async def move_magnet_to_front(magnet_id):
+    """
+    将下载队列中的磁链移到队首，不中断当前任务。需要立即开始时使用重试接口。
+    队首只存在于主实例的内存队列中，非主实例无法处理，返回 409。
+    """
+    backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+    if not backend_pool.active:
+        return jsonify({"error": "下载队列由主实例管理，请在主实例上操作"}), 409
+    if backend_pool.move_magnet_to_front(magnet_id):
+        backend_pool.publish_queue_state()
+        return jsonify({"message": "magnet moved to front of the queue"})
+    return jsonify({"error": "magnet is not in the download queue"}), 404
+
 # 重试
 @magnet_blueprint.route('/magnets/<int:magnet_id>/retry', methods=['POST'])
 async def retry_magnet(magnet_id):
@@ -99,14 +138,19 @@ async def retry_magnet(magnet_id):
         if not update_success:
             logger.error(f"通过 ID 重试 magnet 错误，无法修改 magnet {magnet_id} 完成状态")
             return jsonify({"error": "Failed to update magnet status"}), 500
-        
+        # 重新读取，推送和失败处理使用重置后的推送次数
+        magnet = await magnet_service.get_magnet_by_id(magnet_id)
+
     except SQLAlchemyError as e:
         logger.error(f"通过 ID 重试 magnet 错误，Database error: {str(e)}")
         return jsonify({"error": f"Database error: {str(e)}"}), 500
     # 上面改成接受id，然后顺便把status改成未完成
-    magnet_queue_manager = dependency_manager.get(DependencyKeys.MAGNET_QUEUE_MANAGER)
+    backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+    if not backend_pool.active:
+        # 非主实例不推送任务，磁链已改为待处理，由主实例定时认领
+        return jsonify({"message": "任务已重新排队，将由主实例处理"}), 202
     try:
-        await magnet_queue_manager.interrupt_and_retry_task(magnet)
+        await backend_pool.interrupt_and_retry_task(magnet)
         return jsonify({"message": "任务重试成功"}), 200
     except Exception as e:
         logger.error(f"通过 ID 重试 magnet 错误: {str(e)}")
@@ -114,6 +158,7 @@ async def retry_magnet(magnet_id):
 
 
 @magnet_blueprint.route('/magnets/rss/<int:rss_id>', methods=['GET'])
+@etag_by_collections(MAGNETS)
 async def get_magnets_by_rss(rss_id):
     """
     获取特定 RSS 订阅源的所有任务。
@@ -123,15 +168,7 @@ async def get_magnets_by_rss(rss_id):
     try:
         magnets = await magnet_service.get_magnets_by_rss(rss_id)
         if magnets:
-            return jsonify([{
-                "id": magnet.id,
-                "rss_feed_id": magnet.rss_feed_id,
-                "title": magnet.title,
-                "name": magnet.name,
-                "magnet_link": magnet.magnet_link,
-                "status": magnet.status,
-                "timestamp": magnet.timestamp
-            } for magnet in magnets])
+            return jsonify([serialize_magnet(magnet) for magnet in magnets])
         else:
             logger.error(f"通过 magnet 获得 rssID 错误: No magnets found for the given RSS feed")
             return jsonify({"message": "No magnets found for the given RSS feed"}), 404
@@ -144,20 +181,20 @@ async def start_magnet_queue():
     """
     启动任务队列处理。
     """
-    magnet_queue_manager = dependency_manager.get(DependencyKeys.MAGNET_QUEUE_MANAGER)
+    backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+    if not backend_pool.active:
+        return jsonify({"message": "任务队列由主实例处理"}), 202
 
-    # 从数据库中获取未完成的任务
-    pending_magnets = await magnet_service.get_pending_magnets()
-    await magnet_queue_manager.add_magnets_to_queue(pending_magnets)
+    # 从数据库认领待处理的任务
+    await backend_pool.refill_queue()
 
     # 逐个处理队列中的任务
     try:
-        # 如果没有正在进行的任务，尝试处理任务
-        if not magnet_queue_manager.current_magnet:
-            await magnet_queue_manager.process_magnet_queue()
-            return jsonify({"message": f"开始任务处理，当前任务为 {magnet_queue_manager.current_magnet.name}"}), 200
-        else:
-            return jsonify({"message": f"任务队列进行中！当前任务为 {magnet_queue_manager.current_magnet.name}"}), 200
+        # 空闲的后端开始处理任务
+        await backend_pool.process_magnet_queue()
+        if backend_pool.current_magnet:
+            return jsonify({"message": f"任务队列进行中！当前任务为 {backend_pool.current_magnet.name}"}), 200
+        return jsonify({"message": "队列中没有待处理的任务"}), 200
     except Exception as e:
         logger.error(f"启动任务队列错误: {str(e)}")
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
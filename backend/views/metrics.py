@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from backend.utils.metrics import generate_latest, CONTENT_TYPE_LATEST
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus 抓取接口。每个进程各自统计，返回处理本次请求的 worker 的指标，样本带有 pid 标签区分进程；
+    下载队列相关的指标只在主实例上有值
+    """
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
@@ -1,13 +1,16 @@
 from flask import Blueprint, request, jsonify
 from backend.services import rss_service
-from backend.core.config import root_save_path
 from backend.utils.logging_config import loguru_logger as logger
 from backend.utils.dependency_manager import dependency_manager, DependencyKeys
+from backend.utils.collection_versions import RSS_FEEDS
+from backend.utils.conditional_response import etag_by_collections
+from backend.utils.serializers import serialize_rss_feed
 
 rss_blueprint = Blueprint('rss', __name__)
 
 # 查询
 @rss_blueprint.route('/rss', methods=['GET'])
+@etag_by_collections(RSS_FEEDS)
 async def get_all_rss_feeds():
     """
     获得全部RSS订阅数据
@@ -16,15 +19,10 @@ async def get_all_rss_feeds():
     if feeds is None:
         return jsonify({"error": "Failed to fetch RSS feeds"}), 500
 
-    return jsonify([{
-        "id": feed.id,
-        "name": feed.name,
-        "url": feed.url,
-        "last_updated": feed.last_updated,
-        "should_update": feed.should_update
-    } for feed in feeds])
+    return jsonify([serialize_rss_feed(feed) for feed in feeds])
 
 @rss_blueprint.route('/rss/<int:rss_id>', methods=['GET'])
+@etag_by_collections(RSS_FEEDS)
 async def get_rss_feed_by_id(rss_id):
     """
     根据 rss_id 获取特定的 RSS 订阅数据
@@ -33,13 +31,14 @@ async def get_rss_feed_by_id(rss_id):
     if feed is None:
         return jsonify({"error": "RSS feed not found"}), 404
 
-    return jsonify({
-        "id": feed.id,
-        "name": feed.name,
-        "url": feed.url,
-        "last_updated": feed.last_updated,
-        "should_update": feed.should_update
-    })
+    return jsonify(serialize_rss_feed(feed))
+
+@rss_blueprint.route('/rss/cache', methods=['GET'])
+def get_rss_cache_stats():
+    """
+    获取订阅元数据缓存的命中统计
+    """
+    return jsonify(rss_service.get_feed_cache_stats())
 
 # 添加rss
 @rss_blueprint.route('/rss', methods=['POST'])
@@ -84,7 +83,7 @@ async def patch_rss_feed(rss_id):
     data = request.json
 
     # 定义允许更新的字段，避免不安全的字段更新
-    allowed_keys = {'name', 'url', 'should_update'}
+    allowed_keys = {'name', 'url', 'should_update', 'weight'}
 
     # 过滤出被允许更新的字段
     update_data = {key: value for key, value in data.items() if key in allowed_keys}
@@ -92,6 +91,9 @@ async def patch_rss_feed(rss_id):
     if not update_data:
         return jsonify({"error": "No valid fields to update"}), 400
 
+    if 'weight' in update_data and (not isinstance(update_data['weight'], int) or update_data['weight'] < 1):
+        return jsonify({"error": "weight must be a positive integer"}), 400
+
     # 使用通用的 patch 方法更新字段
     success = await rss_service.patch_rss_feed(rss_id, update_data)
 
@@ -117,10 +119,10 @@ async def rename_rss_feed(rss_id):
     if old_name == new_name:
         return jsonify({"message": "Old name and new name are the same, no changes needed."}), 200
 
-    # 使用 Alist API 更新文件夹名称
-    directory_manager = dependency_manager.get(DependencyKeys.DIRECTORY_MANAGER)
+    # 使用 Alist API 更新各后端上的文件夹名称
+    backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
     try:
-        success = await directory_manager.rename_directory(f"{root_save_path}/{old_name}", new_name)
+        success = await backend_pool.rename_feed_directory(old_name, new_name)
         if not success:
             return jsonify({"error": "Failed to rename folder on cloud storage"}), 500
     except Exception as e:
@@ -138,6 +140,10 @@ async def rename_rss_feed(rss_id):
 @rss_blueprint.route('/rss/<int:rss_id>', methods=['DELETE'])
 async def delete_rss_feed(rss_id):
     response, status_code = await rss_service.delete_rss_feed(rss_id)
+    if status_code == 200:
+        # 同步清理内存队列，避免残留已删除订阅的磁链；非主实例上没有队列，由主实例推送前按数据库移除
+        backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+        await backend_pool.remove_magnets_by_rss(rss_id)
     return jsonify(response), status_code
 
 # 刷新全部 RSS 订阅
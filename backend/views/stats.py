@@ -0,0 +1,24 @@
+from flask import Blueprint, request, jsonify
+from backend.services import stats_service
+from backend.utils.dependency_manager import dependency_manager, DependencyKeys
+
+stats_blueprint = Blueprint('stats', __name__)
+
+@stats_blueprint.route('/stats', methods=['GET'])
+async def get_statistics():
+    """
+    获取仪表盘统计：各状态数量、每个订阅的汇总以及每日吞吐量
+    """
+    days = min(max(request.args.get('days', 7, type=int), 1), 90)
+    stats = await stats_service.get_statistics(days)
+    if stats is None:
+        return jsonify({"error": "Failed to compute statistics"}), 500
+    return jsonify(stats)
+
+@stats_blueprint.route('/stats/backends', methods=['GET'])
+def get_backend_status():
+    """
+    获取各 Alist 后端的状态：可用性、负载、当前任务和队列长度
+    """
+    backend_pool = dependency_manager.get(DependencyKeys.ALIST_BACKEND_POOL)
+    return jsonify(backend_pool.status())
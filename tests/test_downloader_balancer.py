@@ -0,0 +1,73 @@
+import pytest
+
+from backend.services import downloader_balancer
+from backend.services.alist_api.task_constants import DownloaderType
+from backend.services.downloader_balancer import DownloaderBalancer, DownloaderStats
+
+ARIA, QBIT = DownloaderType.ARIA, DownloaderType.QBIT
+
+
+def test_success_rate_is_smoothed():
+    stats = DownloaderStats(ARIA)
+    assert stats.success_rate() == 0.5
+    stats.succeeded, stats.failed = 3, 1
+    assert stats.success_rate() == 4 / 6
+
+
+def test_score_is_relative_to_fastest_tool():
+    stats = DownloaderStats(ARIA, succeeded=8, failed=0, speed=5e6)
+    assert stats.score(None) == stats.success_rate()
+    assert stats.score(10e6) == pytest.approx(stats.success_rate() * 0.5)
+
+
+def test_fewer_in_flight_tasks_ranks_first():
+    balancer = DownloaderBalancer([ARIA, QBIT])
+    balancer.started(ARIA, ["a1"])
+    assert balancer.candidates() == [QBIT, ARIA]
+    balancer.forget("a1")
+    balancer.started(QBIT, ["q1", "q2"])
+    assert balancer.candidates() == [ARIA, QBIT]
+
+
+def test_faster_tool_ranks_first_when_load_is_equal():
+    balancer = DownloaderBalancer([ARIA, QBIT])
+    balancer.started(ARIA, ["a1"])
+    balancer.started(QBIT, ["q1"])
+    balancer.finished("a1", True, speed=2e6)
+    balancer.finished("q1", True, speed=8e6)
+    assert balancer.candidates() == [QBIT, ARIA]
+
+
+def test_speed_is_smoothed():
+    balancer = DownloaderBalancer([ARIA])
+    for task_id, speed in (("1", 1000.0), ("2", 2000.0)):
+        balancer.started(ARIA, [task_id])
+        balancer.finished(task_id, True, speed=speed)
+    smoothing = downloader_balancer.SPEED_SMOOTHING
+    assert balancer.stats[ARIA].speed == pytest.approx(smoothing * 2000 + (1 - smoothing) * 1000)
+
+
+def test_failed_add_cools_tool_down(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(downloader_balancer.time, "monotonic", lambda: now[0])
+    balancer = DownloaderBalancer([ARIA, QBIT])
+    balancer.started(QBIT, ["q1", "q2"])
+    balancer.add_failed(ARIA)
+    assert balancer.candidates() == [QBIT, ARIA]
+    now[0] += downloader_balancer.ERROR_COOLDOWN + 1
+    assert balancer.candidates() == [ARIA, QBIT]
+
+
+def test_finished_unknown_task_is_ignored():
+    balancer = DownloaderBalancer([ARIA])
+    balancer.finished("missing", False)
+    assert balancer.stats[ARIA].failed == 0
+
+
+def test_reset_clears_in_flight():
+    balancer = DownloaderBalancer([ARIA])
+    balancer.started(ARIA, ["a1", "a2"])
+    balancer.reset()
+    assert balancer.stats[ARIA].in_flight == set()
+    balancer.finished("a1", True)
+    assert balancer.stats[ARIA].succeeded == 0
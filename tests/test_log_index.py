@@ -0,0 +1,109 @@
+import zipfile
+from datetime import date
+
+import pytest
+
+from backend.utils.log_index import LogIndex, LogQueryEngine
+
+
+def write_log(path, entries):
+    """entries 为 (时间, 级别, 消息)，消息可以包含换行（模拟异常堆栈）"""
+    with open(path, "a", encoding="utf-8") as f:
+        for timestamp, level, message in entries:
+            f.write(f"{timestamp} | {level} | {message}\n")
+
+
+def entries_for(day, count, level="INFO"):
+    return [(f"{day} 10:00:{second:02d}", level, f"{day} #{second}") for second in range(count)]
+
+
+@pytest.fixture
+def logs_dir(tmp_path):
+    return tmp_path
+
+
+def test_index_groups_multiline_entries_and_levels(logs_dir):
+    path = logs_dir / "app_2024-01-01.log"
+    write_log(path, [
+        ("2024-01-01 10:00:00", "INFO", "start"),
+        ("2024-01-01 10:00:01", "ERROR", "boom\nTraceback line 1\nTraceback line 2"),
+        ("2024-01-01 10:00:02", "INFO", "done"),
+    ])
+    index = LogIndex(str(path), str(logs_dir / "index.idx"))
+    index.refresh()
+    assert len(index.entry_ids()) == 3
+    assert list(index.entry_ids("ERROR")) == [1]
+    assert len(index.entry_ids("UNKNOWN")) == 0
+    assert index.read_entries([1])[0].endswith("Traceback line 2")
+
+
+def test_index_refresh_is_incremental_and_skips_partial_lines(logs_dir):
+    path = logs_dir / "app_2024-01-01.log"
+    write_log(path, entries_for("2024-01-01", 2))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("2024-01-01 10:00:09 | INFO | unfinished")
+    index = LogIndex(str(path), str(logs_dir / "index.idx"))
+    index.refresh()
+    assert len(index.entry_ids()) == 2
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(" line\n")
+    index.refresh()
+    assert len(index.entry_ids()) == 3
+    assert index.read_entries([2]) == ["2024-01-01 10:00:09 | INFO | unfinished line"]
+
+
+def test_index_is_rebuilt_when_file_is_truncated(logs_dir):
+    path = logs_dir / "app_2024-01-01.log"
+    write_log(path, entries_for("2024-01-01", 5))
+    index = LogIndex(str(path), str(logs_dir / "index.idx"))
+    index.refresh()
+    path.write_text("")
+    write_log(path, entries_for("2024-01-01", 1))
+    index.refresh()
+    assert len(index.entry_ids()) == 1
+
+
+def test_query_pages_newest_first_across_files(logs_dir):
+    write_log(logs_dir / "app_2024-01-01.log", entries_for("2024-01-01", 3))
+    write_log(logs_dir / "app_2024-01-02.log", entries_for("2024-01-02", 3))
+    engine = LogQueryEngine(str(logs_dir))
+
+    logs, counted, has_more = engine.query(None, None, None, page=1, page_size=4)
+    assert [line.split(" | ")[2] for line in logs] == [
+        "2024-01-02 #2", "2024-01-02 #1", "2024-01-02 #0", "2024-01-01 #2",
+    ]
+    assert has_more
+
+    logs, counted, has_more = engine.query(None, None, None, page=2, page_size=4)
+    assert [line.split(" | ")[2] for line in logs] == ["2024-01-01 #1", "2024-01-01 #0"]
+    assert (counted, has_more) == (6, False)
+
+
+def test_query_stops_opening_files_once_page_is_full(logs_dir):
+    for day in ("2024-01-01", "2024-01-02", "2024-01-03"):
+        write_log(logs_dir / f"app_{day}.log", entries_for(day, 4))
+    engine = LogQueryEngine(str(logs_dir))
+    logs, counted, has_more = engine.query(None, None, None, page=1, page_size=4)
+    # 第一天的文件用完正好取满，只需再打开一个文件确认还有更多
+    assert (len(logs), counted, has_more) == (4, 8, True)
+    assert "app_2024-01-01.log" not in engine._indexes
+
+
+def test_query_filters_by_level_and_date(logs_dir):
+    write_log(logs_dir / "app_2024-01-01.log", entries_for("2024-01-01", 2, "ERROR"))
+    write_log(logs_dir / "app_2024-01-02.log", entries_for("2024-01-02", 2) + entries_for("2024-01-02", 1, "ERROR"))
+    engine = LogQueryEngine(str(logs_dir))
+    logs, counted, has_more = engine.query("ERROR", date(2024, 1, 2), None, page=1, page_size=10)
+    assert (len(logs), counted, has_more) == (1, 1, False)
+
+
+def test_zipped_archives_are_queried(logs_dir):
+    plain = logs_dir / "app_2024-01-01.log"
+    write_log(plain, entries_for("2024-01-01", 3))
+    with zipfile.ZipFile(logs_dir / "app_2024-01-01.2024-01-01_23-59-59_000000.log.zip", "w") as archive:
+        archive.write(plain, "app_2024-01-01.2024-01-01_23-59-59_000000.log")
+    plain.unlink()
+    engine = LogQueryEngine(str(logs_dir))
+    logs, counted, has_more = engine.query(None, None, None, page=1, page_size=2)
+    assert [line.split(" | ")[2] for line in logs] == ["2024-01-01 #2", "2024-01-01 #1"]
+    assert has_more
@@ -0,0 +1,47 @@
+from backend.utils import lru_cache
+from backend.utils.lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru_cache.time, "monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+    now[0] = 109.9
+    assert cache.get("a") == 1
+    now[0] = 110.0
+    assert cache.get("a", "gone") == "gone"
+    assert len(cache) == 0
+
+
+def test_invalidate_and_clear():
+    cache = LRUCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_stats_track_hit_rate():
+    cache = LRUCache()
+    assert cache.stats()["hit_rate"] == 0.0
+    cache.set("a", None)
+    cache.get("a", "default")
+    cache.get("b")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from backend.utils.progress_tracker import ProgressTracker
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def test_rate_and_remaining_time():
+    tracker = ProgressTracker(timedelta(minutes=10))
+    tracker.record(at(0), 10)
+    tracker.record(at(100), 30)
+    assert tracker.rate() == 0.2
+    assert tracker.estimate_remaining() == timedelta(seconds=350)
+
+
+def test_rate_needs_two_samples_and_progress():
+    tracker = ProgressTracker(timedelta(minutes=10))
+    tracker.record(at(0), 40)
+    assert tracker.rate() is None
+    tracker.record(at(60), 40)
+    assert tracker.rate() is None
+    assert tracker.estimate_remaining() is None
+
+
+def test_window_drops_old_samples():
+    tracker = ProgressTracker(timedelta(seconds=60))
+    for seconds, progress in ((0, 0), (30, 50), (90, 60), (120, 70)):
+        tracker.record(at(seconds), progress)
+    # 只保留窗口内（以及至少两个）的采样，速率只看最近的变化
+    assert tracker.samples[0] == (at(90), 60)
+    assert tracker.rate() == 10 / 30
+
+
+def test_stall_measured_from_last_advance():
+    tracker = ProgressTracker(timedelta(minutes=10))
+    tracker.record(at(0), 5)
+    tracker.record(at(60), 20)
+    tracker.record(at(600), 20)
+    # 进度回退（例如 Alist 重新计算）不算增长
+    tracker.record(at(900), 15)
+    assert tracker.stalled_for(at(960)) == timedelta(seconds=900)
+    tracker.record(at(1000), 21)
+    assert tracker.stalled_for(at(1000)) == timedelta(0)
+
+
+def test_hold_pauses_stall_timer():
+    tracker = ProgressTracker(timedelta(minutes=10))
+    tracker.record(at(0), 50)
+    tracker.record(at(100), 50)
+    for seconds in range(200, 1100, 100):
+        tracker.hold(at(seconds))
+    # 进度未知的 900 秒不计入停滞，只有之前的 100 秒和之后的 60 秒
+    tracker.record(at(1060), 50)
+    assert tracker.stalled_for(at(1060)) == timedelta(seconds=160)
+
+
+def test_hold_before_any_sample_starts_tracking():
+    tracker = ProgressTracker(timedelta(minutes=10))
+    tracker.hold(at(0))
+    assert tracker.started_at == at(0)
+    assert tracker.stalled_for(at(30)) == timedelta(seconds=30)
+
+
+def test_reset_restarts_everything():
+    tracker = ProgressTracker(timedelta(minutes=10))
+    tracker.record(at(0), 80)
+    tracker.reset(at(100))
+    assert tracker.best_progress == 0
+    assert tracker.progress == 0
+    assert tracker.stalled_for(at(100)) == timedelta(0)
@@ -0,0 +1,70 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services.scheduling_policy import (
+    DeficitRoundRobinPolicy, FifoPolicy, RoundRobinPolicy, SchedulingPolicy, create_scheduling_policy,
+)
+from backend.utils.unique_magnet_queue import UniqueMagnetQueue
+
+
+def make_queue(items):
+    """items 为 (id, 订阅, 优先级)"""
+    queue = UniqueMagnetQueue()
+    for magnet_id, feed_id, priority in items:
+        queue.put_nowait(SimpleNamespace(id=magnet_id, rss_feed_id=feed_id, priority=priority))
+    return queue
+
+
+def take(policy, queue, count):
+    return [policy.next_magnet(queue) for _ in range(count)]
+
+
+def test_base_policy_is_abstract():
+    with pytest.raises(TypeError):
+        SchedulingPolicy()
+
+
+def test_unknown_policy_falls_back_to_fifo():
+    assert isinstance(create_scheduling_policy("nope"), FifoPolicy)
+    assert isinstance(create_scheduling_policy("drr"), DeficitRoundRobinPolicy)
+
+
+def test_empty_queue_returns_none():
+    assert DeficitRoundRobinPolicy().next_magnet(make_queue([])) is None
+
+
+def test_fifo_ignores_feeds():
+    queue = make_queue([(1, 1, 0), (2, 1, 0), (3, 2, 0)])
+    assert [magnet.id for magnet in take(FifoPolicy(), queue, 3)] == [1, 2, 3]
+
+
+def test_round_robin_alternates_feeds_newest_first():
+    queue = make_queue([(1, 1, 0), (2, 1, 0), (3, 2, 0), (4, 2, 0)])
+    picked = take(RoundRobinPolicy(), queue, 4)
+    assert [(magnet.rss_feed_id, magnet.id) for magnet in picked] == [(1, 2), (2, 4), (1, 1), (2, 3)]
+
+
+def test_drr_serves_feeds_in_proportion_to_weight():
+    items = [(feed_id * 100 + n, feed_id, 0) for feed_id in (1, 2) for n in range(10)]
+    policy = DeficitRoundRobinPolicy()
+    policy.update_weights({1: 2, 2: 1})
+    picked = take(policy, make_queue(items), 9)
+    assert [magnet.rss_feed_id for magnet in picked] == [1, 1, 2] * 3
+    assert Counter(magnet.rss_feed_id for magnet in picked) == {1: 6, 2: 3}
+
+
+def test_drr_drops_credit_of_drained_feeds():
+    policy = DeficitRoundRobinPolicy()
+    policy.update_weights({1: 3})
+    queue = make_queue([(1, 1, 0), (2, 2, 0), (3, 2, 0)])
+    assert [magnet.id for magnet in take(policy, queue, 3)] == [1, 3, 2]
+    assert 1 not in policy._deficits
+
+
+def test_priority_and_pinned_bypass_fairness():
+    queue = make_queue([(1, 1, 0), (2, 1, 0), (3, 2, 0), (4, 2, 5)])
+    queue.move_to_front(2)
+    policy = DeficitRoundRobinPolicy()
+    assert [magnet.id for magnet in take(policy, queue, 2)] == [2, 4]
@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.utils.unique_magnet_queue import UniqueMagnetQueue
+
+
+def magnet(magnet_id, priority=0, feed_id=1):
+    return SimpleNamespace(id=magnet_id, priority=priority, rss_feed_id=feed_id)
+
+
+def drain(queue, **kwargs):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait(**kwargs).id)
+    return items
+
+
+def test_higher_priority_first_then_fifo():
+    queue = UniqueMagnetQueue()
+    for item in (magnet(1), magnet(2, priority=5), magnet(3), magnet(4, priority=5)):
+        queue.put_nowait(item)
+    assert drain(queue) == [2, 4, 1, 3]
+
+
+def test_duplicate_ids_are_ignored():
+    queue = UniqueMagnetQueue()
+    assert queue.put_nowait(magnet(1))
+    assert not queue.put_nowait(magnet(1, priority=9))
+    assert len(queue) == 1
+
+
+def test_removed_entries_are_skipped_lazily():
+    queue = UniqueMagnetQueue()
+    for magnet_id in range(1, 6):
+        queue.put_nowait(magnet(magnet_id))
+    asyncio.run(queue.remove(1))
+    asyncio.run(queue.remove(3))
+    assert 1 not in queue
+    # 失效条目仍留在堆中，出队时跳过
+    assert len(queue._heap) == 5
+    assert drain(queue) == [2, 4, 5]
+
+
+def test_heap_is_compacted_when_mostly_removed():
+    queue = UniqueMagnetQueue()
+    for magnet_id in range(1, 501):
+        queue.put_nowait(magnet(magnet_id))
+    for magnet_id in range(1, 491):
+        asyncio.run(queue.remove(magnet_id))
+    assert len(queue) == 10
+    assert len(queue._heap) <= 2 * len(queue) + 64
+    assert drain(queue) == list(range(491, 501))
+
+
+def test_reprioritize_keeps_enqueue_order_among_equals():
+    queue = UniqueMagnetQueue()
+    for magnet_id in (1, 2, 3):
+        queue.put_nowait(magnet(magnet_id, priority=1))
+    queue.put_nowait(magnet(4))
+    assert queue.reprioritize(4, 1)
+    assert queue.reprioritize(1, 1)
+    assert queue.priority_of(4) == (False, 1)
+    assert drain(queue) == [1, 2, 3, 4]
+
+
+def test_move_to_front_beats_priority_and_reprioritize_unpins():
+    queue = UniqueMagnetQueue()
+    queue.put_nowait(magnet(1, priority=10))
+    queue.put_nowait(magnet(2))
+    queue.put_nowait(magnet(3))
+    assert queue.move_to_front(3)
+    assert queue.move_to_front(2)
+    assert queue.priority_of(2) == (True, 0)
+    assert queue.peek()[0].id == 2
+    queue.reprioritize(2, 0)
+    assert drain(queue) == [3, 1, 2]
+    assert not queue.move_to_front(99)
+
+
+def test_group_queue_prefers_newer_items():
+    queue = UniqueMagnetQueue()
+    for magnet_id, feed_id in ((1, 1), (2, 2), (3, 1), (4, 1)):
+        queue.put_nowait(magnet(magnet_id, feed_id=feed_id))
+    assert sorted(queue.groups()) == [1, 2]
+    assert queue.get_nowait(group=1).id == 4
+    assert asyncio.run(queue.remove_group(1)) == 2
+    assert queue.groups() == [2]
+    assert drain(queue) == [2]
+
+
+def test_get_nowait_on_empty_queue_raises():
+    queue = UniqueMagnetQueue()
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait()
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait(group=1)
+
+
+def test_get_waits_for_put():
+    async def scenario():
+        queue = UniqueMagnetQueue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put_nowait(magnet(7))
+        return (await asyncio.wait_for(getter, 1)).id
+
+    assert asyncio.run(scenario()) == 7